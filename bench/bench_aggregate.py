@@ -0,0 +1,72 @@
+"""
+Latency of the API's /aggregate rollups: first (computed) and repeated (memoized) requests.
+
+    python bench/bench_aggregate.py --records 1000000
+
+Records go through api_handler.RecordStore as the Lambda keeps them (INVENTORY_STORE=columnar);
+``--store list`` measures the plain list of dicts instead.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import api_handler  # noqa: E402
+from synthetic import generate_records  # noqa: E402
+
+QUERIES = [
+    {"group_by": "engine,version,region", "metrics": "count,sum:data_size_mb"},
+    {"group_by": "account_id", "engine": "mysql", "metrics": "count"},
+    {"group_by": "instance_type,ec2_state", "metrics": "count,avg:system_memory_mb,max:system_cpu_cores"},
+]
+
+
+def timed_call(query):
+    event = {"httpMethod": "GET", "path": "/prod/aggregate", "queryStringParameters": query}
+    t0 = time.perf_counter()
+    resp = api_handler.lambda_handler(event, None)
+    elapsed = time.perf_counter() - t0
+    return elapsed, json.loads(resp["body"])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=1_000_000)
+    ap.add_argument("--store", choices=("columnar", "list"), default="columnar")
+    ap.add_argument("--repeat", type=int, default=20, help="memoized requests timed per query")
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    rows = generate_records(args.records)
+    records = api_handler.RecordStore(rows) if args.store == "columnar" else list(rows)
+    results = []
+    print(f"{'query':<70} {'groups':>7} {'first ms':>9} {'repeat ms':>10}")
+    with patch("api_handler.load_all_records", return_value=records), \
+            patch("api_handler.snapshot_version", return_value='"bench"'):
+        for query in QUERIES:
+            api_handler._AGGREGATES.clear()
+            api_handler._RESPONSE_CACHE.clear()
+            first_s, body = timed_call(query)
+            repeat_s = min(timed_call(query)[0] for _ in range(args.repeat))
+            label = "&".join(f"{k}={v}" for k, v in query.items())
+            results.append({
+                "query": query,
+                "records": args.records,
+                "store": args.store,
+                "groups": body["count"],
+                "first_ms": round(first_s * 1000, 2),
+                "repeat_ms": round(repeat_s * 1000, 3),
+            })
+            print(f"{label:<70} {body['count']:>7} {first_s * 1000:>9.1f} {repeat_s * 1000:>10.3f}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
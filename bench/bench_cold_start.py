@@ -0,0 +1,133 @@
+"""
+Cold start of the Lambda handlers: module import time and first / second request latency.
+
+    python bench/bench_cold_start.py --records 100000 --runs 5
+    python bench/bench_cold_start.py --prewarm s3,summary
+
+Every sample is a fresh interpreter, as in a new Lambda container. The snapshot and summary are
+generated once with discovery_handler and served from memory; the first request still creates the
+real boto3 S3 client (no network), so the numbers include boto3's import and model loading.
+``--prewarm`` sets API_PREWARM in the child, moving that work into the import (Lambda init).
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+ROUTES = [
+    ("/prod/health", {}),
+    ("/prod/summary", {}),
+    ("/prod/databases", {"engine": "mysql", "limit": "100"}),
+]
+
+
+class _MemoryS3:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def get_object(self, Bucket, Key, **kwargs):
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": '"%d"' % len(self.objects[Key])}
+
+
+def child(data_dir, target):
+    """Runs in the fresh interpreter: prints one JSON sample."""
+    t0 = time.perf_counter()
+    if target == "discovery":
+        import discovery_handler  # noqa: F401
+        print(json.dumps({"import_ms": (time.perf_counter() - t0) * 1000, "boto3_loaded": "boto3" in sys.modules}))
+        return
+    import api_handler
+    import_ms = (time.perf_counter() - t0) * 1000
+    boto3_loaded = "boto3" in sys.modules
+
+    data_dir = Path(data_dir)
+    fake = _MemoryS3({
+        api_handler.RESULTS_S3_KEY: (data_dir / "inventory.ndjson.gz").read_bytes(),
+        api_handler.SUMMARY_S3_KEY: (data_dir / "summary.json").read_bytes(),
+    })
+    real_client = api_handler._s3_client
+
+    def s3_client():
+        real_client()  # created (and cached) as in production, then the in-memory objects are served
+        return fake
+
+    api_handler._s3_client = s3_client
+    path, query = ROUTES[int(target)]
+    event = {"httpMethod": "GET", "path": path, "queryStringParameters": query}
+    timings = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        resp = api_handler.lambda_handler(event, None)
+        timings.append((time.perf_counter() - t0) * 1000)
+        assert resp["statusCode"] == 200, resp
+    print(json.dumps({"import_ms": import_ms, "boto3_loaded": boto3_loaded,
+                      "first_ms": timings[0], "second_ms": timings[1]}))
+
+
+def write_fixtures(data_dir, n):
+    import discovery_handler
+    from synthetic import generate_records
+
+    summary = discovery_handler.SummaryBuilder()
+    with open(Path(data_dir) / "inventory.ndjson.gz", "wb") as sink:
+        discovery_handler.write_snapshot(sink, summary.observe(generate_records(n)), "2025-01-01T00:00:00Z",
+                                         fmt="ndjson", compression="gzip")
+    summary_doc = summary.result("2025-01-01T00:00:00Z")
+    (Path(data_dir) / "summary.json").write_text(json.dumps(summary_doc))
+
+
+def sample(data_dir, target, prewarm):
+    env = dict(os.environ, RESULTS_S3_BUCKET="bench", API_PREWARM=prewarm, AWS_REGION="eu-west-1",
+               AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench")
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", data_dir, target],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+        return
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=100_000)
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per row (median reported)")
+    ap.add_argument("--prewarm", default="", help="API_PREWARM for the API rows, e.g. s3,summary")
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'target':<48} {'import ms':>10} {'first ms':>9} {'second ms':>10} {'boto3 at import':>16}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_fixtures(data_dir, args.records)
+        targets = [("discovery_handler", "discovery")]
+        for i, (path, query) in enumerate(ROUTES):
+            targets.append((f"api_handler {path}?{urlencode(query)}".rstrip("?"), str(i)))
+        for label, target in targets:
+            samples = [sample(data_dir, target, args.prewarm) for _ in range(args.runs)]
+            row = {"target": label, "records": args.records, "prewarm": args.prewarm, "runs": args.runs,
+                   "boto3_loaded": samples[0]["boto3_loaded"]}
+            for field in ("import_ms", "first_ms", "second_ms"):
+                if field in samples[0]:
+                    row[field] = round(statistics.median(s[field] for s in samples), 2)
+            results.append(row)
+            print(f"{label:<48} {row['import_ms']:>10.1f} {row.get('first_ms', float('nan')):>9.1f} "
+                  f"{row.get('second_ms', float('nan')):>10.1f} {str(row['boto3_loaded']):>16}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
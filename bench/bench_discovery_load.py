@@ -0,0 +1,138 @@
+"""
+End-to-end discovery load test against the simulated AWS backend (bench/fake_aws.py).
+
+    python bench/bench_discovery_load.py --accounts 1000 --workers 10,25,50
+    python bench/bench_discovery_load.py --accounts 200 --set SSM_POLL_MAX_SECONDS=5 --straggler-share 0.05
+    python bench/bench_discovery_load.py --accounts 1000 --time-scale 0.02 --json load.json
+
+Each row runs discovery_handler.lambda_handler over a synthetic organization (DISCOVER_ALL_ORG_ACCOUNTS)
+with real threads, real polling and real snapshot writes; only the AWS endpoints are fake. Latencies,
+probe times, SSM polling intervals and COMMAND_TIMEOUT are all multiplied by --time-scale, so
+"simulated s" (wall time / scale) is the run time the strategy would take against AWS, as long as
+the machine keeps up (discovery's own CPU time is not scaled; watch "cpu %" near 100).
+
+--workers sweeps DISCOVERY_MAX_WORKERS; --set NAME=VALUE overrides any other discovery_handler
+constant (SSM_SEND_WORKERS, EC2_DESCRIBE_WORKERS, SSM_POLL_BACKOFF, ...) for every row.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import discovery_handler  # noqa: E402
+from fake_aws import FakeAWS, FleetShape  # noqa: E402
+
+# Durations in discovery_handler that are scaled with the simulated clock.
+SCALED_CONSTANTS = ("SSM_POLL_INITIAL_SECONDS", "SSM_POLL_MAX_SECONDS", "COMMAND_TIMEOUT")
+
+
+def _override(text):
+    name, _, value = text.partition("=")
+    current = getattr(discovery_handler, name)
+    if isinstance(current, bool):
+        return name, value.lower() in ("1", "true", "yes")
+    if isinstance(current, (int, float)):
+        return name, type(current)(float(value))
+    return name, value
+
+
+def run_once(fleet, args, workers, overrides):
+    """One discovery run; returns the result row."""
+    aws = FakeAWS(fleet, time_scale=args.time_scale, max_attempts=args.max_attempts, seed=args.seed)
+    settings = {
+        "DISCOVER_ALL_ORG_ACCOUNTS": True,
+        "SPOKE_ACCOUNTS": [],
+        "DISCOVERY_REGIONS": fleet.regions,
+        "DISCOVERY_MAX_WORKERS": workers,
+        "DISCOVERY_INCREMENTAL": False,
+        "RESULTS_S3_BUCKET": "bench",
+        **overrides,
+    }
+    for name in SCALED_CONSTANTS:
+        settings[name] = settings.get(name, getattr(discovery_handler, name)) * args.time_scale
+    with ExitStack() as stack:
+        for name, value in settings.items():
+            stack.enter_context(patch.object(discovery_handler, name, value))
+        stack.enter_context(aws.installed(discovery_handler))
+        t0, c0 = time.perf_counter(), time.process_time()
+        resp = discovery_handler.lambda_handler({}, None)
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - c0
+    body = json.loads(resp["body"])
+    stats = aws.stats()
+    return {
+        "workers": workers,
+        "accounts": len(fleet.accounts),
+        "regions": len(fleet.regions),
+        "status": resp["statusCode"],
+        "records": body.get("discovered"),
+        "wall_seconds": round(wall, 3),
+        "simulated_seconds": round(wall / args.time_scale, 1),
+        "cpu_percent": round(100 * cpu / wall, 1) if wall else 0.0,
+        **stats,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--accounts", type=int, default=1000)
+    ap.add_argument("--regions", default="eu-west-1,ap-south-1", help="comma-separated regions per account")
+    ap.add_argument("--instances", type=int, default=10, help="average instances per non-empty region")
+    ap.add_argument("--empty-region-share", type=float, default=0.3)
+    ap.add_argument("--dbs-per-instance", type=int, default=2)
+    ap.add_argument("--probe-seconds", type=float, default=4.0, help="median simulated probe run time")
+    ap.add_argument("--probe-failure-share", type=float, default=0.02)
+    ap.add_argument("--straggler-share", type=float, default=0.01)
+    ap.add_argument("--straggler-factor", type=float, default=30.0)
+    ap.add_argument("--time-scale", type=float, default=0.01, help="wall seconds per simulated second")
+    ap.add_argument("--max-attempts", type=int, default=5, help="botocore max_attempts for throttled calls")
+    ap.add_argument("--workers", default="10", help="comma-separated DISCOVERY_MAX_WORKERS values to compare")
+    ap.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                    help="override a discovery_handler constant for every run (repeatable)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    discovery_handler.logger.setLevel(logging.ERROR)
+    fleet = FleetShape(
+        accounts=args.accounts,
+        regions=[r.strip() for r in args.regions.split(",") if r.strip()],
+        instances_per_region=args.instances,
+        empty_region_share=args.empty_region_share,
+        dbs_per_instance=args.dbs_per_instance,
+        probe_seconds=args.probe_seconds,
+        probe_failure_share=args.probe_failure_share,
+        straggler_share=args.straggler_share,
+        straggler_factor=args.straggler_factor,
+        seed=args.seed,
+    )
+    expected = fleet.expected_records()
+    overrides = dict(_override(o) for o in args.overrides)
+    print(f"{len(fleet.accounts)} accounts x {len(fleet.regions)} regions, {expected} records expected "
+          f"(time scale {args.time_scale})")
+    print(f"{'workers':>7} {'wall s':>8} {'simulated s':>12} {'cpu %':>6} {'records':>8} {'calls':>8} "
+          f"{'throttled':>9} {'retries':>8} {'errors':>7}  calls by service")
+    results = []
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        row = run_once(fleet, args, workers, overrides)
+        row["expected_records"] = expected
+        results.append(row)
+        by_service = " ".join(f"{k}={v}" for k, v in row["calls_by_service"].items())
+        print(f"{workers:>7} {row['wall_seconds']:>8.2f} {row['simulated_seconds']:>12.1f} {row['cpu_percent']:>6.1f} "
+              f"{row['records']!s:>8} {row['calls']:>8} {row['throttled']:>9} {row['retries']:>8} "
+              f"{sum(row['errors'].values()):>7}  {by_service}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps({"overrides": overrides, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
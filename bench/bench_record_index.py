@@ -0,0 +1,92 @@
+"""
+Filter latency with and without the API's RecordIndex.
+
+    python bench/bench_record_index.py --records 1000000
+
+Builds the index over synthetic records once, then times typical /databases and account queries
+through api_handler.apply_record_filters both ways and checks they return the same rows.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import api_handler  # noqa: E402
+from synthetic import generate_records  # noqa: E402
+
+
+def queries(records):
+    sample = records[len(records) // 2]
+    return [
+        ("unfiltered", {}),
+        ("region", {"region": sample["region"]}),
+        ("account", {"account_id": sample["account_id"]}),
+        ("account+region", {"account_id": sample["account_id"], "region": sample["region"]}),
+        ("engine", {"engine": "postgresql"}),
+        ("engine+status+region", {"engine": "mysql", "db_status": "running", "region": sample["region"]}),
+        ("instance", {"instance_id": sample["instance_id"]}),
+        ("failed probes", {"discovery_status": "failed"}),
+        ("non-empty stopped", {"ec2_state": "stopped", "include_empty": "false"}),
+        ("tag value", {"tag.Team": sample["tags"]["Team"]}),
+        ("tag+region", {"tag.Environment": "production", "region": sample["region"]}),
+        ("has_tag", {"has_tag": "CostCenter", "engine": "mongodb"}),
+        ("q prefix", {"q": sample["instance_id"][:8] + "*"}),
+        ("q substring", {"q": sample["tags"]["Name"].split("-db-")[1]}),
+    ]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, min(times), statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--memory", action="store_true", help="also measure index memory with tracemalloc")
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    records = list(generate_records(args.records))
+    t0 = time.perf_counter()
+    index = api_handler.RecordIndex(records)
+    build_s = time.perf_counter() - t0
+    results = {"records": args.records, "build_s": round(build_s, 3), "queries": []}
+    print(f"{args.records} records: index built in {build_s:.2f} s")
+    if args.memory:
+        # Separate build: tracemalloc slows allocation-heavy code several times over.
+        tracemalloc.start()
+        retained = api_handler.RecordIndex(records)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del retained
+        results.update(index_mb=round(current / 1e6, 1), build_peak_mb=round(peak / 1e6, 1))
+        print(f"index retains {current / 1e6:.1f} MB (build peak {peak / 1e6:.1f} MB)")
+
+    print(f"{'query':<22} {'rows':>9} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+    for name, qs in queries(records):
+        expected, scan_s, _ = best_of(lambda: api_handler.apply_record_filters(records, qs), args.repeat)
+        got, index_s, _ = best_of(lambda: api_handler.apply_record_filters(records, qs, index=index), args.repeat)
+        assert got == expected, name
+        results["queries"].append(
+            {"query": name, "rows": len(got), "scan_ms": round(scan_s * 1e3, 3), "index_ms": round(index_s * 1e3, 3)}
+        )
+        print(f"{name:<22} {len(got):>9} {scan_s * 1e3:>9.1f} {index_s * 1e3:>9.2f} {scan_s / max(index_s, 1e-9):>7.0f}x")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
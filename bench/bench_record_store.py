@@ -0,0 +1,101 @@
+"""
+Memory and latency of the API's RecordStore against a plain list of dicts.
+
+    python bench/bench_record_store.py --sizes 100000,1000000
+    python bench/bench_record_store.py --formats ndjson --stores columnar
+
+Records are parsed from an in-memory snapshot through api_handler._parse_records, as the Lambda does,
+once per snapshot format (default: the writer's default RESULTS_FORMAT, then the other one, each with
+its default compression) and INVENTORY_STORE setting; tracemalloc reports what the parsed snapshot
+keeps and the parse peak.
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import api_handler  # noqa: E402
+import discovery_handler  # noqa: E402
+from synthetic import generate_records  # noqa: E402
+
+QUERY = {"engine": "postgresql", "ec2_state": "running", "limit": "500", "fields": "instance_id,engine,version"}
+
+
+def snapshot_bytes(n, fmt):
+    sink = io.BytesIO()
+    discovery_handler.write_snapshot(sink, generate_records(n), "2025-01-01T00:00:00Z", fmt=fmt)
+    return sink.getvalue()
+
+
+def bench_one(data, store):
+    with patch.object(api_handler, "INVENTORY_STORE", store):
+        gc.collect()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        records = api_handler._parse_records("bench", io.BytesIO(data))
+        parse_s = time.perf_counter() - t0
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        api_handler.record_index(records)
+        index_s = time.perf_counter() - t0
+        api_handler._PAGE_ORDERS.clear()
+        with patch("api_handler.load_all_records", return_value=records), \
+                patch("api_handler.snapshot_version", return_value=store):
+            t0 = time.perf_counter()
+            event = {"httpMethod": "GET", "path": "/prod/databases", "queryStringParameters": QUERY}
+            body = json.loads(api_handler.lambda_handler(event, None)["body"])
+            page_s = time.perf_counter() - t0
+    api_handler._RECORD_INDEXES.clear()
+    api_handler._PAGE_ORDERS.clear()
+    return {
+        "retained_mb": round(retained / 1e6, 1),
+        "parse_peak_mb": round(peak / 1e6, 1),
+        "parse_s": round(parse_s, 3),
+        "index_s": round(index_s, 3),
+        "first_page_s": round(page_s, 3),
+        "matches": body["count"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="100000,1000000", help="comma-separated record counts")
+    ap.add_argument("--stores", default="list,columnar", help="INVENTORY_STORE settings to compare")
+    default_formats = [discovery_handler.RESULTS_FORMAT] + [
+        f for f in ("json", "ndjson") if f != discovery_handler.RESULTS_FORMAT
+    ]
+    ap.add_argument("--formats", default=",".join(default_formats), help="snapshot formats (RESULTS_FORMAT) to parse")
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'records':>9} {'format':<7} {'store':<9} {'kept MB':>8} {'peak MB':>8} {'parse s':>8} "
+          f"{'index s':>8} {'page s':>7}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        for fmt in [x.strip() for x in args.formats.split(",") if x.strip()]:
+            data = snapshot_bytes(n, fmt)
+            for store in [x.strip() for x in args.stores.split(",") if x.strip()]:
+                r = bench_one(data, store)
+                r.update(records=n, format=fmt, store=store)
+                results.append(r)
+                print(
+                    f"{n:>9} {fmt:<7} {store:<9} {r['retained_mb']:>8.1f} {r['parse_peak_mb']:>8.1f} "
+                    f"{r['parse_s']:>8.2f} {r['index_s']:>8.2f} {r['first_page_s']:>7.2f}"
+                )
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Bytes on the wire and API parse time for each snapshot format / compression.
+
+    python bench/bench_snapshot_compression.py --sizes 10000,100000,1000000
+
+Serializes synthetic records with discovery_handler.write_snapshot and parses them back with
+api_handler.iter_snapshot_records (the same code paths the Lambdas use), all in memory.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import api_handler  # noqa: E402
+import discovery_handler  # noqa: E402
+from synthetic import generate_records  # noqa: E402
+
+COMBOS = [("json", "none"), ("json", "gzip"), ("ndjson", "gzip"), ("json", "zstd"), ("ndjson", "zstd")]
+
+
+def bench_one(records, fmt, compression):
+    sink = io.BytesIO()
+    t0 = time.perf_counter()
+    discovery_handler.write_snapshot(sink, records, "2025-01-01T00:00:00Z", fmt=fmt, compression=compression)
+    write_s = time.perf_counter() - t0
+    size = sink.tell()
+    sink.seek(0)
+    t0 = time.perf_counter()
+    parsed = sum(1 for _ in api_handler.iter_snapshot_records(sink))
+    parse_s = time.perf_counter() - t0
+    assert parsed == len(records), (parsed, len(records))
+    return {"bytes": size, "write_s": round(write_s, 4), "parse_s": round(parse_s, 4)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated record counts")
+    ap.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = ap.parse_args()
+
+    combos = [c for c in COMBOS if c[1] != "zstd" or discovery_handler.zstandard is not None]
+    if len(combos) < len(COMBOS):
+        print("zstandard not installed: skipping zstd rows", file=sys.stderr)
+
+    results = []
+    print(f"{'records':>9} {'format':<7} {'codec':<5} {'MB':>9} {'ratio':>6} {'write s':>8} {'parse s':>8}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        records = list(generate_records(n))
+        baseline = None
+        for fmt, compression in combos:
+            r = bench_one(records, fmt, compression)
+            baseline = baseline or r["bytes"]
+            r.update(records=n, format=fmt, compression=compression)
+            results.append(r)
+            print(
+                f"{n:>9} {fmt:<7} {compression:<5} {r['bytes'] / 1e6:>9.2f} "
+                f"{baseline / r['bytes']:>6.1f} {r['write_s']:>8.3f} {r['parse_s']:>8.3f}"
+            )
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,545 @@
+"""
+Local stand-in for the AWS APIs discovery_handler calls, for end-to-end load tests on one machine.
+
+    aws = FakeAWS(FleetShape(accounts=1000), time_scale=0.01)
+    with aws.installed():
+        discovery_handler.lambda_handler({}, None)
+    print(aws.stats())
+
+Covers STS (AssumeRole), Organizations (ListAccounts, DescribeOrganization), SSM
+(DescribeInstanceInformation, SendCommand, ListCommandInvocations, GetCommandInvocation), EC2
+(DescribeInstances), S3 (objects, multipart uploads, copies, listing) and Lambda (Invoke).
+
+Every call sleeps for a latency drawn from a per-operation log-normal distribution and takes a
+token from a per account/region/service bucket. An empty bucket is a ThrottlingException, which is
+retried with jittered exponential backoff as botocore's legacy retry mode does (``max_attempts``),
+so the code under test only sees throttles once retries run out. SSM probes finish after their own
+simulated run time; ``straggler_share`` of them take ``straggler_factor`` times longer.
+
+All durations (latencies, probe times, backoff) are multiplied by ``time_scale`` and token rates
+divided by it, so time_scale=0.01 plays a 10-minute run in about 6 s of waiting. The discovery
+code's own CPU time is not scaled.
+"""
+import io
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from synthetic import ENGINES, ENVIRONMENTS, INSTANCE_TYPES, REGIONS
+
+HUB_ACCOUNT = "000000000000"
+
+# Median latency per operation in seconds (before time_scale), roughly what these calls take in-region.
+DEFAULT_LATENCY = {
+    "sts.assume_role": 0.08,
+    "organizations.list_accounts": 0.12,
+    "organizations.describe_organization": 0.08,
+    "ssm.describe_instance_information": 0.10,
+    "ssm.send_command": 0.12,
+    "ssm.list_command_invocations": 0.09,
+    "ssm.get_command_invocation": 0.06,
+    "ec2.describe_instances": 0.15,
+    "s3.*": 0.03,
+    "lambda.invoke": 0.05,
+}
+# Sustained requests per second and burst per (account, region, service), before time_scale.
+DEFAULT_RATE_LIMITS = {
+    "sts": (50, 100),
+    "organizations": (5, 10),
+    "ssm": (20, 40),
+    "ec2": (100, 200),
+    "s3": (3500, 3500),
+    "lambda": (50, 100),
+}
+# Page sizes the real APIs use (maximum MaxResults).
+PAGE_SIZES = {"list_accounts": 20, "describe_instance_information": 50, "list_command_invocations": 50}
+SSM_OUTPUT_TRUNCATE = 2500
+SSM_STDOUT_LIMIT = 24000
+
+
+def _client_error(code, message, operation, status=400):
+    return ClientError(
+        {"Error": {"Code": code, "Message": message}, "ResponseMetadata": {"HTTPStatusCode": status}}, operation
+    )
+
+
+class FleetShape:
+    """How the synthetic organization looks; every pair's instances derive from ``seed``."""
+
+    def __init__(
+        self,
+        accounts=1000,
+        regions=("eu-west-1", "ap-south-1"),
+        instances_per_region=10,
+        empty_region_share=0.3,
+        offline_share=0.05,
+        windows_share=0.05,
+        dbs_per_instance=2,
+        probe_seconds=4.0,
+        probe_failure_share=0.02,
+        straggler_share=0.01,
+        straggler_factor=30.0,
+        seed=7,
+    ):
+        self.accounts = [f"{100000000000 + i * 7919:012d}" for i in range(accounts)]
+        self.regions = list(regions) if regions else REGIONS[:2]
+        self.instances_per_region = instances_per_region
+        self.empty_region_share = empty_region_share
+        self.offline_share = offline_share
+        self.windows_share = windows_share
+        self.dbs_per_instance = dbs_per_instance
+        self.probe_seconds = probe_seconds
+        self.probe_failure_share = probe_failure_share
+        self.straggler_share = straggler_share
+        self.straggler_factor = straggler_factor
+        self.seed = seed
+
+    def instances(self, account_id, region):
+        """Instances of one pair: [{"id", "online", "linux", "type", "tags", "state", "databases", ...}]."""
+        rng = random.Random(zlib.crc32(f"{self.seed}|{account_id}|{region}".encode()))
+        if rng.random() < self.empty_region_share:
+            return []
+        count = rng.randint(max(0, self.instances_per_region // 2), self.instances_per_region * 3 // 2)
+        out = []
+        for n in range(count):
+            team = f"team-{rng.randrange(50)}"
+            databases = []
+            for _ in range(rng.randint(0, self.dbs_per_instance)):
+                engine, versions, port = ENGINES[rng.randrange(len(ENGINES))]
+                databases.append({
+                    "db_id": f"{engine}-{port}", "engine": engine, "version": rng.choice(versions),
+                    "status": "running", "port": port, "data_size_mb": rng.randrange(10, 500000),
+                })
+            probe = self.probe_seconds * rng.lognormvariate(0, 0.35)
+            if rng.random() < self.straggler_share:
+                probe *= self.straggler_factor
+            out.append({
+                "id": f"i-{rng.getrandbits(68):017x}",
+                "online": rng.random() >= self.offline_share,
+                "linux": rng.random() >= self.windows_share,
+                "type": rng.choice(INSTANCE_TYPES),
+                "state": "running",
+                "launch_time": datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=n),
+                "tags": {"Name": f"{team}-db-{n}", "Team": team, "Environment": rng.choice(ENVIRONMENTS)},
+                "databases": databases,
+                "memory_mb": rng.choice([4096, 8192, 16384]),
+                "cpu_cores": rng.choice([2, 4, 8]),
+                "probe_seconds": probe,
+                "fails": rng.random() < self.probe_failure_share,
+            })
+        return out
+
+    def expected_records(self):
+        """Rows a complete run should produce: one per database, or one per probed host without any."""
+        total = 0
+        for account_id in self.accounts:
+            for region in self.regions:
+                for inst in self.instances(account_id, region):
+                    if inst["online"] and inst["linux"]:
+                        total += max(1, len(inst["databases"])) if not inst["fails"] else 1
+        return total
+
+
+class _TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.burst = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class FakeAWS:
+    """Shared state of the simulated accounts: fleet, SSM commands, S3 objects, counters."""
+
+    def __init__(self, fleet=None, time_scale=1.0, latency=None, latency_sigma=0.4, rate_limits=None,
+                 max_attempts=5, seed=7):
+        self.fleet = fleet or FleetShape(accounts=0)
+        self.time_scale = time_scale
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.latency_sigma = latency_sigma
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.max_attempts = max(1, max_attempts)
+        self.objects = {}
+        self._uploads = {}
+        self._commands = {}
+        self._pairs = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.retries = Counter()
+        self.errors = Counter()
+        self.wait_seconds = 0.0
+
+    # -- plumbing --------------------------------------------------------------------------------
+
+    def client(self, service, region_name=None, aws_access_key_id=None, **kwargs):
+        """Stand-in for Session.client(); the account is recovered from the fake access key ID."""
+        account_id = HUB_ACCOUNT
+        if aws_access_key_id and aws_access_key_id.startswith("ASIA"):
+            account_id = aws_access_key_id[4:16]
+        classes = {"sts": FakeSTS, "organizations": FakeOrganizations, "ssm": FakeSSM, "ec2": FakeEC2,
+                   "s3": FakeS3, "lambda": FakeLambda}
+        return classes[service](self, account_id, region_name or "eu-west-1")
+
+    def _sleep(self, seconds):
+        seconds *= self.time_scale
+        if seconds > 0:
+            time.sleep(seconds)
+            with self._lock:
+                self.wait_seconds += seconds
+
+    def _latency(self, op):
+        median = self.latency.get(op, self.latency.get(op.split(".")[0] + ".*", 0.05))
+        with self._lock:
+            return median * self._rng.lognormvariate(0, self.latency_sigma)
+
+    def _admit(self, service, account_id, region):
+        limit = self.rate_limits.get(service)
+        if not limit or self.time_scale <= 0:
+            return True
+        key = (service, account_id, region)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, burst = limit
+                bucket = self._buckets[key] = _TokenBucket(rate / self.time_scale, burst)
+            return bucket.take()
+
+    def call(self, service, op, account_id, region, fn):
+        """One API call with latency, throttling and botocore-style retries; returns fn()."""
+        name = f"{service}.{op}"
+        for attempt in range(self.max_attempts):
+            with self._lock:
+                self.calls[name] += 1
+            if self.time_scale:
+                self._sleep(self._latency(name))
+            if self._admit(service, account_id, region):
+                try:
+                    return fn()
+                except ClientError as e:
+                    with self._lock:
+                        self.errors[f"{name}:{e.response['Error']['Code']}"] += 1
+                    raise
+            with self._lock:
+                self.throttled[name] += 1
+                if attempt + 1 < self.max_attempts:
+                    self.retries[name] += 1
+                jitter = self._rng.random()
+            if attempt + 1 < self.max_attempts:
+                self._sleep(min(20.0, jitter * 2 ** attempt * 0.1))
+        with self._lock:
+            self.errors[f"{name}:ThrottlingException"] += 1
+        raise _client_error("ThrottlingException", "Rate exceeded", op)
+
+    def pair(self, account_id, region):
+        with self._lock:
+            instances = self._pairs.get((account_id, region))
+        if instances is None:
+            instances = {inst["id"]: inst for inst in self.fleet.instances(account_id, region)}
+            with self._lock:
+                instances = self._pairs.setdefault((account_id, region), instances)
+        return instances
+
+    def stats(self):
+        """Counters since construction (or the last reset())."""
+        with self._lock:
+            by_service = Counter()
+            for name, n in self.calls.items():
+                by_service[name.split(".")[0]] += n
+            return {
+                "calls": sum(self.calls.values()),
+                "calls_by_service": dict(sorted(by_service.items())),
+                "calls_by_operation": dict(sorted(self.calls.items())),
+                "throttled": sum(self.throttled.values()),
+                "throttled_by_operation": dict(sorted(self.throttled.items())),
+                "retries": sum(self.retries.values()),
+                "errors": dict(sorted(self.errors.items())),
+                "simulated_wait_seconds": round(self.wait_seconds, 3),
+            }
+
+    def reset(self):
+        with self._lock:
+            for counter in (self.calls, self.throttled, self.retries, self.errors):
+                counter.clear()
+            self.wait_seconds = 0.0
+
+    @contextmanager
+    def installed(self, module=None):
+        """Route every client discovery_handler creates to this fake and clear its client caches."""
+        if module is None:
+            import discovery_handler as module
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(module, "_new_client", self.client))
+            for name in ("_HUB_CLIENTS", "_SPOKE_CLIENTS", "_SPOKE_CREDENTIALS", "_SPOKE_KEY_LOCKS"):
+                stack.enter_context(patch.object(module, name, {}))
+            yield self
+
+
+class _FakeClient:
+    service = ""
+
+    def __init__(self, aws, account_id, region):
+        self._aws = aws
+        self._account = account_id
+        self._region = region
+
+    def _call(self, op, fn):
+        return self._aws.call(self.service, op, self._account, self._region, fn)
+
+    def _paginated(self, op, items, page_size, key, **extra):
+        pages = [items[i : i + page_size] for i in range(0, len(items), page_size)] or [[]]
+        for n, page in enumerate(pages):
+            def fetch(page=page, last=n == len(pages) - 1):
+                body = {key: page, **extra}
+                if not last:
+                    body["NextToken"] = str(n + 1)
+                return body
+            yield self._call(op, fetch)
+
+    def get_paginator(self, name):
+        client = self
+
+        class _Paginator:
+            def paginate(self, **kwargs):
+                return getattr(client, "_paginate_" + name)(**kwargs)
+
+        return _Paginator()
+
+
+class FakeSTS(_FakeClient):
+    service = "sts"
+
+    def assume_role(self, RoleArn, RoleSessionName, **kwargs):
+        account_id = RoleArn.split(":")[4]
+
+        def fetch():
+            return {"Credentials": {
+                "AccessKeyId": f"ASIA{account_id}{uuid.uuid4().hex[:4].upper()}",
+                "SecretAccessKey": "fake",
+                "SessionToken": "fake",
+                "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
+            }}
+
+        return self._call("assume_role", fetch)
+
+
+class FakeOrganizations(_FakeClient):
+    service = "organizations"
+
+    def _paginate_list_accounts(self, **kwargs):
+        accounts = [{"Id": a, "Status": "ACTIVE", "Name": f"acct-{a}"} for a in self._aws.fleet.accounts]
+        return self._paginated("list_accounts", accounts, PAGE_SIZES["list_accounts"], "Accounts")
+
+    def describe_organization(self):
+        return self._call("describe_organization", lambda: {"Organization": {"MasterAccountId": HUB_ACCOUNT}})
+
+
+class FakeEC2(_FakeClient):
+    service = "ec2"
+
+    def _paginate_describe_instances(self, InstanceIds=(), **kwargs):
+        instances = self._aws.pair(self._account, self._region)
+
+        def fetch():
+            missing = [i for i in InstanceIds if i not in instances]
+            if missing:
+                raise _client_error("InvalidInstanceID.NotFound",
+                                    f"The instance IDs '{', '.join(missing)}' do not exist", "DescribeInstances")
+            return {"Reservations": [{"Instances": [{
+                "InstanceId": iid,
+                "InstanceType": instances[iid]["type"],
+                "State": {"Name": instances[iid]["state"]},
+                "LaunchTime": instances[iid]["launch_time"],
+                "Tags": [{"Key": k, "Value": v} for k, v in instances[iid]["tags"].items()],
+            } for iid in InstanceIds]}]}
+
+        yield self._call("describe_instances", fetch)
+
+
+class FakeSSM(_FakeClient):
+    service = "ssm"
+
+    def _paginate_describe_instance_information(self, **kwargs):
+        infos = [{
+            "InstanceId": inst["id"],
+            "PingStatus": "Online" if inst["online"] else "ConnectionLost",
+            "PlatformName": "Amazon Linux" if inst["linux"] else "Microsoft Windows Server 2022 Datacenter",
+            "PlatformVersion": "2023" if inst["linux"] else "10.0.20348",
+            "AgentVersion": "3.3.0.0",
+        } for inst in self._aws.pair(self._account, self._region).values()]
+        page_size = PAGE_SIZES["describe_instance_information"]
+        return self._paginated("describe_instance_information", infos, page_size, "InstanceInformationList")
+
+    def send_command(self, DocumentName, InstanceIds=None, Targets=None, **kwargs):
+        instances = self._aws.pair(self._account, self._region)
+
+        def fetch():
+            if InstanceIds is not None and len(InstanceIds) > 50:
+                raise _client_error("ValidationException", "InstanceIds has more than 50 items", "SendCommand")
+            if InstanceIds is not None:
+                targeted = [i for i in InstanceIds if i in instances]
+            else:
+                targeted = [i for i, inst in instances.items() if inst["online"] and _matches(inst, Targets)]
+            command_id = str(uuid.uuid4())
+            started = time.monotonic()
+            with self._aws._lock:
+                self._aws._commands[command_id] = (self._account, self._region, started, targeted)
+            return {"Command": {"CommandId": command_id, "DocumentName": DocumentName}}
+
+        return self._call("send_command", fetch)
+
+    def _invocation(self, command_id, iid):
+        account_id, region, started, _ = self._aws._commands[command_id]
+        inst = self._aws.pair(account_id, region)[iid]
+        if time.monotonic() - started < inst["probe_seconds"] * self._aws.time_scale:
+            return {"InstanceId": iid, "Status": "InProgress"}, "", ""
+        if inst["fails"]:
+            return {"InstanceId": iid, "Status": "Failed"}, "", "python3: discovery failed"
+        doc = {
+            "discovery_status": "success",
+            "system_memory_mb": inst["memory_mb"],
+            "system_cpu_cores": inst["cpu_cores"],
+            "databases": inst["databases"],
+        }
+        stdout = "download: s3://bucket/ssm/discovery_python.py to ./discovery_python.py\n" + json.dumps(doc) + "\n"
+        return {"InstanceId": iid, "Status": "Success"}, stdout[:SSM_STDOUT_LIMIT], ""
+
+    def _paginate_list_command_invocations(self, CommandId, Details=False, **kwargs):
+        _, _, _, targeted = self._aws._commands[CommandId]
+        invocations = []
+        for iid in targeted:
+            inv, stdout, stderr = self._invocation(CommandId, iid)
+            if Details:
+                output = stdout + (f"\n----------ERROR-------\n{stderr}" if stderr else "")
+                inv["CommandPlugins"] = [{"Name": "runShellScript", "Output": output[:SSM_OUTPUT_TRUNCATE]}]
+            invocations.append(inv)
+        page_size = PAGE_SIZES["list_command_invocations"]
+        return self._paginated("list_command_invocations", invocations, page_size, "CommandInvocations")
+
+    def get_command_invocation(self, CommandId, InstanceId):
+        def fetch():
+            inv, stdout, stderr = self._invocation(CommandId, InstanceId)
+            return {"Status": inv["Status"], "StandardOutputContent": stdout, "StandardErrorContent": stderr}
+
+        return self._call("get_command_invocation", fetch)
+
+
+def _matches(inst, targets):
+    for target in targets or ():
+        if target["Key"].startswith("tag:"):
+            if inst["tags"].get(target["Key"][4:]) not in target["Values"]:
+                return False
+    return True
+
+
+class FakeS3(_FakeClient):
+    """Objects live in FakeAWS.objects, keyed by object key (one bucket is enough for discovery)."""
+
+    service = "s3"
+
+    def _etag(self, body):
+        return '"%08x-%d"' % (zlib.crc32(body), len(body))
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        body = Body if isinstance(Body, bytes) else bytes(Body)
+
+        def fetch():
+            self._aws.objects[Key] = body
+            return {"ETag": self._etag(body)}
+
+        return self._call("put_object", fetch)
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        def fetch():
+            body = self._aws.objects.get(Key)
+            if body is None:
+                raise _client_error("NoSuchKey", "The specified key does not exist.", "GetObject", 404)
+            if IfNoneMatch == self._etag(body):
+                raise _client_error("304", "Not Modified", "GetObject", 304)
+            return {"Body": io.BytesIO(body), "ETag": self._etag(body), "ContentLength": len(body)}
+
+        return self._call("get_object", fetch)
+
+    def delete_object(self, Bucket, Key):
+        def fetch():
+            self._aws.objects.pop(Key, None)
+            return {}
+
+        return self._call("delete_object", fetch)
+
+    def delete_objects(self, Bucket, Delete):
+        def fetch():
+            for obj in Delete["Objects"]:
+                self._aws.objects.pop(obj["Key"], None)
+            return {"Deleted": Delete["Objects"]}
+
+        return self._call("delete_objects", fetch)
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        def fetch():
+            self._aws.objects[Key] = self._aws.objects[CopySource["Key"]]
+            return {"CopyObjectResult": {"ETag": self._etag(self._aws.objects[Key])}}
+
+        return self._call("copy_object", fetch)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        def fetch():
+            upload_id = uuid.uuid4().hex
+            self._aws._uploads[upload_id] = {}
+            return {"UploadId": upload_id}
+
+        return self._call("create_multipart_upload", fetch)
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body):
+        def fetch():
+            self._aws._uploads[UploadId][PartNumber] = bytes(Body)
+            return {"ETag": self._etag(Body)}
+
+        return self._call("upload_part", fetch)
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        def fetch():
+            parts = self._aws._uploads.pop(UploadId)
+            body = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+            self._aws.objects[Key] = body
+            return {"ETag": '"%08x-%d"' % (zlib.crc32(body), len(parts))}
+
+        return self._call("complete_multipart_upload", fetch)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        def fetch():
+            self._aws._uploads.pop(UploadId, None)
+            return {}
+
+        return self._call("abort_multipart_upload", fetch)
+
+    def _paginate_list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        keys = [{"Key": k, "Size": len(v)} for k, v in sorted(self._aws.objects.items()) if k.startswith(Prefix)]
+        return self._paginated("list_objects_v2", keys, 1000, "Contents")
+
+
+class FakeLambda(_FakeClient):
+    service = "lambda"
+
+    def invoke(self, FunctionName, InvocationType="RequestResponse", Payload=b""):
+        return self._call("invoke", lambda: {"StatusCode": 202})
@@ -0,0 +1,196 @@
+"""
+Benchmark suite for the discovery and API hot paths, with a baseline to catch regressions.
+
+    python bench/run_benchmarks.py --save-baseline bench/baseline.json          # on the reference commit
+    python bench/run_benchmarks.py --compare bench/baseline.json                # on the change; exit 1 on regression
+    python bench/run_benchmarks.py --sizes 10000 --accounts 20 --tag-cardinality 500
+
+Cases, each at every --sizes row count of synthetic records (bench/synthetic.py):
+
+    discovery.parse_discovery_output   SSM stdout of every instance -> records
+    discovery.store_results_s3         snapshot, summary and run history written to fake_aws's S3 (no latency)
+    api.load_all_records               parse the stored snapshot into the API's record store
+    api.record_index                   build the filter index over the parsed records
+    api.apply_record_filters           the bench_record_index queries, indexed
+    api.apply_record_filters[scan]     the same queries over a plain list (no index)
+    api.group_by_instance              the /instances grouping over all records
+    api.to_json_serializable           response preparation over all records
+
+Time is the best of --repeat runs; peak_mb is the tracemalloc peak of one further run (skip with
+--no-memory). A case regresses when it is --threshold times slower (and --min-ms slower in
+absolute terms) or uses --threshold times the memory of the baseline row with the same size.
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "lambda"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import api_handler  # noqa: E402
+import discovery_handler  # noqa: E402
+from bench_record_index import queries  # noqa: E402
+from fake_aws import FakeAWS  # noqa: E402
+from synthetic import generate_records, probe_outputs  # noqa: E402
+
+
+def _store(records):
+    aws = FakeAWS(time_scale=0)
+    with patch("discovery_handler._s3_client", return_value=aws.client("s3")), \
+            patch.object(discovery_handler, "RESULTS_S3_BUCKET", "bench"), \
+            patch.object(discovery_handler, "RESULTS_LAYOUT", "single"):
+        discovery_handler.store_results_s3(records)
+    return aws
+
+
+def cases(records):
+    """[(name, fn)] for one size; fn() runs the measured work once. Inputs are prepared here, untimed."""
+    calls = probe_outputs(records)
+    snapshot = _store(records).objects[discovery_handler.RESULTS_S3_KEY]
+    store = api_handler._parse_records("bench", io.BytesIO(snapshot))
+    index = api_handler.RecordIndex(store)
+    filter_queries = [qs for _, qs in queries(records)]
+
+    def parse_outputs():
+        for call in calls:
+            discovery_handler.parse_discovery_output(*call)
+
+    def filter_indexed():
+        for qs in filter_queries:
+            api_handler.apply_record_filters(store, qs, index=index)
+
+    def filter_scan():
+        for qs in filter_queries:
+            api_handler.apply_record_filters(records, qs)
+
+    return [
+        ("discovery.parse_discovery_output", parse_outputs),
+        ("discovery.store_results_s3", lambda: _store(records)),
+        ("api.load_all_records", lambda: api_handler._parse_records("bench", io.BytesIO(snapshot))),
+        ("api.record_index", lambda: api_handler.RecordIndex(store)),
+        ("api.apply_record_filters", filter_indexed),
+        ("api.apply_record_filters[scan]", filter_scan),
+        ("api.group_by_instance", lambda: api_handler.group_by_instance(records)),
+        ("api.to_json_serializable", lambda: api_handler.to_json_serializable(records)),
+    ]
+
+
+def measure(fn, repeat, memory):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    row = {"seconds": round(min(times), 5)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        row["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        tracemalloc.stop()
+    return row
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(results, baseline, threshold, min_ms):
+    """Print each case against the baseline; returns the regressed rows."""
+    before = {(r["case"], r["records"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'case':<36} {'records':>9} {'base s':>9} {'now s':>9} {'time':>7} {'base MB':>8} {'now MB':>8} {'mem':>7}")
+    for row in results:
+        old = before.get((row["case"], row["records"]))
+        if old is None:
+            continue
+        time_ratio = row["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        slower = time_ratio > threshold and (row["seconds"] - old["seconds"]) * 1000 > min_ms
+        mem_ratio = None
+        if row.get("peak_mb") is not None and old.get("peak_mb"):
+            mem_ratio = row["peak_mb"] / old["peak_mb"]
+        bigger = mem_ratio is not None and mem_ratio > threshold and row["peak_mb"] - old["peak_mb"] > 1
+        flag = "  REGRESSION" if slower or bigger else ""
+        mem = f"{mem_ratio:>6.2f}x" if mem_ratio is not None else f"{'-':>7}"
+        print(f"{row['case']:<36} {row['records']:>9} {old['seconds']:>9.4f} {row['seconds']:>9.4f} "
+              f"{time_ratio:>6.2f}x {old.get('peak_mb', 0):>8.1f} {row.get('peak_mb', 0):>8.1f} {mem}{flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated record counts")
+    ap.add_argument("--accounts", type=int, default=200)
+    ap.add_argument("--regions", type=int, default=4)
+    ap.add_argument("--dbs-per-instance", type=int, default=2)
+    ap.add_argument("--tag-cardinality", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    ap.add_argument("--cases", default="", help="comma-separated case name prefixes to run (default all)")
+    ap.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc run")
+    ap.add_argument("--json", dest="json_out", help="write results (same format as a baseline) to this file")
+    ap.add_argument("--save-baseline", help="write results to this baseline file")
+    ap.add_argument("--compare", help="baseline file to compare against; exit 1 on regression")
+    ap.add_argument("--threshold", type=float, default=1.25, help="slowdown / memory ratio that counts as a regression")
+    ap.add_argument("--min-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = ap.parse_args()
+
+    params = {k: getattr(args, k) for k in ("accounts", "regions", "dbs_per_instance", "tag_cardinality")}
+    selected = [c.strip() for c in args.cases.split(",") if c.strip()]
+    results = []
+    print(f"{'case':<36} {'records':>9} {'seconds':>9} {'peak MB':>8}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        records = list(generate_records(
+            n, accounts=args.accounts, regions=args.regions,
+            dbs_per_instance=args.dbs_per_instance, tag_cardinality=args.tag_cardinality,
+        ))
+        for name, fn in cases(records):
+            if selected and not any(name.startswith(s) for s in selected):
+                continue
+            row = {"case": name, "records": n, **measure(fn, args.repeat, args.memory)}
+            results.append(row)
+            peak = f"{row['peak_mb']:>8.1f}" if "peak_mb" in row else f"{'-':>8}"
+            print(f"{name:<36} {n:>9} {row['seconds']:>9.4f} {peak}")
+        del records
+        api_handler._RECORD_INDEXES.clear()
+
+    doc = {
+        "schema_version": 1,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "params": params,
+        "results": results,
+    }
+    for path in filter(None, (args.json_out, args.save_baseline)):
+        Path(path).write_text(json.dumps(doc, indent=2) + "\n")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("params") != params:
+            print(f"warning: baseline was run with {baseline.get('params')}", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare} ({baseline.get('commit')})")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} ({baseline.get('commit')})")
+
+
+if __name__ == "__main__":
+    main()
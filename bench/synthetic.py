@@ -0,0 +1,117 @@
+"""
+Synthetic inventory records shaped like discovery_handler output, for local benchmarks.
+
+Deterministic for a given seed, so runs on different commits compare like for like.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+REGIONS = ["eu-west-1", "eu-central-1", "ap-south-1", "us-east-1", "us-west-2", "ap-southeast-2"]
+INSTANCE_TYPES = ["t3.medium", "t3.large", "m5.large", "m5.xlarge", "r5.large", "r5.2xlarge", "c5.xlarge"]
+ENGINES = [
+    ("mysql", ["5.7.44", "8.0.35", "8.0.36"], 3306),
+    ("postgres", ["13.14", "14.11", "15.6", "16.2"], 5432),
+    ("mongodb", ["5.0.24", "6.0.13", "7.0.5"], 27017),
+]
+ENVIRONMENTS = ["production", "staging", "development", "test"]
+
+
+def generate_records(
+    n_records,
+    accounts=200,
+    regions=4,
+    dbs_per_instance=2,
+    tag_cardinality=50,
+    seed=42,
+):
+    """Yield ``n_records`` inventory rows spread over accounts x regions.
+
+    Each instance carries ``dbs_per_instance`` rows (the last instance may be short). Tag values
+    are drawn from ``tag_cardinality`` distinct teams/apps so tag indexes see realistic repetition.
+    A small share of instances are failed probes or hosts with no database, as in real snapshots.
+    """
+    rng = random.Random(seed)
+    account_ids = [f"{100000000000 + i * 7919:012d}" for i in range(accounts)]
+    region_names = REGIONS[: max(1, min(regions, len(REGIONS)))]
+    base_ts = datetime(2025, 1, 1)
+    produced = 0
+    n_instance = 0
+    while produced < n_records:
+        n_instance += 1
+        account_id = account_ids[rng.randrange(len(account_ids))]
+        region = region_names[rng.randrange(len(region_names))]
+        instance_id = f"i-{rng.getrandbits(68):017x}"
+        team = f"team-{rng.randrange(tag_cardinality)}"
+        tags = {
+            "Name": f"{team}-db-{n_instance}",
+            "Environment": rng.choice(ENVIRONMENTS),
+            "Team": team,
+            "CostCenter": f"cc-{rng.randrange(tag_cardinality):04d}",
+        }
+        common = {
+            "account_id": account_id,
+            "instance_id": instance_id,
+            "region": region,
+            "instance_type": rng.choice(INSTANCE_TYPES),
+            "tags": tags,
+            "system_memory_mb": rng.choice([4096, 8192, 16384, 32768, 65536]),
+            "system_cpu_cores": rng.choice([2, 4, 8, 16]),
+            "discovery_timestamp": (base_ts + timedelta(seconds=rng.randrange(86400))).isoformat() + "Z",
+            "ec2_state": "running" if rng.random() < 0.9 else "stopped",
+        }
+        roll = rng.random()
+        if roll < 0.03:
+            rows = [dict(common, db_id="discovery_failed", engine="n/a", version="n/a", status="failed",
+                         port=0, data_size_mb=0, discovery_status="failed", error="TimedOut")]
+        elif roll < 0.10:
+            rows = [dict(common, db_id="none", engine="none", version="n/a", status="none",
+                         port=0, data_size_mb=0, discovery_status="success")]
+        else:
+            rows = []
+            for _ in range(dbs_per_instance):
+                engine, versions, port = ENGINES[rng.randrange(len(ENGINES))]
+                rows.append(dict(
+                    common,
+                    db_id=f"{engine}-{port}",
+                    engine=engine,
+                    version=rng.choice(versions),
+                    status="running" if rng.random() < 0.85 else "installed",
+                    port=port,
+                    data_size_mb=rng.randrange(10, 500000),
+                    discovery_status="success",
+                ))
+        for row in rows[: n_records - produced]:
+            produced += 1
+            yield row
+
+
+def probe_outputs(records):
+    """SSM stdout per instance for ``records`` (as discovery_python.py prints it), for parse benchmarks.
+
+    Returns [(output_str, instance_id, account_id, region, instance_details)], the arguments of
+    discovery_handler.parse_discovery_output. Failed probes become error documents.
+    """
+    by_instance = {}
+    for r in records:
+        by_instance.setdefault(r["instance_id"], []).append(r)
+    calls = []
+    for instance_id, rows in by_instance.items():
+        first = rows[0]
+        if first.get("discovery_status") == "failed":
+            doc = {"discovery_status": "error", "error": first.get("error", "failed")}
+        else:
+            doc = {
+                "discovery_status": "success",
+                "system_memory_mb": first["system_memory_mb"],
+                "system_cpu_cores": first["system_cpu_cores"],
+                "databases": [
+                    {k: r[k] for k in ("db_id", "engine", "version", "status", "port", "data_size_mb")}
+                    for r in rows
+                    if r["db_id"] != "none"
+                ],
+            }
+        output = f"download: s3://bucket/discovery_python.py to /tmp/discovery_python.py\n{json.dumps(doc)}\n"
+        details = {instance_id: {k: first[k] for k in ("instance_type", "tags", "ec2_state")}}
+        calls.append((output, instance_id, first["account_id"], first["region"], details))
+    return calls
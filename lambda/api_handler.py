@@ -1,11 +1,56 @@
+import base64
+import codecs
+import csv
+import gzip
+import hashlib
+import importlib
+import io
 import json
 import logging
 import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from itertools import accumulate, chain, compress
 
-import boto3
 from botocore.exceptions import ClientError
 
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    boto3 (with s3transfer) is most of this module's import time; routes answered from the warm
+    caches never touch it, and a cold start only pays for it when the first client is created.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+boto3 = _LazyModule("boto3")
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed to read zstd snapshots
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-encoded only
+    brotli = None
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -20,20 +65,178 @@ AWS_REGION = os.environ.get("AWS_REGION", "ap-south-1")
 S3_BUCKET = os.environ.get("S3_BUCKET", "")
 RESULTS_S3_BUCKET = os.environ.get("RESULTS_S3_BUCKET", "") or S3_BUCKET
 RESULTS_S3_KEY = os.environ.get("RESULTS_S3_KEY", "discovery/inventory.json")
+# Must match the discovery Lambda. "partitioned" reads RESULTS_MANIFEST_KEY and only the
+# region/account partitions a request needs instead of the whole inventory object.
+RESULTS_LAYOUT = os.environ.get("RESULTS_LAYOUT", "single").strip().lower()
+RESULTS_MANIFEST_KEY = os.environ.get("RESULTS_MANIFEST_KEY", "discovery/manifest.json")
+PARTITION_READ_WORKERS = max(1, int(os.environ.get("PARTITION_READ_WORKERS", "8")))
+# Written by discovery after each snapshot; /health, /regions, /accounts and /summary read only this
+# when the request has no record filters. Missing summary = fall back to scanning records.
+SUMMARY_S3_KEY = os.environ.get("SUMMARY_S3_KEY", "discovery/summary.json")
+# Run history written by discovery (HISTORY_S3_PREFIX/index.json): /history lists runs, /changes diffs them.
+HISTORY_S3_PREFIX = os.environ.get("HISTORY_S3_PREFIX", "discovery/history").rstrip("/")
+# Parsed snapshot objects live across warm invocations; after this many seconds they are revalidated
+# with a conditional GET (IfNoneMatch) and a 304 keeps the parsed copy. 0 = revalidate every request.
+INVENTORY_CACHE_TTL_SECONDS = float(os.environ.get("INVENTORY_CACHE_TTL_SECONDS", "60"))
+# Filter indexes are built once per loaded records list and kept for this many lists (the whole
+# snapshot, plus region/account subsets in the partitioned layout).
+RECORD_INDEX_CACHE_ENTRIES = max(1, int(os.environ.get("RECORD_INDEX_CACHE_ENTRIES", "8")))
+# Largest ?limit= accepted by /databases and /accounts/{id}; without limit the full result is returned.
+API_MAX_PAGE_SIZE = max(1, int(os.environ.get("API_MAX_PAGE_SIZE", "5000")))
+# "columnar" keeps parsed snapshots in a RecordStore (dictionary-encoded columns, shared tag dicts),
+# a fraction of the memory of one dict per row; "list" keeps plain dicts.
+INVENTORY_STORE = os.environ.get("INVENTORY_STORE", "columnar").strip().lower()
 SPOKE_ROLE_NAME = os.environ.get("SPOKE_ROLE_NAME", "DBDiscoverySpokeRole")
 # Live EC2 state for /instances (red/green UI). Requires API Lambda IAM: sts:AssumeRole on spoke role.
 API_ENRICH_EC2_STATE = os.environ.get("API_ENRICH_EC2_STATE", "true").lower() in ("1", "true", "yes")
+# Live states are cached per (account, region, instance) for this many seconds across warm requests.
+EC2_STATE_CACHE_TTL_SECONDS = float(os.environ.get("EC2_STATE_CACHE_TTL_SECONDS", "30"))
+EC2_STATE_WORKERS = max(1, int(os.environ.get("EC2_STATE_WORKERS", "8")))
+# Enrichment waits at most this long; instances not answered by then keep the snapshot ec2_state.
+EC2_STATE_BUDGET_SECONDS = float(os.environ.get("EC2_STATE_BUDGET_SECONDS", "2.5"))
 API_VERSION = "2.3"
+# Assumed-role credentials are cached per account and reused until this many seconds before expiry.
+SPOKE_CREDENTIAL_REFRESH_SECONDS = int(os.environ.get("SPOKE_CREDENTIAL_REFRESH_SECONDS", "300"))
+# API_COMPRESSION=true sends responses of at least API_COMPRESS_MIN_BYTES br/gzip (per Accept-Encoding) as
+# base64. Opt-in: a REST API needs Binary Media Types "*/*" first, or clients get the base64 text.
+API_COMPRESSION = os.environ.get("API_COMPRESSION", "false").lower() in ("1", "true", "yes")
+API_COMPRESS_MIN_BYTES = int(os.environ.get("API_COMPRESS_MIN_BYTES", "1024"))
+# Encoded bodies kept by (ETag, encoding) so repeat requests skip serialization and compression.
+API_RESPONSE_CACHE_MB = float(os.environ.get("API_RESPONSE_CACHE_MB", "32"))
+# /export: results up to EXPORT_INLINE_MAX_BYTES are returned in the response (API Gateway caps it at
+# 6 MB); larger ones are streamed to EXPORT_S3_BUCKET/EXPORT_S3_PREFIX and answered with a presigned URL.
+EXPORT_INLINE_MAX_BYTES = int(os.environ.get("EXPORT_INLINE_MAX_BYTES", str(4 * 1024 * 1024)))
+EXPORT_S3_BUCKET = os.environ.get("EXPORT_S3_BUCKET", "") or RESULTS_S3_BUCKET
+EXPORT_S3_PREFIX = os.environ.get("EXPORT_S3_PREFIX", "exports/")
+EXPORT_URL_TTL_SECONDS = int(os.environ.get("EXPORT_URL_TTL_SECONDS", "900"))
+# Work done during Lambda init (before the first request), comma-separated: "s3" creates the S3
+# client, "summary" also reads the summary object, "records" loads the whole snapshot and builds its
+# filter index. Pick what the busiest routes need (e.g. "s3,summary" for a dashboard on /summary);
+# default none.
+API_PREWARM = {p.strip().lower() for p in os.environ.get("API_PREWARM", "").split(",") if p.strip()}
+
+# Warm-container caches: (account_id, role_name) -> STS Credentials, (account_id, region, service) -> client.
+_SPOKE_CREDENTIALS = {}
+_SPOKE_CLIENTS = {}
+_SPOKE_CACHE_LOCK = threading.Lock()
+# (account_id, region, instance_id) -> (state, monotonic time fetched)
+_EC2_STATE_CACHE = {}
+_EC2_STATE_LOCK = threading.Lock()
+
+# S3 key -> {"etag", "value", "checked_at"}; one lock per key so concurrent callers share a refresh.
+_OBJECT_CACHE = {}
+_OBJECT_LOCKS = {}
+_OBJECT_CACHE_LOCK = threading.Lock()
+_S3_CLIENT = None
+_STS_CLIENT = None
 
+# id(records list) -> RecordIndex, least recently used first. The index holds the list, so an id
+# can't be reused while its entry is alive; a refreshed snapshot is a new list and gets a new index.
+_RECORD_INDEXES = OrderedDict()
+# tuple(partition keys) -> (partition lists, merged list), so repeat requests reuse one list (and index).
+_MERGED_RECORDS = OrderedDict()
+_RECORD_INDEX_LOCK = threading.Lock()
+# (etag, encoding) -> (body, is_base64, content_encoding), least recently used first.
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_LOCK = threading.Lock()
+# (snapshot version, query hash) -> matching records in page order, so later pages are a slice.
+_PAGE_ORDERS = OrderedDict()
+# (snapshot version, query hash) -> /aggregate body or /summary built from records, least recently used first.
+_AGGREGATES = OrderedDict()
+# run_id -> (key hashes, fingerprints) of a history run; fingerprint files never change once written.
+_FINGERPRINTS = OrderedDict()
+_FINGERPRINT_CACHE_RUNS = 3
+# (since run_id, to run_id) -> /changes response body.
+_CHANGES = OrderedDict()
+
+
+def _choose_encoding(accept_encoding):
+    """br (when the brotli package is bundled) or gzip if the client accepts it, else None."""
+    if not API_COMPRESSION or not accept_encoding:
+        return None
+    accepted = set()
+    for part in str(accept_encoding).split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
 
-def http_response(status_code, body, is_json=True):
+
+def _encode_body(payload, encoding):
+    raw = payload.encode("utf-8")
+    if encoding == "br":
+        raw = brotli.compress(raw, quality=5)
+    else:
+        raw = gzip.compress(raw, compresslevel=6)
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _remember_response(key, value):
+    limit = API_RESPONSE_CACHE_MB * 1024 * 1024
+    if len(value[0]) > limit:
+        return
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = value
+        _RESPONSE_CACHE.move_to_end(key)
+        while sum(len(v[0]) for v in _RESPONSE_CACHE.values()) > limit:
+            _RESPONSE_CACHE.popitem(last=False)
+
+
+def http_response(status_code, body, is_json=True, etag=None, accept_encoding=None, content_type=None, extra_headers=None):
+    """API Gateway proxy response; JSON bodies are br/gzip-compressed (base64) when the client allows.
+
+    ``content_type`` sends ``body`` as text of that type (compressed like JSON). With ``etag`` the
+    header is set and the encoded body is cached under (etag, encoding), so the same response is not
+    serialized or compressed again.
+    """
     headers = dict(CORS_HEADERS)
-    if is_json:
-        headers["Content-Type"] = "application/json"
+    headers.update(extra_headers or {})
+    is_text = is_json or content_type is not None
+    encoding = _choose_encoding(accept_encoding) if is_text else None
+    if etag:
+        # Browsers keep the body and revalidate with If-None-Match on every refresh.
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+    if is_text and API_COMPRESSION:
+        headers["Vary"] = "Accept-Encoding"
+
+    cached = None
+    if etag:
+        with _RESPONSE_CACHE_LOCK:
+            cached = _RESPONSE_CACHE.get((etag, encoding))
+            if cached:
+                _RESPONSE_CACHE.move_to_end((etag, encoding))
+    if cached:
+        payload, is_base64, content_encoding = cached
+    elif is_text:
         payload = json.dumps(body) if not isinstance(body, str) else body
+        is_base64, content_encoding = False, None
+        if encoding and len(payload) >= API_COMPRESS_MIN_BYTES:
+            payload, is_base64, content_encoding = _encode_body(payload, encoding), True, encoding
+        if etag:
+            _remember_response((etag, encoding), (payload, is_base64, content_encoding))
     else:
         payload = body if body is not None else ""
-    return {"statusCode": status_code, "headers": headers, "body": payload}
+        is_base64, content_encoding = False, None
+
+    if is_text:
+        headers["Content-Type"] = content_type or "application/json"
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    response = {"statusCode": status_code, "headers": headers, "body": payload}
+    if is_base64:
+        response["isBase64Encoded"] = True
+    return response
 
 
 def to_json_serializable(obj):
@@ -43,38 +246,740 @@ def to_json_serializable(obj):
         return {k: to_json_serializable(v) for k, v in obj.items()}
     if isinstance(obj, list):
         return [to_json_serializable(v) for v in obj]
+    if isinstance(obj, _RecordSequence):
+        # Rows parsed from JSON snapshots hold only JSON types already.
+        return list(obj)
     return obj
 
 
-def load_all_records():
-    if not RESULTS_S3_BUCKET:
-        logger.error("RESULTS_S3_BUCKET or S3_BUCKET is not set")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class _StreamingBodyIO(io.RawIOBase):
+    """Adapt a botocore StreamingBody (read(n) only) to io so it can be buffered and gunzipped."""
+
+    def __init__(self, body):
+        self._body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._body.read(len(b))
+        b[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def _open_snapshot_stream(body):
+    """Buffered, decompressed stream over an S3 body (plain, gzip or zstd, detected by magic bytes)."""
+    stream = io.BufferedReader(_StreamingBodyIO(body), buffer_size=1 << 16)
+    magic = stream.peek(4)[:4]
+    if magic[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("snapshot is zstd-compressed but the zstandard package is not installed")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream), buffer_size=1 << 16)
+    return stream
+
+
+_JSON_DECODER = json.JSONDecoder()
+# An NDJSON header line is short; a longer first line is the start of a schema_version 1 document.
+_NDJSON_HEADER_MAX_BYTES = 1 << 16
+
+
+class _JsonChunks:
+    """Text of a binary stream decoded one chunk at a time, read as a sequence of JSON tokens/values.
+
+    Only the unread part of the current chunk (plus any value cut at its end) is held, so a
+    schema_version 1 document is parsed one record at a time instead of as one string.
+    """
+
+    _CHUNK = 1 << 16
+
+    def __init__(self, stream, head=b""):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = self._decoder.decode(head)
+        self._pos = 0
+
+    def _more(self):
+        data = self._stream.read(self._CHUNK)
+        self._buf = self._buf[self._pos:] + self._decoder.decode(data, final=not data)
+        self._pos = 0
+        return bool(data)
+
+    def peek(self):
+        """Next non-whitespace character without consuming it; "" at the end of the stream."""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._more():
+                return ""
+
+    def take(self, char):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            if end == len(self._buf) and self._more():
+                continue  # a number at the end of the chunk may go on in the next one
+            self._pos = end
+            return value
+
+
+def _iter_json_array(chunks):
+    chunks.take("[")
+    if chunks.peek() == "]":
+        chunks.take("]")
+        return
+    while True:
+        yield chunks.value()
+        if chunks.peek() != ",":
+            chunks.take("]")
+            return
+        chunks.take(",")
+
+
+def _iter_document_records(chunks):
+    """Records of a schema_version 1 document ({..., "records": [...]}) or a bare list, one at a time."""
+    first = chunks.peek()
+    if first == "[":
+        items = _iter_json_array(chunks)
+    elif first == "{":
+        items = _iter_document_fields(chunks)
+    else:
+        chunks.value()  # a scalar holds no records; empty or invalid input raises
+        return
+    for record in items:
+        if isinstance(record, dict):
+            yield record
+
+
+def _iter_document_fields(chunks):
+    chunks.take("{")
+    if chunks.peek() == "}":
+        return
+    while True:
+        key = chunks.value()
+        chunks.take(":")
+        if key == "records" and chunks.peek() == "[":
+            yield from _iter_json_array(chunks)
+        else:
+            chunks.value()
+        if chunks.peek() != ",":
+            chunks.take("}")
+            return
+        chunks.take(",")
+
+
+def iter_snapshot_records(body):
+    """Yield records from a snapshot body: schema_version 1 JSON or NDJSON, plain, gzip or zstd.
+
+    Compression is detected from the magic bytes (Content-Encoding is not needed). NDJSON is parsed
+    line by line and a schema_version 1 document record by record, so only one record's text is in
+    memory at a time.
+    """
+    stream = _open_snapshot_stream(body)
+    first = stream.readline(_NDJSON_HEADER_MAX_BYTES)
+    try:
+        head = json.loads(first) if first.endswith(b"\n") else None
+    except json.JSONDecodeError:
+        head = None
+    if isinstance(head, dict) and head.get("format") == "ndjson":
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    yield record
+        return
+    yield from _iter_document_records(_JsonChunks(stream, first))
+
+
+def _s3_client():
+    global _S3_CLIENT
+    with _OBJECT_CACHE_LOCK:
+        if _S3_CLIENT is None:
+            _S3_CLIENT = boto3.client("s3", region_name=AWS_REGION)
+        return _S3_CLIENT
+
+
+def _object_lock(key):
+    with _OBJECT_CACHE_LOCK:
+        lock = _OBJECT_LOCKS.get(key)
+        if lock is None:
+            lock = _OBJECT_LOCKS[key] = threading.Lock()
+        return lock
+
+
+def _cached_s3_object(key, parse, missing, max_age=None, optional=False):
+    """Parsed S3 object, kept across warm invocations and revalidated by ETag after the TTL.
+
+    ``parse`` turns the response body into the cached value; ``missing`` is cached when the key does
+    not exist. Without s3:ListBucket, S3 answers a missing key with 403 AccessDenied; ``optional``
+    objects (summary, manifest, history, partitions) treat that as missing too. A 304 from the
+    conditional GET only resets the TTL clock. A fresh entry is returned without taking the key's
+    lock, so readers never wait behind a refresh of that key.
+    """
+    max_age = INVENTORY_CACHE_TTL_SECONDS if max_age is None else max_age
+    entry = _OBJECT_CACHE.get(key)
+    if entry and time.monotonic() - entry["checked_at"] < max_age:
+        return entry["value"]
+    with _object_lock(key):
+        entry = _OBJECT_CACHE.get(key)
+        now = time.monotonic()
+        if entry and now - entry["checked_at"] < max_age:
+            return entry["value"]
+        params = {"Bucket": RESULTS_S3_BUCKET, "Key": key}
+        if entry and entry["etag"]:
+            params["IfNoneMatch"] = entry["etag"]
+        try:
+            resp = _s3_client().get_object(**params)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if entry and (code in ("304", "NotModified") or status == 304):
+                entry["checked_at"] = now
+                return entry["value"]
+            denied = code in ("AccessDenied", "403") or status == 403
+            if code not in ("NoSuchKey", "404", "NotFound") and not (optional and denied):
+                logger.exception("S3 get_object failed: %s", e)
+                raise
+            value, etag = missing, None
+        else:
+            value, etag = parse(key, resp["Body"]), resp.get("ETag")
+        if entry and entry["value"] is not value:
+            _forget_records(entry["value"])
+        _OBJECT_CACHE[key] = {
+            "etag": etag, "value": value, "checked_at": now, "parse": parse, "missing": missing, "optional": optional,
+        }
+        return value
+
+
+def refresh_cached_objects():
+    """Revalidate every cached object now (conditional GETs); returns the keys whose content changed.
+
+    For long-running processes (api_server.py) that refresh in the background instead of per request.
+    """
+    changed = []
+    for key, entry in list(_OBJECT_CACHE.items()):
+        try:
+            value = _cached_s3_object(key, entry["parse"], entry["missing"], max_age=0, optional=entry["optional"])
+        except Exception as e:
+            logger.warning("Refresh of %s failed; keeping the cached copy: %s", key, e)
+            continue
+        if value is not entry["value"]:
+            changed.append(key)
+    return changed
+
+
+# Largest code each array typecode can hold; a column widens its code array when it outgrows it.
+_CODE_LIMITS = (("B", 0xFF), ("H", 0xFFFF), ("I", 0xFFFFFFFF))
+
+
+def _value_key(value):
+    # type() keeps 1, 1.0 and True apart. Tag dicts of strings key on their items (order included);
+    # anything else nested keys on its JSON text.
+    if type(value) is str:
+        return value
+    if type(value) is dict and all(type(v) is str for v in value.values()):
+        return (dict, *chain.from_iterable(value.items()))
+    if isinstance(value, (dict, list)):
+        return (list, json.dumps(value, separators=(",", ":"), default=str))
+    return (type(value), value)
+
+
+def _interned(value):
+    """Tag dicts and lists with their strings interned, so distinct dicts share keys and common values."""
+    if isinstance(value, dict):
+        return {sys.intern(k) if isinstance(k, str) else k: _interned(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_interned(v) for v in value]
+    if isinstance(value, str) and len(value) <= 64:
+        return sys.intern(value)
+    return value
+
+
+class _Column:
+    """Dictionary-encoded values of one key: ``values[codes[row]]``; code 0 means the key is absent."""
+
+    __slots__ = ("codes", "values", "lookup")
+
+    def __init__(self, length=0):
+        self.codes = array("B", bytes(length))
+        self.values = [None]
+        self.lookup = {}
+
+    def add(self, value, key):
+        """Code for a value not in ``lookup`` yet (widens the code array when needed)."""
+        if self.lookup is None:
+            self.lookup = {_value_key(v): code for code, v in enumerate(self.values) if code}
+            code = self.lookup.get(key)
+            if code is not None:
+                return code
+        if isinstance(value, (dict, list)):
+            # Key on the interned copy so the lookup does not keep the parsed strings alive.
+            value = _interned(value)
+            key = _value_key(value)
+        code = self.lookup[key] = len(self.values)
+        self.values.append(value)
+        for typecode, limit in _CODE_LIMITS:
+            if code <= limit:
+                if typecode != self.codes.typecode:
+                    self.codes = array(typecode, self.codes)
+                break
+        return code
+
+    def freeze(self):
+        """Drop the value lookup once loading is done; add() rebuilds it if needed."""
+        self.lookup = None
+
+
+class _RecordSequence:
+    """Read-only sequence of record dicts; rows are built from the columns on access."""
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, _RecordSequence)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<{type(self).__name__} of {len(self)} records>"
+
+    def sorted_by(self, fields):
+        """View of these rows in the order of ``sorted(rows, key=(str(row.get(f) or "") for f in fields))``.
+
+        Each field is ranked once per distinct value, so rows are never materialized.
+        """
+        store, positions = self._store_positions()
+        ranks = []
+        for field in fields:
+            column = store.column(field)
+            if column is None:
+                continue
+            texts = [str(v or "") for v in column.values]
+            order = {t: n for n, t in enumerate(sorted(set(texts)))}
+            ranks.append((len(order), [order[t] for t in texts], column.codes))
+        keys = []
+        for pos in positions:
+            key = 0
+            for width, rank, codes in ranks:
+                key = key * width + rank[codes[pos]]
+            keys.append(key)
+        order = sorted(range(len(positions)), key=keys.__getitem__)
+        return RecordView(store, array("I", (positions[i] for i in order)))
+
+
+class RecordStore(_RecordSequence):
+    """Column-oriented inventory rows (INVENTORY_STORE=columnar).
+
+    Every key gets a dictionary-encoded _Column, so region, account, engine, version, instance type
+    and identical tag dicts are stored once; a row is a small integer per column plus a key-layout
+    code that restores the original key order. Rows come back as fresh dicts (tag dicts are shared
+    and must not be mutated).
+    """
+
+    def __init__(self, records=()):
+        self._columns = {}
+        self._layouts = _Column()
+        self._size = 0
+        for record in records:
+            self.append(record)
+        for column in self._columns.values():
+            column.freeze()
+        self._layouts.freeze()
+
+    def append(self, record):
+        if not isinstance(record, dict):
+            raise TypeError("RecordStore holds dict records only")
+        columns = self._columns
+        for key in record:
+            if key not in columns:
+                columns[key] = _Column(self._size)
+        # Hot loop when loading a snapshot: one code per column, lookups inlined.
+        for key, column in columns.items():
+            if key in record:
+                value = record[key]
+                vkey = value if type(value) is str else _value_key(value)
+                code = column.lookup.get(vkey) if column.lookup is not None else None
+                if code is None:
+                    code = column.add(value, vkey)
+                column.codes.append(code)
+            else:
+                column.codes.append(0)
+        layouts = self._layouts
+        layout = tuple(record)
+        lkey = (tuple, layout)
+        code = layouts.lookup.get(lkey) if layouts.lookup is not None else None
+        if code is None:
+            code = layouts.add(layout, lkey)
+        layouts.codes.append(code)
+        self._size += 1
+
+    def column(self, key):
+        return self._columns.get(key)
+
+    def view(self, positions):
+        return RecordView(self, positions)
+
+    def _store_positions(self):
+        return self, range(self._size)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RecordView(self, array("I", range(*i.indices(self._size))))
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("record index out of range")
+        columns = self._columns
+        record = {}
+        for key in self._layouts.values[self._layouts.codes[i]]:
+            column = columns[key]
+            record[key] = column.values[column.codes[i]]
+        return record
+
+
+class RecordView(_RecordSequence):
+    """Selected rows of a RecordStore (filter results, pages), held as positions."""
+
+    def __init__(self, store, positions):
+        self.store = store
+        self.positions = positions
+
+    def _store_positions(self):
+        return self.store, self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RecordView(self.store, self.positions[i])
+        return self.store[self.positions[i]]
+
+
+def _new_records(records):
+    if INVENTORY_STORE == "columnar":
+        return RecordStore(records)
+    return list(records)
+
+
+def _parse_records(key, body):
+    try:
+        return _new_records(iter_snapshot_records(body))
+    except (ValueError, EOFError, gzip.BadGzipFile) as e:
+        logger.error("Invalid JSON in inventory object %s: %s", key, e)
         return []
 
-    s3 = boto3.client("s3", region_name=AWS_REGION)
+
+def _parse_json_object(key, body):
     try:
-        resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=RESULTS_S3_KEY)
-        raw = resp["Body"].read().decode("utf-8")
-        data = json.loads(raw)
-    except ClientError as e:
-        code = e.response.get("Error", {}).get("Code", "")
-        if code in ("NoSuchKey", "404", "NotFound"):
-            return []
-        logger.exception("S3 get_object failed: %s", e)
-        raise
+        data = json.loads(body.read().decode("utf-8"))
     except json.JSONDecodeError as e:
-        logger.error("Invalid JSON in inventory object: %s", e)
+        logger.error("Invalid JSON in %s: %s", key, e)
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def load_manifest():
+    """Partition manifest written by discovery (RESULTS_LAYOUT=partitioned), or None."""
+    if not RESULTS_S3_BUCKET or RESULTS_LAYOUT != "partitioned":
+        return None
+    manifest = _cached_s3_object(RESULTS_MANIFEST_KEY, _parse_json_object, None, optional=True)
+    if manifest:
+        # Partitions of older runs are never read again once the manifest moved on. The history
+        # index and the copies of runs it still lists stay.
+        live = {p.get("key") for p in manifest.get("partitions", []) if isinstance(p, dict)}
+        live.update((RESULTS_MANIFEST_KEY, RESULTS_S3_KEY, SUMMARY_S3_KEY, _history_index_key()))
+        history = (_OBJECT_CACHE.get(_history_index_key()) or {}).get("value") or {}
+        runs = tuple(
+            f"{HISTORY_S3_PREFIX}/{r['run_id']}/"
+            for r in history.get("runs", [])
+            if isinstance(r, dict) and r.get("run_id")
+        )
+        with _OBJECT_CACHE_LOCK:
+            dropped = [_OBJECT_CACHE.pop(k) for k in list(_OBJECT_CACHE) if k not in live and not k.startswith(runs)]
+        for entry in dropped:
+            _forget_records(entry["value"])
+    return manifest
+
+
+def load_records(region=None, account_id=None):
+    """Records limited to a region and/or account where the layout allows reading less.
+
+    Partitioned layout: only matching partitions are downloaded (in parallel). Single layout: the
+    whole snapshot via load_all_records(); callers still apply their own filters.
+    """
+    if RESULTS_LAYOUT != "partitioned":
+        return load_all_records()
+    manifest = load_manifest()
+    if not manifest:
+        return []
+    keys = [
+        p["key"]
+        for p in manifest.get("partitions", [])
+        if isinstance(p, dict)
+        and p.get("key")
+        and (not region or p.get("region") == region)
+        and (not account_id or p.get("account_id") == account_id)
+    ]
+    return _partition_records(keys)
+
+
+def _partition_records(keys):
+    """Records of these partition objects, downloaded in parallel and cached per key."""
+    if not keys:
+        return []
+    with ThreadPoolExecutor(max_workers=min(PARTITION_READ_WORKERS, len(keys))) as pool:
+        parts = list(pool.map(lambda k: _cached_s3_object(k, _parse_records, [], optional=True), keys))
+    if len(parts) == 1:
+        return parts[0]
+    return _merged_records(tuple(keys), parts)
+
+
+def _merged_records(keys, parts):
+    """One list for these partitions, reused while every partition is still the same cached object.
+
+    A merged RecordStore becomes the only copy of the rows: each partition's cache entry is
+    re-pointed to a RecordView of its slice, and the partition's own store is released.
+    """
+    with _RECORD_INDEX_LOCK:
+        entry = _MERGED_RECORDS.get(keys)
+        if entry and len(entry[0]) == len(parts) and all(a is b for a, b in zip(entry[0], parts)):
+            _MERGED_RECORDS.move_to_end(keys)
+            return entry[1]
+    records = _new_records(r for part in parts for r in part)
+    if isinstance(records, RecordStore):
+        views, start = [], 0
+        for part in parts:
+            views.append(records.view(range(start, start + len(part))))
+            start += len(part)
+        replaced = []
+        with _OBJECT_CACHE_LOCK:
+            for n, (key, part) in enumerate(zip(keys, parts)):
+                entry = _OBJECT_CACHE.get(key)
+                if entry and entry["value"] is part:
+                    entry["value"] = views[n]
+                    replaced.append(n)
+        for n in replaced:
+            _forget_records(parts[n])  # also drops other merges over it; they can no longer match
+        parts = tuple(views[n] if n in replaced else part for n, part in enumerate(parts))
+    with _RECORD_INDEX_LOCK:
+        _MERGED_RECORDS[keys] = (parts, records)
+        _MERGED_RECORDS.move_to_end(keys)
+        while len(_MERGED_RECORDS) > RECORD_INDEX_CACHE_ENTRIES:
+            _MERGED_RECORDS.popitem(last=False)
+    return records
+
+
+def load_all_records():
+    if not RESULTS_S3_BUCKET:
+        logger.error("RESULTS_S3_BUCKET or S3_BUCKET is not set")
         return []
+    if RESULTS_LAYOUT == "partitioned":
+        return load_records()
+    return _cached_s3_object(RESULTS_S3_KEY, _parse_records, [])
+
+
+def count_records():
+    """Total rows in the snapshot; the partitioned manifest answers this without reading records."""
+    manifest = load_manifest()
+    if manifest and isinstance(manifest.get("record_count"), int):
+        return manifest["record_count"]
+    return len(load_all_records())
+
+
+def snapshot_version():
+    """Identifies the loaded snapshot: manifest run_id (partitioned) or the inventory object's ETag."""
+    if RESULTS_LAYOUT == "partitioned":
+        return str((load_manifest() or {}).get("run_id") or "")
+    entry = _OBJECT_CACHE.get(RESULTS_S3_KEY)
+    return str((entry or {}).get("etag") or "")
+
+
+def load_summary():
+    """Summary written by discovery (SUMMARY_S3_KEY), or None if missing / not configured."""
+    if not RESULTS_S3_BUCKET:
+        return None
+    summary = _cached_s3_object(SUMMARY_S3_KEY, _parse_json_object, None, optional=True)
+    if summary and isinstance(summary.get("total_records"), int):
+        return summary
+    return None
+
+
+_EMPTY_DB_IDS = ("", "none", "discovery_failed")
+
+
+class SummaryBuilder:
+    """Same summary the discovery Lambda writes to SUMMARY_S3_KEY, built from loaded records."""
+
+    def __init__(self):
+        self.total_records = 0
+        self.total_databases = 0
+        self.accounts_by_region = {}
+        self.by_account = {}
+        self.instances = {}
+        self.engines = {}
+        self.db_status = {}
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            return
+        self.total_records += 1
+        region = record.get("region")
+        account_id = record.get("account_id")
+        instance_id = record.get("instance_id")
+        if region:
+            accounts = self.accounts_by_region.setdefault(region, set())
+            if account_id:
+                accounts.add(account_id)
+        account = None
+        if account_id:
+            account = self.by_account.setdefault(
+                account_id, {"records": 0, "databases": 0, "instances": set(), "regions": set()}
+            )
+            account["records"] += 1
+            if region:
+                account["regions"].add(region)
+            if instance_id:
+                account["instances"].add((region, instance_id))
+        if instance_id:
+            # Every row of an instance carries the same probe / EC2 state; the last one wins.
+            self.instances[(account_id, region, instance_id)] = (
+                str(record.get("discovery_status") or "unknown").lower(),
+                str(record.get("ec2_state") or "unknown").lower(),
+            )
+        if str(record.get("db_id") or "").strip().lower() not in _EMPTY_DB_IDS:
+            self.total_databases += 1
+            if account is not None:
+                account["databases"] += 1
+            engine = str(record.get("engine") or "unknown").lower()
+            status = str(record.get("status") or "unknown").lower()
+            self.engines[engine] = self.engines.get(engine, 0) + 1
+            self.db_status[status] = self.db_status.get(status, 0) + 1
+
+    def result(self, updated_at, **extra):
+        discovery_status, ec2_state = {}, {}
+        for probe, state in self.instances.values():
+            discovery_status[probe] = discovery_status.get(probe, 0) + 1
+            ec2_state[state] = ec2_state.get(state, 0) + 1
+        summary = {
+            "schema_version": 1,
+            "updated_at": updated_at,
+            "total_records": self.total_records,
+            "total_instances": len(self.instances),
+            "total_databases": self.total_databases,
+            "regions": sorted(self.accounts_by_region),
+            "accounts": sorted(self.by_account),
+            "accounts_by_region": {r: sorted(a) for r, a in sorted(self.accounts_by_region.items())},
+            "by_account": {
+                account_id: {
+                    "records": a["records"],
+                    "instances": len(a["instances"]),
+                    "databases": a["databases"],
+                    "regions": sorted(a["regions"]),
+                }
+                for account_id, a in sorted(self.by_account.items())
+            },
+            "engines": dict(sorted(self.engines.items())),
+            "db_status": dict(sorted(self.db_status.items())),
+            "discovery_status": dict(sorted(discovery_status.items())),
+            "ec2_state": dict(sorted(ec2_state.items())),
+        }
+        summary.update(extra)
+        return summary
+
+
+def build_summary(records, updated_at=None, **extra):
+    builder = SummaryBuilder()
+    for record in records:
+        builder.add(record)
+    return builder.result(updated_at, **extra)
+
+
+# Query parameters that apply_record_filters understands; any of them means the summary can't answer.
+_RECORD_FILTER_KEYS = (
+    "region", "account_id", "instance_id", "discovery_status", "ec2_state", "engine", "db_status", "include_empty",
+    "has_tag", "q",
+)
+
+
+def _has_record_filters(qs, ignore=()):
+    if any(_norm_text(qs.get(k)) for k in _RECORD_FILTER_KEYS if k not in ignore):
+        return True
+    return any(k.startswith("tag.") and _norm_text(v) for k, v in qs.items())
+
+
+def _tag_query(qs):
+    """(tag.<Key>=<Value> pairs with lower-cased values, has_tag keys, q search text) of a request."""
+    pairs = [
+        (k[4:], _norm_text(v).lower()) for k, v in qs.items() if k.startswith("tag.") and k[4:] and _norm_text(v)
+    ]
+    keys = [k.strip() for k in _norm_text(qs.get("has_tag")).split(",") if k.strip()]
+    return pairs, keys, _norm_text(qs.get("q")).lower()
+
+
+def _search_terms(record):
+    """Lower-cased instance_id, Name tag and db_id of a record, as ?q= sees them."""
+    tags = record.get("tags")
+    name = tags.get("Name") if isinstance(tags, dict) else None
+    db_id = _norm_text(record.get("db_id")).lower()
+    terms = [_norm_text(record.get("instance_id")).lower(), _norm_text(name).lower()]
+    if db_id not in _EMPTY_DB_IDS:
+        terms.append(db_id)
+    return [t for t in terms if t]
+
+
+def _matches_search(term, q):
+    """?q=abc matches terms containing abc; ?q=abc* only terms starting with abc."""
+    return term.startswith(q[:-1]) if q.endswith("*") else q in term
+
+
+def _total_records(summary):
+    return summary["total_records"] if summary else count_records()
+
+
+def _scoped_records(qs, account_id=None):
+    """Records for a request, narrowed by its region / account_id before filtering."""
+    return load_records(
+        region=_norm_text(qs.get("region")) or None,
+        account_id=account_id or _norm_text(qs.get("account_id")) or None,
+    )
 
-    if isinstance(data, list):
-        return [i for i in data if isinstance(i, dict)]
-    if isinstance(data, dict) and isinstance(data.get("records"), list):
-        return [i for i in data["records"] if isinstance(i, dict)]
-    return []
 
+def _filtered_records(qs, account_id=None):
+    items = _scoped_records(qs, account_id=account_id)
+    return apply_record_filters(items, qs, index=record_index(items))
 
-def query_by_account(account_id):
-    return [i for i in load_all_records() if isinstance(i, dict) and i.get("account_id") == account_id]
+
+def query_by_account(account_id, region=None):
+    items = load_records(region=region, account_id=account_id)
+    return record_index(items).select((("account_id", account_id),))
 
 
 def _norm_text(v):
@@ -100,8 +1005,12 @@ def _to_bool(v, default=None):
     return default
 
 
-def apply_record_filters(items, qs):
-    """Filter flat inventory records by common query parameters."""
+def apply_record_filters(items, qs, index=None):
+    """Filter flat inventory records by common query parameters.
+
+    With ``index`` (the RecordIndex of ``items``) the same rows come from posting-list lookups
+    instead of a scan.
+    """
     if not isinstance(qs, dict):
         qs = {}
     region_q = _norm_text(qs.get("region"))
@@ -112,6 +1021,31 @@ def apply_record_filters(items, qs):
     engine_q = canonical_engine_name(qs.get("engine"))
     db_status_q = _norm_text(qs.get("db_status")).lower()
     include_empty = _to_bool(qs.get("include_empty"), default=True)
+    tag_pairs, tag_keys, search_q = _tag_query(qs)
+    if search_q.rstrip("*") == "":
+        search_q = ""
+
+    if index is None and isinstance(items, RecordStore):
+        index = record_index(items)
+    if index is not None:
+        restrict = ()
+        if tag_pairs or tag_keys or search_q:
+            restrict = index.tag_index().lookup(tag_pairs, tag_keys, search_q)
+            if restrict is None:
+                return []
+        return index.select(
+            (
+                ("region", region_q),
+                ("account_id", account_q),
+                ("instance_id", instance_q),
+                ("discovery_status", discovery_q),
+                ("ec2_state", ec2_q),
+                ("engine", engine_q),
+                ("status", db_status_q),
+            ),
+            include_empty=include_empty,
+            restrict=restrict,
+        )
 
     out = []
     for i in items:
@@ -133,10 +1067,385 @@ def apply_record_filters(items, qs):
             continue
         if not include_empty and _norm_text(i.get("db_id")).lower() in ("", "none", "discovery_failed"):
             continue
+        if tag_pairs or tag_keys:
+            tags = i.get("tags") if isinstance(i.get("tags"), dict) else {}
+            if any(k not in tags for k in tag_keys):
+                continue
+            if any(k not in tags or _norm_text(tags[k]).lower() != v for k, v in tag_pairs):
+                continue
+        if search_q and not any(_matches_search(t, search_q) for t in _search_terms(i)):
+            continue
         out.append(i)
     return out
 
 
+class RecordIndex:
+    """Per-field value codes and posting lists (ascending positions), built once for one records list.
+
+    Values are normalized exactly as apply_record_filters compares them (region / account_id /
+    instance_id verbatim, the rest lower-cased, engine aliases folded), so select() returns the same
+    rows in the same order as the linear scan. A query walks the shortest posting list and checks the
+    other fields against their code columns.
+    """
+
+    FIELDS = ("region", "account_id", "instance_id", "discovery_status", "ec2_state", "engine", "status")
+
+    def __init__(self, records):
+        self.records = records
+        self.positions = array("I")
+        self.with_db = array("I")
+        self.has_db = array("B")
+        self.codes = {}
+        self.value_codes = {}
+        self.postings = {}
+        self._tags = None
+        self._tags_lock = threading.Lock()
+        if isinstance(records, RecordStore):
+            self._index_store(records)
+            return
+        columns = {field: [] for field in self.FIELDS}
+        for r in records:
+            if not isinstance(r, dict):
+                for column in columns.values():
+                    column.append("")
+                continue
+            # Filters compare these verbatim against a non-empty string, so other types never match.
+            region, account_id, instance_id = r.get("region"), r.get("account_id"), r.get("instance_id")
+            columns["region"].append(region if isinstance(region, str) else "")
+            columns["account_id"].append(account_id if isinstance(account_id, str) else "")
+            columns["instance_id"].append(instance_id if isinstance(instance_id, str) else "")
+            columns["discovery_status"].append(_norm_text(r.get("discovery_status")).lower())
+            columns["ec2_state"].append(_norm_text(r.get("ec2_state")).lower())
+            columns["engine"].append(canonical_engine_name(r.get("engine")))
+            columns["status"].append(_norm_text(r.get("status")).lower())
+        for pos, r in enumerate(records):
+            has_db = isinstance(r, dict) and _norm_text(r.get("db_id")).lower() not in _EMPTY_DB_IDS
+            self.has_db.append(has_db)
+            if isinstance(r, dict):
+                self.positions.append(pos)
+                if has_db:
+                    self.with_db.append(pos)
+        for field, column in columns.items():
+            value_codes = {"": 0}
+            postings = {}
+            codes = array("I")
+            for pos, value in enumerate(column):
+                code = value_codes.get(value)
+                if code is None:
+                    code = value_codes[value] = len(value_codes)
+                    postings[code] = array("I")
+                codes.append(code)
+                if code:
+                    postings[code].append(pos)
+            self.codes[field] = codes
+            self.value_codes[field] = value_codes
+            self.postings[field] = {value: postings[code] for value, code in value_codes.items() if code}
+
+    _NORMALIZERS = {
+        "region": lambda v: v if isinstance(v, str) else "",
+        "account_id": lambda v: v if isinstance(v, str) else "",
+        "instance_id": lambda v: v if isinstance(v, str) else "",
+        "discovery_status": lambda v: _norm_text(v).lower(),
+        "ec2_state": lambda v: _norm_text(v).lower(),
+        "engine": canonical_engine_name,
+        "status": lambda v: _norm_text(v).lower(),
+    }
+
+    def _index_store(self, store):
+        """Same index from RecordStore columns: each distinct value is normalized once, not per row."""
+        size = len(store)
+        self.positions = array("I", range(size))
+        for field in self.FIELDS:
+            column = store.column(field)
+            value_codes = {"": 0}
+            postings = {}
+            if column is None:
+                self.codes[field] = array("B", bytes(size))
+            else:
+                normalize = self._NORMALIZERS[field]
+                remap = [0]
+                for value in column.values[1:]:
+                    key = normalize(value)
+                    code = value_codes.setdefault(key, len(value_codes)) if key else 0
+                    remap.append(code)
+                codes = self.codes[field] = array("I", (remap[c] for c in column.codes))
+                for pos, code in enumerate(codes):
+                    if code:
+                        positions = postings.get(code)
+                        if positions is None:
+                            positions = postings[code] = array("I")
+                        positions.append(pos)
+            self.value_codes[field] = value_codes
+            self.postings[field] = {value: postings[code] for value, code in value_codes.items() if code in postings}
+        column = store.column("db_id")
+        if column is None:
+            self.has_db = array("B", bytes(size))
+        else:
+            flags = [0] + [int(_norm_text(v).lower() not in _EMPTY_DB_IDS) for v in column.values[1:]]
+            self.has_db = array("B", (flags[c] for c in column.codes))
+        self.with_db = array("I", (pos for pos, flag in enumerate(self.has_db) if flag))
+
+    def tag_index(self):
+        """TagIndex over the same records, built on the first tag / ?q= query."""
+        with self._tags_lock:
+            if self._tags is None:
+                self._tags = TagIndex(self.records)
+            return self._tags
+
+    def select(self, criteria, include_empty=True, restrict=()):
+        """Records matching every non-empty (field, value) pair, in original order.
+
+        ``restrict`` adds ascending position lists (TagIndex.lookup) the rows must also be in.
+        """
+        terms = [(len(positions), positions, None, None) for positions in restrict]
+        for field, value in criteria:
+            if not value:
+                continue
+            positions = self.postings[field].get(value)
+            if positions is None:
+                return []
+            terms.append((len(positions), positions, self.codes[field], self.value_codes[field][value]))
+        if not include_empty:
+            terms.append((len(self.with_db), self.with_db, self.has_db, 1))
+        if not terms:
+            matches = self.positions
+        else:
+            terms.sort(key=lambda t: t[0])
+            matches = terms[0][1]
+            for _, positions, codes, code in terms[1:]:
+                if codes is None:
+                    members = set(positions)
+                    matches = [pos for pos in matches if pos in members]
+                else:
+                    matches = [pos for pos in matches if codes[pos] == code]
+        records = self.records
+        if isinstance(records, RecordStore):
+            return records.view(matches if isinstance(matches, array) else array("I", matches))
+        return [records[pos] for pos in matches]
+
+
+def _value_groups(records, field):
+    """(values, codes, order, starts) for ``field``: rows with values[c] are order[starts[c]:starts[c + 1]].
+
+    Code 0 means the key is absent. RecordStore rows reuse their column codes; a list is encoded the
+    same way first. One stable sort by code keeps each group's positions ascending.
+    """
+    if isinstance(records, RecordStore):
+        column = records.column(field)
+        if column is None:
+            return [None], array("B", bytes(len(records))), array("I", range(len(records))), array("I", [0, len(records)])
+        values, codes = column.values, column.codes
+    else:
+        values, codes, lookup = [None], array("I"), {}
+        for r in records:
+            if not isinstance(r, dict) or field not in r:
+                codes.append(0)
+                continue
+            value = r[field]
+            key = value if type(value) is str else _value_key(value)
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(values)
+                values.append(value)
+            codes.append(code)
+    counts = [0] * (len(values) + 1)
+    for code in codes:
+        counts[code + 1] += 1
+    order = array("I", sorted(range(len(codes)), key=codes.__getitem__))
+    return values, codes, order, array("I", accumulate(counts))
+
+
+def _merge_positions(lists):
+    """Ascending union of ascending position lists."""
+    if len(lists) == 1:
+        return lists[0]
+    return array("I", sorted(set(chain.from_iterable(lists))))
+
+
+class TagIndex:
+    """Inverted indexes for tag filters and ?q= search over one records list.
+
+    Rows are grouped by distinct tag dict once (_value_groups). The first filter on a tag key maps
+    its lower-cased values, and the key itself, to groups, so tag filters read posting lists instead
+    of every row's tags. The first ?q= builds a sorted dictionary of lower-cased instance IDs, Name
+    tags and db_ids: a prefix query bisects it and a substring query runs str.find over the joined
+    dictionary text, so search cost depends on the number of distinct terms, not rows. Each part is
+    built on first use and kept with the snapshot.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._groups = [_value_groups(records, "tags")]
+        self._by_key = {}
+        self._terms = None
+        self._lock = threading.Lock()
+
+    def _rows(self, source, codes):
+        """Ascending positions of the rows in groups ``codes`` of ``self._groups[source]``."""
+        values, column, order, starts = self._groups[source]
+        if len(codes) == 1:
+            return order[starts[codes[0]]:starts[codes[0] + 1]]
+        if len(codes) <= 64:
+            return array("I", sorted(chain.from_iterable(order[starts[c]:starts[c + 1]] for c in codes)))
+        # Many groups: one C-level pass over the code column beats merging their slices.
+        flags = bytearray(len(values))
+        for code in codes:
+            flags[code] = 1
+        return array("I", compress(range(len(column)), map(flags.__getitem__, column)))
+
+    def _key_index(self, key):
+        """[group codes with tag ``key``, {lower-cased value: group code(s)}]; codes become rows on use."""
+        entry = self._by_key.get(key)
+        if entry is not None:
+            return entry
+        values = self._groups[0][0]
+        present, by_value = [], {}
+        for code in range(1, len(values)):
+            tags = values[code]
+            if not isinstance(tags, dict) or key not in tags:
+                continue
+            present.append(code)
+            value = tags[key]
+            value = value.strip().lower() if type(value) is str else _norm_text(value).lower()
+            # Most values (Name tags) belong to one group: keep a bare code until a second one shows up.
+            known = by_value.get(value)
+            if known is None:
+                by_value[value] = code
+            elif type(known) is int:
+                by_value[value] = [known, code]
+            else:
+                known.append(code)
+        entry = self._by_key[key] = [present, by_value]
+        return entry
+
+    def tag_rows(self, key, value=None):
+        """Rows whose tag ``key`` is present (value None) or equals lower-cased ``value``; None if none."""
+        with self._lock:
+            entry = self._key_index(key)
+            if value is None:
+                if isinstance(entry[0], list):
+                    entry[0] = self._rows(0, entry[0]) if entry[0] else None
+                return entry[0]
+            codes = entry[1].get(value)
+            if type(codes) is int:
+                codes = [codes]
+            if isinstance(codes, list):
+                codes = entry[1][value] = self._rows(0, codes)
+            return codes
+
+    def _term_index(self):
+        """Sorted ?q= terms plus where each term's rows come from, built on the first search."""
+        with self._lock:
+            if self._terms is not None:
+                return self._terms
+            # One (term, source, group code) occurrence per distinct value; no per-term objects.
+            names, sources, codes = [], array("B"), array("I")
+            values = self._groups[0][0]
+            for code in range(1, len(values)):
+                tags = values[code]
+                name = _norm_text(tags.get("Name")).lower() if isinstance(tags, dict) else ""
+                if name:
+                    names.append(name)
+                    sources.append(0)
+                    codes.append(code)
+            for field in ("instance_id", "db_id"):
+                self._groups.append(_value_groups(self.records, field))
+                values = self._groups[-1][0]
+                for code in range(1, len(values)):
+                    term = _norm_text(values[code]).lower()
+                    if term and not (field == "db_id" and term in _EMPTY_DB_IDS):
+                        names.append(term)
+                        sources.append(len(self._groups) - 1)
+                        codes.append(code)
+            occurrences = array("I", sorted(range(len(names)), key=names.__getitem__))
+            terms, first = [], array("I")
+            for k, i in enumerate(occurrences):
+                if not terms or names[i] != terms[-1]:
+                    terms.append(names[i])
+                    first.append(k)
+            first.append(len(occurrences))
+            # Terms joined by "\n" (never inside a stripped term); offsets[i] is where term i starts.
+            text = "\n".join(terms)
+            offsets = array("Q", accumulate((len(t) + 1 for t in terms), initial=0))
+            self._terms = (terms, first, occurrences, sources, codes, text, offsets)
+            return self._terms
+
+    def term_rows(self, indexes):
+        """Ascending positions of rows holding any of the terms at ``indexes`` of the dictionary."""
+        _, first, occurrences, sources, codes, _, _ = self._term_index()
+        lists = []
+        for i in indexes:
+            for k in range(first[i], first[i + 1]):
+                j = occurrences[k]
+                lists.append(self._rows(sources[j], (codes[j],)))
+        if not lists:
+            return None
+        return _merge_positions(lists)
+
+    def search(self, q):
+        """Dictionary indexes of the terms matching ?q= (prefix when it ends with *, else substring)."""
+        if "\n" in q:
+            return []
+        terms, _, _, _, _, text, offsets = self._term_index()
+        if q.endswith("*"):
+            prefix = q[:-1]
+            start = end = bisect_left(terms, prefix)
+            while end < len(terms) and terms[end].startswith(prefix):
+                end += 1
+            return range(start, end)
+        found = []
+        at = text.find(q)
+        while at != -1:
+            i = bisect_right(offsets, at) - 1
+            found.append(i)
+            # Continue after this term: each term counts once.
+            at = text.find(q, offsets[i + 1])
+        return found
+
+    def lookup(self, pairs, keys, q):
+        """Ascending position lists the rows must all be in, or None when one of them is empty."""
+        lists = [self.tag_rows(key, value) for key, value in pairs]
+        lists.extend(self.tag_rows(key) for key in keys)
+        if q:
+            lists.append(self.term_rows(self.search(q)))
+        if any(not positions for positions in lists):
+            return None
+        return lists
+
+
+def _forget_records(records):
+    """Drop indexes and merged lists built on a records list that the object cache just replaced."""
+    if not isinstance(records, (list, _RecordSequence)):
+        return
+    with _RECORD_INDEX_LOCK:
+        stale = [records]
+        for key, (parts, merged) in list(_MERGED_RECORDS.items()):
+            if any(part is records for part in parts):
+                stale.append(merged)
+                del _MERGED_RECORDS[key]
+        for lst in stale:
+            index = _RECORD_INDEXES.get(id(lst))
+            if index is not None and index.records is lst:
+                del _RECORD_INDEXES[id(lst)]
+
+
+def record_index(records):
+    """RecordIndex for this exact list object, built on first use and cached (LRU)."""
+    key = id(records)
+    with _RECORD_INDEX_LOCK:
+        index = _RECORD_INDEXES.get(key)
+        if index is not None and index.records is records:
+            _RECORD_INDEXES.move_to_end(key)
+            return index
+    index = RecordIndex(records)
+    with _RECORD_INDEX_LOCK:
+        _RECORD_INDEXES[key] = index
+        _RECORD_INDEXES.move_to_end(key)
+        while len(_RECORD_INDEXES) > RECORD_INDEX_CACHE_ENTRIES:
+            _RECORD_INDEXES.popitem(last=False)
+    return index
+
+
 def group_by_instance(items):
     by_instance = {}
     for i in items:
@@ -175,51 +1484,754 @@ def group_by_instance(items):
     return list(by_instance.values())
 
 
-def _get_spoke_ec2_client(account_id, region):
-    sts = boto3.client("sts")
-    role_arn = f"arn:aws:iam::{account_id}:role/{SPOKE_ROLE_NAME}"
-    assumed = sts.assume_role(RoleArn=role_arn, RoleSessionName="dbdiscoveryApiEc2Enrich")
-    c = assumed["Credentials"]
-    return boto3.client(
-        "ec2",
-        region_name=region,
-        aws_access_key_id=c["AccessKeyId"],
-        aws_secret_access_key=c["SecretAccessKey"],
-        aws_session_token=c["SessionToken"],
+class BadRequest(ValueError):
+    """Invalid query parameters; lambda_handler answers 400 with the message."""
+
+
+# Query parameters that shape the response rather than select records.
+_PAGING_PARAMS = ("limit", "next_token", "fields")
+
+
+_SORT_FIELDS = ("account_id", "region", "instance_id", "db_id")
+
+
+def _sort_key(record):
+    return (
+        str(record.get("account_id") or ""),
+        str(record.get("region") or ""),
+        str(record.get("instance_id") or ""),
+        str(record.get("db_id") or ""),
+    )
+
+
+def _query_hash(qs, scope=""):
+    items = sorted((k, _norm_text(v)) for k, v in qs.items() if k not in _PAGING_PARAMS and _norm_text(v))
+    return hashlib.sha1(json.dumps([scope, items]).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_page_token(offset, version, query_hash):
+    raw = json.dumps({"o": offset, "v": version, "q": query_hash}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        offset = data["o"]
+    except (ValueError, KeyError, TypeError, UnicodeError):
+        raise BadRequest("Invalid next_token")
+    if not isinstance(offset, int) or offset < 0:
+        raise BadRequest("Invalid next_token")
+    return offset, data.get("v"), data.get("q")
+
+
+def _page_limit(qs):
+    raw = _norm_text(qs.get("limit"))
+    if not raw:
+        return None
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be at least 1")
+    return min(limit, API_MAX_PAGE_SIZE)
+
+
+def _is_paged(qs):
+    return bool(_norm_text(qs.get("limit")) or _norm_text(qs.get("next_token")))
+
+
+def paginate_records(items, qs, scope=""):
+    """Apply ?limit= / ?next_token= to filtered records; returns (page, next_token or None).
+
+    Without either parameter the records come back unchanged (snapshot order). Paged results are
+    sorted by account, region, instance and db_id. The token carries the offset plus the snapshot
+    version and a hash of the filters, so it cannot be replayed against other data.
+    """
+    if not _is_paged(qs):
+        return items, None
+    limit = _page_limit(qs) or API_MAX_PAGE_SIZE
+    token = _norm_text(qs.get("next_token"))
+    version = snapshot_version()
+    query_hash = _query_hash(qs, scope)
+    offset = 0
+    if token:
+        offset, token_version, token_hash = decode_page_token(token)
+        if token_hash != query_hash:
+            raise BadRequest("next_token does not match this query")
+        if token_version != version:
+            raise BadRequest("next_token expired: the inventory snapshot changed")
+
+    key = (version, query_hash)
+    with _RECORD_INDEX_LOCK:
+        ordered = _PAGE_ORDERS.get(key) if version else None
+    if ordered is None:
+        if isinstance(items, _RecordSequence):
+            ordered = items.sorted_by(_SORT_FIELDS)
+        else:
+            ordered = sorted(items, key=_sort_key)
+        if version:
+            with _RECORD_INDEX_LOCK:
+                _PAGE_ORDERS[key] = ordered
+                while len(_PAGE_ORDERS) > RECORD_INDEX_CACHE_ENTRIES:
+                    _PAGE_ORDERS.popitem(last=False)
+    page = ordered[offset:offset + limit]
+    end = offset + len(page)
+    next_token = encode_page_token(end, version, query_hash) if end < len(ordered) else None
+    return page, next_token
+
+
+def project_fields(items, qs):
+    """Apply ?fields=a,b,c: keep only those keys of each record (missing keys are left out)."""
+    fields = [f.strip() for f in _norm_text(qs.get("fields")).split(",") if f.strip()]
+    if not fields:
+        return items
+    return [{f: i[f] for f in fields if f in i} for i in items]
+
+
+_EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+_EXPORT_DEFAULT_COLUMNS = (
+    "account_id", "region", "instance_id", "instance_type", "ec2_state", "discovery_status",
+    "db_id", "engine", "version", "status", "port", "data_size_mb",
+)
+_EXPORT_CHUNK_CHARS = 64 * 1024
+
+
+def _export_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    return value
+
+
+def iter_export(records, fmt, columns):
+    """Yield the export as text chunks of about 64 KB, one record at a time (memory stays flat)."""
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(columns)
+    for record in records:
+        if fmt == "csv":
+            writer.writerow([_export_cell(record.get(c)) for c in columns])
+        else:
+            buf.write(json.dumps({c: record[c] for c in columns if c in record}, default=str))
+            buf.write("\n")
+        if buf.tell() >= _EXPORT_CHUNK_CHARS:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of bytes chunks, for S3 upload_fileobj."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self.bytes_read += n
+        return n
+
+
+def _export_params(qs):
+    fmt = _norm_text(qs.get("format") or "csv").lower()
+    if fmt not in _EXPORT_FORMATS:
+        raise BadRequest("format must be csv or ndjson")
+    delivery = _norm_text(qs.get("delivery") or "auto").lower()
+    if delivery not in ("auto", "inline", "s3"):
+        raise BadRequest("delivery must be auto, inline or s3")
+    columns = [c.strip() for c in _norm_text(qs.get("columns")).split(",") if c.strip()]
+    return fmt, delivery, columns or list(_EXPORT_DEFAULT_COLUMNS)
+
+
+def export_records(items, qs):
+    """GET /export: filtered records as CSV / NDJSON, inline when small, else via S3 + presigned URL.
+
+    Output is produced by iter_export and either collected up to EXPORT_INLINE_MAX_BYTES or streamed
+    to S3 (multipart upload_fileobj); the records are never serialized all at once. Rows come in
+    snapshot order (deterministic per snapshot), so nothing proportional to the export is built
+    before streaming.
+    """
+    fmt, delivery, columns = _export_params(qs)
+    chunks = (chunk.encode("utf-8") for chunk in iter_export(items, fmt, columns))
+    filename = f"inventory.{fmt}"
+
+    head, size = [], 0
+    if delivery != "s3":
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size > EXPORT_INLINE_MAX_BYTES:
+                break
+        else:
+            return _Reply(
+                200,
+                b"".join(head).decode("utf-8"),
+                content_type=_EXPORT_FORMATS[fmt],
+                headers={
+                    "Content-Disposition": f'attachment; filename="{filename}"',
+                    "X-Record-Count": str(len(items)),
+                },
+            )
+        if delivery == "inline":
+            raise BadRequest(
+                f"Export is larger than {EXPORT_INLINE_MAX_BYTES} bytes; use delivery=s3 or narrow the filters"
+            )
+
+    if not EXPORT_S3_BUCKET:
+        raise BadRequest("Export is too large to return inline and EXPORT_S3_BUCKET is not set")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    key = f"{EXPORT_S3_PREFIX}{stamp}-{_query_hash(qs, 'export')}.{fmt}"
+    reader = _ChunkReader(chain(head, chunks))
+    s3 = _s3_client()
+    s3.upload_fileobj(
+        reader,
+        EXPORT_S3_BUCKET,
+        key,
+        ExtraArgs={"ContentType": _EXPORT_FORMATS[fmt], "ContentDisposition": f'attachment; filename="{filename}"'},
+    )
+    url = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": EXPORT_S3_BUCKET, "Key": key}, ExpiresIn=EXPORT_URL_TTL_SECONDS
     )
+    logger.info("Exported %s records (%s bytes) to s3://%s/%s", len(items), reader.bytes_read, EXPORT_S3_BUCKET, key)
+    return _Reply(
+        200,
+        {
+            "format": fmt,
+            "count": len(items),
+            "bytes": reader.bytes_read,
+            "columns": columns,
+            "delivery": "s3",
+            "key": key,
+            "url": url,
+            "expires_in": EXPORT_URL_TTL_SECONDS,
+        },
+        cacheable=False,
+    )
+
+
+_AGGREGATE_GROUP_FIELDS = ("region", "account_id", "engine", "version", "status", "instance_type", "ec2_state")
+_AGGREGATE_METRIC_FIELDS = ("data_size_mb", "system_memory_mb", "system_cpu_cores")
+_AGGREGATE_FUNCS = ("sum", "avg", "max")
+
+
+def _group_value(field, value):
+    text = _norm_text(value)
+    if not text:
+        return None
+    return canonical_engine_name(text) if field == "engine" else text
+
+
+def _metric_number(value):
+    """int/float for numeric values (numeric strings included), else None."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    try:
+        text = str(value).strip()
+        return int(text) if text.lstrip("-").isdigit() else float(text)
+    except ValueError:
+        return None
+
+
+def _aggregate_params(qs):
+    group_by = [f.strip() for f in _norm_text(qs.get("group_by")).split(",") if f.strip()]
+    unknown = [f for f in group_by if f not in _AGGREGATE_GROUP_FIELDS]
+    if unknown:
+        raise BadRequest(f"group_by supports {', '.join(_AGGREGATE_GROUP_FIELDS)}; got {', '.join(unknown)}")
+    metrics = []
+    for metric in (_norm_text(qs.get("metrics")) or "count").split(","):
+        metric = metric.strip()
+        if not metric or metric in metrics:
+            continue
+        func, _, field = metric.partition(":")
+        if metric != "count" and (func not in _AGGREGATE_FUNCS or field not in _AGGREGATE_METRIC_FIELDS):
+            raise BadRequest(
+                "metrics are count or <sum|avg|max>:<field> with field one of " + ", ".join(_AGGREGATE_METRIC_FIELDS)
+            )
+        metrics.append(metric)
+    return group_by, metrics
+
+
+def _accumulate(acc, numbers):
+    """acc = [count, sum, n, max, sum, n, max, ...] with one (sum, n, max) triple per metric field."""
+    acc[0] += 1
+    slot = 1
+    for number in numbers:
+        if number is not None:
+            acc[slot] += number
+            acc[slot + 1] += 1
+            if acc[slot + 2] is None or number > acc[slot + 2]:
+                acc[slot + 2] = number
+        slot += 3
+
+
+def _merge_acc(into, acc):
+    into[0] += acc[0]
+    for slot in range(1, len(acc), 3):
+        into[slot] += acc[slot]
+        into[slot + 1] += acc[slot + 1]
+        if acc[slot + 2] is not None and (into[slot + 2] is None or acc[slot + 2] > into[slot + 2]):
+            into[slot + 2] = acc[slot + 2]
+
+
+def aggregate_records(items, group_by, metrics):
+    """Group rows by ``group_by`` and compute ``metrics`` in one pass.
+
+    RecordStore / RecordView rows are grouped on their column codes (one integer key per row, values
+    normalized once per distinct code) and never materialized as dicts.
+    """
+    fields = [f for f in _AGGREGATE_METRIC_FIELDS if any(m.endswith(":" + f) for m in metrics)]
+    groups = {}
+    if isinstance(items, _RecordSequence):
+        store, positions = items._store_positions()
+        # A key missing from every row reads as an all-absent column (code 0 -> None).
+        columns = {f: store.column(f) or _Column(len(store)) for f in (*group_by, *fields)}
+        group_cols = [
+            (len(columns[f].values), columns[f].codes, [_group_value(f, v) for v in columns[f].values])
+            for f in group_by
+        ]
+        metric_cols = [(columns[f].codes, [_metric_number(v) for v in columns[f].values]) for f in fields]
+        by_code = {}
+        for pos in positions:
+            key = 0
+            for size, codes, _ in group_cols:
+                key = key * size + codes[pos]
+            acc = by_code.get(key)
+            if acc is None:
+                acc = by_code[key] = [0] + [0, 0, None] * len(fields)
+            _accumulate(acc, [numbers[codes[pos]] for codes, numbers in metric_cols])
+        for key, acc in by_code.items():
+            labels = []
+            for size, _, values in reversed(group_cols):
+                key, code = divmod(key, size)
+                labels.append(values[code])
+            label = tuple(reversed(labels))
+            if label in groups:
+                _merge_acc(groups[label], acc)
+            else:
+                groups[label] = acc
+    else:
+        for record in items:
+            if not isinstance(record, dict):
+                continue
+            label = tuple(_group_value(f, record.get(f)) for f in group_by)
+            acc = groups.get(label)
+            if acc is None:
+                acc = groups[label] = [0] + [0, 0, None] * len(fields)
+            _accumulate(acc, [_metric_number(record.get(f)) for f in fields])
+
+    rows = []
+    for label in sorted(groups, key=lambda g: [(v is None, v or "") for v in g]):
+        acc = groups[label]
+        row = dict(zip(group_by, label))
+        for metric in metrics:
+            if metric == "count":
+                row["count"] = acc[0]
+                continue
+            func, _, field = metric.partition(":")
+            slot = 1 + 3 * fields.index(field)
+            total, n, biggest = acc[slot:slot + 3]
+            if func == "sum":
+                row[f"sum_{field}"] = total
+            elif func == "avg":
+                row[f"avg_{field}"] = total / n if n else None
+            else:
+                row[f"max_{field}"] = biggest
+        rows.append(row)
+    return rows
+
+
+def _memoized_rollup(qs, scope, compute):
+    """``compute()`` memoized per (snapshot version, query) so a repeated rollup skips the pass."""
+    version = snapshot_version()
+    key = (version, _query_hash(qs, scope))
+    with _RECORD_INDEX_LOCK:
+        body = _AGGREGATES.get(key) if version else None
+        if body is not None:
+            _AGGREGATES.move_to_end(key)
+            return body
+    body = compute()
+    if version:
+        with _RECORD_INDEX_LOCK:
+            _AGGREGATES[key] = body
+            while len(_AGGREGATES) > RECORD_INDEX_CACHE_ENTRIES:
+                _AGGREGATES.popitem(last=False)
+    return body
+
+
+def aggregate_response(qs):
+    """GET /aggregate body, memoized per (snapshot version, query)."""
+    group_by, metrics = _aggregate_params(qs)
+
+    def compute():
+        items = _filtered_records(qs)
+        groups = aggregate_records(items, group_by, metrics)
+        return {"group_by": group_by, "metrics": metrics, "total_records": len(items), "count": len(groups),
+                "groups": groups}
+
+    return _memoized_rollup(qs, "aggregate", compute)
+
+
+def _history_index_key():
+    return f"{HISTORY_S3_PREFIX}/index.json"
+
+
+def load_history():
+    """Run history index written by discovery (runs oldest first), or None when history is off."""
+    if not RESULTS_S3_BUCKET:
+        return None
+    index = _cached_s3_object(_history_index_key(), _parse_json_object, None, optional=True)
+    if index and isinstance(index.get("runs"), list):
+        return index
+    return None
+
+
+def _history_runs():
+    runs = (load_history() or {}).get("runs", [])
+    return [r for r in runs if isinstance(r, dict) and r.get("run_id") and r.get("fingerprints_key")]
+
+
+# Fingerprint file rows start with ["<16 hex key hash>", "<16 hex fingerprint>", ... (see discovery).
+_KEY_HASH = slice(2, 18)
+_FINGERPRINT = slice(22, 38)
+_HASH_MASK = (1 << 64) - 1
+
+
+def _fingerprint_rows(run):
+    """(header, iterator of raw row lines) of a run's fingerprint file."""
+    resp = _s3_client().get_object(Bucket=RESULTS_S3_BUCKET, Key=run["fingerprints_key"])
+    stream = _open_snapshot_stream(resp["Body"])
+    header = json.loads(stream.readline() or b"{}")
+    return header, (line for line in stream if line.startswith(b'["'))
+
+
+def load_fingerprints(run):
+    """(key hashes, fingerprints) arrays of a history run, cached per run_id."""
+    run_id = run["run_id"]
+    with _RECORD_INDEX_LOCK:
+        cached = _FINGERPRINTS.get(run_id)
+        if cached is not None:
+            _FINGERPRINTS.move_to_end(run_id)
+            return cached
+    by_key = {}
+    for line in _fingerprint_rows(run)[1]:
+        key, fingerprint = int(line[_KEY_HASH], 16), int(line[_FINGERPRINT], 16)
+        # Rows sharing a key fold into one order-independent fingerprint.
+        by_key[key] = (by_key[key] + fingerprint) & _HASH_MASK if key in by_key else fingerprint
+    value = (array("Q", by_key.keys()), array("Q", by_key.values()))
+    with _RECORD_INDEX_LOCK:
+        _FINGERPRINTS[run_id] = value
+        while len(_FINGERPRINTS) > _FINGERPRINT_CACHE_RUNS:
+            _FINGERPRINTS.popitem(last=False)
+    return value
+
+
+def diff_fingerprints(old, new):
+    """(added, removed, modified) key hashes between two runs; only the hashes are compared."""
+    remaining = dict(zip(*new))
+    removed, modified = [], []
+    for key, fingerprint in zip(*old):
+        current = remaining.pop(key, None)
+        if current is None:
+            removed.append(key)
+        elif current != fingerprint:
+            modified.append(key)
+    return list(remaining), removed, modified
+
+
+def _key_hash(account_id, instance_id, db_id):
+    """Same key hash discovery writes (record_key_hash), as an int."""
+    key = "\x1f".join(str(v or "") for v in (account_id, instance_id, db_id))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _records_by_key_hash(records, wanted):
+    """{key hash: [records]} for the records whose key hash is in ``wanted``."""
+    found = {}
+    if not wanted:
+        return found
+    if isinstance(records, _RecordSequence):
+        # Hash from the key columns; only matching rows are materialized.
+        store, positions = records._store_positions()
+        columns = [store.column(f) or _Column(len(store)) for f in ("account_id", "instance_id", "db_id")]
+        (a_codes, a_values), (i_codes, i_values), (d_codes, d_values) = [(c.codes, c.values) for c in columns]
+        for pos in positions:
+            key = _key_hash(a_values[a_codes[pos]], i_values[i_codes[pos]], d_values[d_codes[pos]])
+            if key in wanted:
+                found.setdefault(key, []).append(store[pos])
+        return found
+    for record in records:
+        if isinstance(record, dict):
+            key = _key_hash(record.get("account_id"), record.get("instance_id"), record.get("db_id"))
+            if key in wanted:
+                found.setdefault(key, []).append(record)
+    return found
+
+
+def _run_records(run):
+    """Records of a history run: the live snapshot while it is that run, else the run's own copy.
+
+    History is published after the live snapshot and summary (and a failed publish is only logged),
+    so the live snapshot can be a newer run than the latest history entry. None if the copy is gone.
+    """
+    if RESULTS_LAYOUT == "partitioned":
+        if (load_manifest() or {}).get("run_id") == run["run_id"]:
+            return load_all_records()
+    else:
+        records = load_all_records()
+        summary = load_summary() or {}
+        if summary.get("run_id") == run["run_id"] and summary.get("snapshot_etag") == snapshot_version():
+            return records
+    if run.get("snapshot_key"):
+        return _cached_s3_object(run["snapshot_key"], _parse_records, None, optional=True)
+    manifest = (
+        _cached_s3_object(run["manifest_key"], _parse_json_object, None, optional=True)
+        if run.get("manifest_key")
+        else None
+    )
+    if not manifest:
+        return None
+    keys = [p["key"] for p in manifest.get("partitions", []) if isinstance(p, dict) and p.get("key")]
+    return _partition_records(keys)
+
 
+def _fingerprint_details(run, wanted):
+    """{key hash: key fields and FINGERPRINT_FIELDS} from a run's fingerprint file; other rows are not parsed."""
+    header, rows = _fingerprint_rows(run)
+    fields = header.get("fields") or []
+    found = {}
+    for line in rows:
+        key = int(line[_KEY_HASH], 16)
+        if key in wanted:
+            found[key] = dict(zip(fields[2:], json.loads(line)[2:]))
+    return found
 
-def enrich_instances_ec2_state(instances, account_id, region):
-    """Attach current EC2 state (running/stopped/...) for each instance row."""
-    if not API_ENRICH_EC2_STATE or not instances or not account_id or not region:
+
+_CHANGE_KEY_FIELDS = ("account_id", "instance_id", "db_id")
+
+
+def _change_sort_key(entry):
+    return tuple(str(entry.get(f) or "") for f in _CHANGE_KEY_FIELDS)
+
+
+def changes_response(qs):
+    """GET /changes?since=<run_id>: records added, removed and modified since that run.
+
+    Compares the two runs' per-record fingerprints (hash of everything but the probe timestamp),
+    keyed by (account_id, instance_id, db_id). Added and modified records come from the latest
+    run's snapshot (_run_records); removed ones, and the "before" side of modified ones, from the
+    older run's fingerprint file. Results are memoized per pair of runs.
+    """
+    runs = _history_runs()
+    if not runs:
+        return _Reply(404, {"error": "No run history; discovery writes it when HISTORY_KEEP_RUNS > 0"})
+    latest = runs[-1]
+    since_id = _norm_text(qs.get("since"))
+    if not since_id:
+        if len(runs) < 2:
+            return _Reply(404, {"error": "Only one run in history", "run_id": latest["run_id"]})
+        since = runs[-2]
+    else:
+        since = next((r for r in runs if r["run_id"] == since_id), None)
+        if since is None:
+            raise BadRequest(f"since={since_id} is not a run in history; see /history")
+    key = (since["run_id"], latest["run_id"])
+    with _RECORD_INDEX_LOCK:
+        body = _CHANGES.get(key)
+        if body is not None:
+            _CHANGES.move_to_end(key)
+            return _Reply(200, body)
+
+    records = _run_records(latest)
+    if records is None:
+        return _Reply(503, {"error": "Snapshot of the latest run is not available", "run_id": latest["run_id"]})
+    added, removed, modified = diff_fingerprints(load_fingerprints(since), load_fingerprints(latest))
+    current = _records_by_key_hash(records, set(added) | set(modified))
+    before = _fingerprint_details(since, set(removed) | set(modified))
+    modified_rows = []
+    for k in modified:
+        old = before.get(k, {})
+        for record in current.get(k, []):
+            row = {f: record.get(f) for f in _CHANGE_KEY_FIELDS}
+            row["before"] = {f: v for f, v in old.items() if f not in _CHANGE_KEY_FIELDS}
+            row["after"] = record
+            modified_rows.append(row)
+    body = to_json_serializable({
+        "since": since["run_id"],
+        "since_updated_at": since.get("updated_at"),
+        "to": latest["run_id"],
+        "updated_at": latest.get("updated_at"),
+        "counts": {"added": len(added), "removed": len(removed), "modified": len(modified)},
+        "added": sorted((r for k in added for r in current.get(k, [])), key=_sort_key),
+        "removed": sorted((before[k] for k in removed if k in before), key=_change_sort_key),
+        "modified": sorted(modified_rows, key=_change_sort_key),
+    })
+    with _RECORD_INDEX_LOCK:
+        _CHANGES[key] = body
+        while len(_CHANGES) > RECORD_INDEX_CACHE_ENTRIES:
+            _CHANGES.popitem(last=False)
+    return _Reply(200, body)
+
+
+def history_response():
+    runs = [
+        {k: r.get(k) for k in ("run_id", "updated_at", "record_count", "layout")}
+        for r in reversed(_history_runs())
+    ]
+    return _Reply(200, {"count": len(runs), "runs": runs})
+
+
+def _credentials_expiring(creds):
+    expiration = creds.get("Expiration")
+    if not isinstance(expiration, datetime):
+        return True
+    if expiration.tzinfo is None:
+        expiration = expiration.replace(tzinfo=timezone.utc)
+    return expiration - datetime.now(timezone.utc) <= timedelta(seconds=SPOKE_CREDENTIAL_REFRESH_SECONDS)
+
+
+def _sts_client():
+    global _STS_CLIENT
+    with _OBJECT_CACHE_LOCK:
+        if _STS_CLIENT is None:
+            _STS_CLIENT = boto3.client("sts", region_name=AWS_REGION)
+        return _STS_CLIENT
+
+
+def _get_spoke_credentials(account_id):
+    """One AssumeRole per spoke account per credential lifetime in a warm container."""
+    key = (account_id, SPOKE_ROLE_NAME)
+    with _SPOKE_CACHE_LOCK:
+        creds = _SPOKE_CREDENTIALS.get(key)
+        if creds and not _credentials_expiring(creds):
+            return creds
+        sts = _sts_client()
+        role_arn = f"arn:aws:iam::{account_id}:role/{SPOKE_ROLE_NAME}"
+        assumed = sts.assume_role(RoleArn=role_arn, RoleSessionName="dbdiscoveryApiEc2Enrich")
+        creds = assumed["Credentials"]
+        _SPOKE_CREDENTIALS[key] = creds
+        return creds
+
+
+def _get_spoke_client(account_id, service, region):
+    c = _get_spoke_credentials(account_id)
+    key = (account_id, region, service)
+    with _SPOKE_CACHE_LOCK:
+        cached = _SPOKE_CLIENTS.get(key)
+        if cached and cached[1] == c["AccessKeyId"]:
+            return cached[0]
+        client = boto3.client(
+            service,
+            region_name=region,
+            aws_access_key_id=c["AccessKeyId"],
+            aws_secret_access_key=c["SecretAccessKey"],
+            aws_session_token=c["SessionToken"],
+        )
+        _SPOKE_CLIENTS[key] = (client, c["AccessKeyId"])
+        return client
+
+
+def _get_spoke_ec2_client(account_id, region):
+    return _get_spoke_client(account_id, "ec2", region)
+
+
+def _fetch_ec2_states(account_id, region, ids):
+    """Current state of up to 100 instances; IDs EC2 no longer knows are simply absent."""
+    ec2 = _get_spoke_ec2_client(account_id, region)
+    states = {}
+    # A filter (unlike InstanceIds=) does not fail the whole call for one terminated ID.
+    paginator = ec2.get_paginator("describe_instances")
+    for page in paginator.paginate(Filters=[{"Name": "instance-id", "Values": ids}]):
+        for res in page.get("Reservations", []):
+            for inst in res.get("Instances", []):
+                iid = inst.get("InstanceId")
+                if iid:
+                    states[iid] = (inst.get("State") or {}).get("Name") or "unknown"
+    now = time.monotonic()
+    with _EC2_STATE_LOCK:
+        for iid, state in states.items():
+            _EC2_STATE_CACHE[(account_id, region, iid)] = (state, now)
+    return states
+
+
+def _cached_ec2_states(account_id, ids_by_region):
+    """Fresh cached states keyed by instance ID; the rest of ids_by_region still needs a call."""
+    now = time.monotonic()
+    found, missing = {}, {}
+    with _EC2_STATE_LOCK:
+        for region, ids in ids_by_region.items():
+            for iid in ids:
+                hit = _EC2_STATE_CACHE.get((account_id, region, iid))
+                if hit and now - hit[1] < EC2_STATE_CACHE_TTL_SECONDS:
+                    found[iid] = hit[0]
+                else:
+                    missing.setdefault(region, []).append(iid)
+    return found, missing
+
+
+def enrich_instances_ec2_state(instances, account_id, region, instance_regions=None):
+    """Attach current EC2 state (running/stopped/...) for each instance row.
+
+    Without ``region`` each instance is looked up in its snapshot region (``instance_regions``), all
+    regions in parallel. States come from a short TTL cache when possible; DescribeInstances chunks
+    run concurrently and whatever has not answered within EC2_STATE_BUDGET_SECONDS keeps the
+    snapshot ec2_state (late answers still fill the cache for the next request).
+    """
+    if not API_ENRICH_EC2_STATE or not instances or not account_id:
         return
-    ids = []
+    ids_by_region = {}
     for row in instances:
         iid = row.get("instance_id")
-        if iid and isinstance(iid, str) and iid.startswith("i-"):
-            ids.append(iid)
-    if not ids:
+        iid_region = region or (instance_regions or {}).get(iid)
+        if iid and isinstance(iid, str) and iid.startswith("i-") and iid_region:
+            ids_by_region.setdefault(iid_region, {})[iid] = None
+    if not ids_by_region:
         return
-    ids = list(dict.fromkeys(ids))
-    try:
-        ec2 = _get_spoke_ec2_client(account_id, region)
-        state_by_id = {}
-        for start in range(0, len(ids), 100):
-            chunk = ids[start : start + 100]
-            resp = ec2.describe_instances(InstanceIds=chunk)
-            for res in resp.get("Reservations", []):
-                for inst in res.get("Instances", []):
-                    iid = inst.get("InstanceId")
-                    if iid:
-                        state_by_id[iid] = (inst.get("State") or {}).get("Name") or "unknown"
-        for row in instances:
-            iid = row.get("instance_id")
-            if iid in state_by_id:
-                row["ec2_state"] = state_by_id[iid]
-    except ClientError as e:
-        logger.warning("EC2 state enrich failed (IAM?): %s", e)
-    except Exception as e:
-        logger.warning("EC2 state enrich failed: %s", e)
+    state_by_id, missing = _cached_ec2_states(account_id, {r: list(ids) for r, ids in ids_by_region.items()})
+    tasks = [(r, ids[start:start + 100]) for r, ids in sorted(missing.items()) for start in range(0, len(ids), 100)]
+    if tasks:
+        pool = ThreadPoolExecutor(max_workers=min(EC2_STATE_WORKERS, len(tasks)))
+        futures = {pool.submit(_fetch_ec2_states, account_id, r, chunk): r for r, chunk in tasks}
+        done, pending = wait(futures, timeout=EC2_STATE_BUDGET_SECONDS)
+        pool.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            logger.warning(
+                "EC2 state enrich for %s: %s of %s chunk(s) over the %.1fs budget; using snapshot state",
+                account_id, len(pending), len(tasks), EC2_STATE_BUDGET_SECONDS,
+            )
+        for future in done:
+            try:
+                state_by_id.update(future.result())
+            except ClientError as e:
+                logger.warning("EC2 state enrich failed in %s (IAM?): %s", futures[future], e)
+            except Exception as e:
+                logger.warning("EC2 state enrich failed in %s: %s", futures[future], e)
+    for row in instances:
+        iid = row.get("instance_id")
+        if iid in state_by_id:
+            row["ec2_state"] = state_by_id[iid]
 
 
 def _request_path(event):
@@ -251,26 +2263,30 @@ def _normalize_api_path(path):
     return p.rstrip("/") or "/"
 
 
-def _api_root_response():
-    items = load_all_records()
+def _api_root_reply():
     body = {
         "service": "db-discovery-api",
         "api_version": API_VERSION,
-        "total_records": len(items),
+        "total_records": _total_records(load_summary()),
         "store": "s3",
         "endpoints": [
             "/health",
+            "/summary",
             "/regions",
             "/accounts",
             "/databases",
+            "/export",
+            "/aggregate",
+            "/history",
+            "/changes",
             "/accounts/{accountId}/instances",
         ],
     }
-    return http_response(200, body)
+    return _Reply(200, body)
 
 
 # One-segment paths that are real resources (not the stage name prefix in /prod alone)
-_SINGLE_RESOURCE_SEGMENTS = frozenset({"health", "accounts", "regions", "databases"})
+_SINGLE_RESOURCE_SEGMENTS = frozenset({"health", "summary", "accounts", "regions", "databases", "export", "aggregate", "changes", "history"})
 
 
 def _should_serve_api_root(path_segments):
@@ -301,6 +2317,230 @@ def _path_account_id(path_segments, path_params):
     return ""
 
 
+# content_type: send ``body`` as text of this type instead of JSON; headers: extra response headers.
+_Reply = namedtuple("_Reply", "status body cacheable content_type headers", defaults=(True, None, None))
+
+
+def _request_headers(event):
+    """Request headers with lower-cased names (REST and HTTP API events)."""
+    headers = {}
+    for source in (event.get("multiValueHeaders"), event.get("headers")):
+        if not isinstance(source, dict):
+            continue
+        for name, value in source.items():
+            if isinstance(value, list):
+                value = ", ".join(str(v) for v in value)
+            if value is not None:
+                headers[str(name).lower()] = str(value)
+    return headers
+
+
+def _response_keys(path=""):
+    keys = [RESULTS_S3_KEY, RESULTS_MANIFEST_KEY, SUMMARY_S3_KEY]
+    if path.rstrip("/").rsplit("/", 1)[-1].lower() in ("history", "changes"):
+        keys.append(_history_index_key())
+    return keys
+
+
+def _response_version(path=""):
+    """ETags of the snapshot objects behind the cached data (inventory or manifest, plus summary).
+
+    Partitions are immutable under a manifest run_id, so these cover every object a response reads;
+    /history and /changes also read the history index, which discovery updates after the summary.
+    Empty when nothing came from the object cache (no bucket configured).
+    """
+    parts = []
+    for key in _response_keys(path):
+        entry = _OBJECT_CACHE.get(key)
+        if entry:
+            parts.append(f"{key}={entry['etag']}")
+    return "|".join(parts)
+
+
+def _response_etag(path, qs, body):
+    """Strong ETag from the snapshot version and normalized request; falls back to hashing the body."""
+    version = _response_version(path)
+    if version:
+        query = sorted((str(k), _norm_text(v)) for k, v in qs.items() if _norm_text(v))
+        seed = json.dumps([API_VERSION, version, path.lower(), query])
+    else:
+        seed = json.dumps(body, sort_keys=True, default=str)
+    return '"%s"' % hashlib.sha1(seed.encode("utf-8")).hexdigest()
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _not_modified(etag):
+    return {"statusCode": 304, "headers": dict(CORS_HEADERS, ETag=etag), "body": ""}
+
+
+def _early_not_modified(path, path_segments, qs, headers):
+    """304 for a conditional request whose ETag still matches, answered without routing.
+
+    The strong ETag only depends on the snapshot version and the normalized request, so once the
+    cached snapshot objects are revalidated (conditional GETs after the TTL) no body has to be built.
+    None when the route has to run: no If-None-Match, no snapshot version, or the live EC2 state view.
+    """
+    if_none_match = headers.get("if-none-match")
+    if not if_none_match or if_none_match.strip() == "*":
+        return None
+    if API_ENRICH_EC2_STATE and path_segments and path_segments[-1].lower() == "instances":
+        return None
+    for key in _response_keys(path):
+        entry = _OBJECT_CACHE.get(key)
+        if entry and entry.get("parse"):
+            try:
+                _cached_s3_object(key, entry["parse"], entry["missing"], optional=entry["optional"])
+            except Exception:
+                return None
+    if not _response_version(path):
+        return None
+    etag = _response_etag(path, qs, None)
+    return _not_modified(etag) if _etag_matches(if_none_match, etag) else None
+
+
+def _finalize(reply, path, qs, headers):
+    """Turn a route reply into the proxy response: ETag / 304 for cacheable 200s, then compression."""
+    etag = None
+    if reply.status == 200 and reply.cacheable:
+        etag = _response_etag(path, qs, reply.body)
+        if _etag_matches(headers.get("if-none-match"), etag):
+            return _not_modified(etag)
+    return http_response(
+        reply.status,
+        reply.body,
+        etag=etag,
+        accept_encoding=headers.get("accept-encoding"),
+        content_type=reply.content_type,
+        extra_headers=reply.headers,
+    )
+
+
+def _route(path, path_stripped, path_segments, path_params, qs):
+    if "/health" in path or path_stripped.endswith("/health") or path_segments == ["health"]:
+        return _Reply(
+            200,
+            {
+                "status": "ok",
+                "api_version": API_VERSION,
+                "total_records": _total_records(load_summary()),
+                "store": "s3",
+            },
+        )
+
+    # Bare invoke URL is often /{stage} only (e.g. /prod) — API Gateway sends one path segment.
+    if _should_serve_api_root(path_segments):
+        return _api_root_reply()
+
+    if path_segments and path_segments[-1].lower() == "summary":
+        summary = None if _has_record_filters(qs) else load_summary()
+        if summary is None:
+
+            def compute():
+                return to_json_serializable(build_summary(_filtered_records(qs)))
+
+            summary = _memoized_rollup(qs, "summary", compute)
+        return _Reply(200, to_json_serializable(summary))
+
+    if path_segments and path_segments[-1].lower() == "regions" and "accounts" not in path.lower():
+        summary = None if _has_record_filters(qs) else load_summary()
+        if summary is not None:
+            return _Reply(200, {"regions": to_json_serializable(summary.get("regions", []))})
+        items = _filtered_records(qs)
+        regions = sorted(set(i.get("region") for i in items if isinstance(i, dict) and i.get("region")))
+        return _Reply(200, {"regions": to_json_serializable(regions)})
+
+    # Must run before GET /accounts: /regions/{region}/accounts also ends with "accounts".
+    if "regions" in path_segments and path_segments[-1].lower() == "accounts":
+        try:
+            idx = path_segments.index("regions")
+            region = path_segments[idx + 1]
+        except (ValueError, IndexError):
+            return _Reply(400, {"error": "Invalid region path"})
+        summary = None if _has_record_filters(qs, ignore=("region",)) else load_summary()
+        if summary is not None:
+            accounts = (summary.get("accounts_by_region") or {}).get(region, [])
+            return _Reply(200, {"region": region, "accounts": to_json_serializable(accounts)})
+        scoped_qs = dict(qs)
+        scoped_qs["region"] = region
+        items = _filtered_records(scoped_qs)
+        accounts = sorted(set(
+            i.get("account_id")
+            for i in items
+            if isinstance(i, dict) and i.get("account_id")
+        ))
+        return _Reply(200, {"region": region, "accounts": to_json_serializable(accounts)})
+
+    is_list_accounts = (
+        path_segments
+        and path_segments[-1].lower() == "accounts"
+        and "regions" not in path_segments
+        and not path_params.get("accountId")
+        and "instances" not in path.lower()
+    )
+    if is_list_accounts:
+        region_q = _norm_text(qs.get("region"))
+        summary = None if _has_record_filters(qs, ignore=("region",)) else load_summary()
+        if summary is not None:
+            if region_q:
+                accounts = (summary.get("accounts_by_region") or {}).get(region_q, [])
+                return _Reply(200, {"region": region_q, "accounts": to_json_serializable(accounts)})
+            return _Reply(200, {"accounts": to_json_serializable(summary.get("accounts", []))})
+        items = _filtered_records(qs)
+        if region_q:
+            accounts = sorted(set(i.get("account_id") for i in items if isinstance(i, dict) and i.get("account_id")))
+            return _Reply(200, {"region": region_q, "accounts": to_json_serializable(accounts)})
+        accounts = list(set(i.get("account_id", "unknown") for i in items if isinstance(i, dict) and i.get("account_id")))
+        return _Reply(200, {"accounts": to_json_serializable(accounts)})
+
+    region_filter = _norm_text(qs.get("region"))
+    account_id = _path_account_id(path_segments, path_params)
+    if account_id:
+        items = query_by_account(account_id, region=region_filter or None)
+        items = apply_record_filters(items, qs)
+        is_instances_view = bool(path_segments and path_segments[-1].lower() == "instances")
+        if is_instances_view:
+            grouped = group_by_instance(items)
+            instance_regions = {i.get("instance_id"): i.get("region") for i in items if isinstance(i, dict)}
+            enrich_instances_ec2_state(grouped, account_id, region_filter, instance_regions)
+            # Live EC2 state changes between snapshots, so this view gets no ETag.
+            return _Reply(200, to_json_serializable({"account_id": account_id, "instances": grouped}),
+                          cacheable=not API_ENRICH_EC2_STATE)
+        page, next_token = paginate_records(items, qs, scope=f"accounts/{account_id}")
+        body = {"account_id": account_id, "records": project_fields(page, qs)}
+        if _is_paged(qs):
+            body.update(count=len(items), next_token=next_token)
+        return _Reply(200, to_json_serializable(body))
+
+    if path_segments and path_segments[-1].lower() == "changes":
+        return changes_response(qs)
+
+    if path_segments and path_segments[-1].lower() == "history":
+        return history_response()
+
+    if path_segments and path_segments[-1].lower() == "aggregate":
+        return _Reply(200, aggregate_response(qs))
+
+    if path_segments and path_segments[-1].lower() == "export":
+        return export_records(_filtered_records(qs), qs)
+
+    if path.endswith("/databases") or "/databases" in path:
+        items = _filtered_records(qs)
+        page, next_token = paginate_records(items, qs, scope="databases")
+        body = {"count": len(items), "databases": project_fields(page, qs)}
+        if _is_paged(qs):
+            body["next_token"] = next_token
+        return _Reply(200, to_json_serializable(body))
+
+    return _Reply(404, {"error": "Not found"})
+
+
+
 def lambda_handler(event, context):
     if not isinstance(event, dict):
         event = {}
@@ -324,83 +2564,40 @@ def lambda_handler(event, context):
     qs = event.get("queryStringParameters") or {}
     if not isinstance(qs, dict):
         qs = {}
+    headers = _request_headers(event)
+    not_modified = _early_not_modified(path, path_segments, qs, headers)
+    if not_modified:
+        return not_modified
 
     try:
-        if "/health" in path or path_stripped.endswith("/health") or path_segments == ["health"]:
-            items = load_all_records()
-            return http_response(
-                200,
-                {
-                    "status": "ok",
-                    "api_version": API_VERSION,
-                    "total_records": len(items),
-                    "store": "s3",
-                },
-            )
-
-        # Bare invoke URL is often /{stage} only (e.g. /prod) — API Gateway sends one path segment.
-        if _should_serve_api_root(path_segments):
-            return _api_root_response()
-
-        if path_segments and path_segments[-1].lower() == "regions" and "accounts" not in path.lower():
-            items = apply_record_filters(load_all_records(), qs)
-            regions = sorted(set(i.get("region") for i in items if isinstance(i, dict) and i.get("region")))
-            return http_response(200, {"regions": to_json_serializable(regions)})
-
-        # Must run before GET /accounts: /regions/{region}/accounts also ends with "accounts".
-        if "regions" in path_segments and path_segments[-1].lower() == "accounts":
-            try:
-                idx = path_segments.index("regions")
-                region = path_segments[idx + 1]
-            except (ValueError, IndexError):
-                return http_response(400, {"error": "Invalid region path"})
-            scoped_qs = dict(qs)
-            scoped_qs["region"] = region
-            items = apply_record_filters(load_all_records(), scoped_qs)
-            accounts = sorted(set(
-                i.get("account_id")
-                for i in items
-                if isinstance(i, dict) and i.get("account_id")
-            ))
-            return http_response(200, {"region": region, "accounts": to_json_serializable(accounts)})
-
-        is_list_accounts = (
-            path_segments
-            and path_segments[-1].lower() == "accounts"
-            and "regions" not in path_segments
-            and not path_params.get("accountId")
-            and "instances" not in path.lower()
-        )
-        if is_list_accounts:
-            items = apply_record_filters(load_all_records(), qs)
-            region_q = _norm_text(qs.get("region"))
-            if region_q:
-                accounts = sorted(set(i.get("account_id") for i in items if isinstance(i, dict) and i.get("account_id")))
-                return http_response(200, {"region": region_q, "accounts": to_json_serializable(accounts)})
-            accounts = list(set(i.get("account_id", "unknown") for i in items if isinstance(i, dict) and i.get("account_id")))
-            return http_response(200, {"accounts": to_json_serializable(accounts)})
-
-        region_filter = _norm_text(qs.get("region"))
-        account_id = _path_account_id(path_segments, path_params)
-        if account_id:
-            items = query_by_account(account_id)
-            items = apply_record_filters(items, qs)
-            is_instances_view = bool(path_segments and path_segments[-1].lower() == "instances")
-            if is_instances_view:
-                grouped = group_by_instance(items)
-                enrich_instances_ec2_state(grouped, account_id, region_filter)
-                return http_response(200, to_json_serializable({"account_id": account_id, "instances": grouped}))
-            return http_response(200, to_json_serializable({"account_id": account_id, "records": items}))
-
-        if path.endswith("/databases") or "/databases" in path:
-            items = apply_record_filters(load_all_records(), qs)
-            return http_response(200, to_json_serializable({"count": len(items), "databases": items}))
-
-        return http_response(404, {"error": "Not found"})
-
+        reply = _route(path, path_stripped, path_segments, path_params, qs)
+    except BadRequest as e:
+        reply = _Reply(400, {"error": str(e)})
     except ClientError as e:
         logger.error("AWS error: %s", e)
-        return http_response(500, {"error": "Internal error"})
+        reply = _Reply(500, {"error": "Internal error"})
     except Exception as e:
         logger.exception(str(e))
-        return http_response(500, {"error": "Internal error"})
+        reply = _Reply(500, {"error": "Internal error"})
+    return _finalize(reply, path, qs, headers)
+
+
+def prewarm(parts=None):
+    """Create clients / read objects ahead of the first request (see API_PREWARM); errors are logged."""
+    parts = API_PREWARM if parts is None else parts
+    t0 = time.perf_counter()
+    try:
+        if parts & {"s3", "summary", "records"}:
+            _s3_client()
+        if "summary" in parts and RESULTS_S3_BUCKET:
+            load_summary()
+        if "records" in parts and RESULTS_S3_BUCKET:
+            record_index(load_all_records())
+    except Exception as e:
+        logger.warning("Prewarm (%s) failed; continuing cold: %s", ",".join(sorted(parts)), e)
+        return
+    logger.info("Prewarmed %s in %.0f ms", ",".join(sorted(parts)), (time.perf_counter() - t0) * 1000)
+
+
+if API_PREWARM:
+    prewarm()
@@ -0,0 +1,194 @@
+"""
+Inventory API as a long-running HTTP server (container platform or workstation) instead of Lambda.
+
+    python lambda/api_server.py --port 8080                       # snapshot from RESULTS_S3_BUCKET
+    INVENTORY_LOCAL_PATH=./inventory.json python lambda/api_server.py   # offline, from a local file
+
+Every request goes through api_handler.lambda_handler, so routes, filters, ETags and compression are
+the same as behind API Gateway. The process keeps what a warm Lambda keeps (parsed snapshot, filter
+and tag indexes, memoized aggregates and diffs, live EC2 states) for its whole life, and requests
+are served on concurrent threads. Requests never revalidate the snapshot themselves: a background
+thread does it every API_SERVER_REFRESH_SECONDS and swaps the new snapshot in when it is parsed.
+"""
+import argparse
+import base64
+import logging
+import os
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from botocore.exceptions import ClientError
+
+import api_handler
+
+logger = logging.getLogger(__name__)
+
+# A snapshot file (served as RESULTS_S3_KEY) or a directory laid out like the bucket
+# (discovery/inventory.json, discovery/summary.json, partitions, history). Empty = read S3.
+INVENTORY_LOCAL_PATH = os.environ.get("INVENTORY_LOCAL_PATH", "")
+# Background revalidation interval; 0 = no refresh thread, requests revalidate after
+# INVENTORY_CACHE_TTL_SECONDS as in Lambda.
+API_SERVER_REFRESH_SECONDS = float(os.environ.get("API_SERVER_REFRESH_SECONDS", "60"))
+API_SERVER_HOST = os.environ.get("API_SERVER_HOST", "127.0.0.1")
+API_SERVER_PORT = int(os.environ.get("API_SERVER_PORT", "8080"))
+
+
+def _client_error(code, operation):
+    status = int(code) if code.isdigit() else 404
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, operation
+    )
+
+
+class LocalObjectStore:
+    """The S3 calls api_handler makes, answered from local files.
+
+    A directory maps keys to paths below it; a single file is served for RESULTS_S3_KEY. ETags come
+    from the file's mtime and size, so IfNoneMatch gets a 304 until the file is replaced. Large
+    exports are written below the directory and "presigned" as file:// URLs.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser().resolve()
+        self.root = self.path if self.path.is_dir() else self.path.parent
+
+    def _file(self, key):
+        if not self.path.is_dir():
+            return self.path if key == api_handler.RESULTS_S3_KEY else None
+        path = (self.root / key).resolve()
+        return path if self.root in path.parents else None
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        path = self._file(Key)
+        try:
+            stat = path.stat() if path else None
+        except OSError:
+            stat = None
+        if stat is None or not path.is_file():
+            raise _client_error("NoSuchKey", "GetObject")
+        etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+        if IfNoneMatch == etag:
+            raise _client_error("304", "GetObject")
+        return {"Body": path.open("rb"), "ETag": etag, "ContentLength": stat.st_size}
+
+    def upload_fileobj(self, fileobj, Bucket, Key, ExtraArgs=None):
+        path = self.root / Key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as out:
+            while True:
+                chunk = fileobj.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return (self.root / Params["Key"]).as_uri()
+
+
+def use_local_inventory(path):
+    """Point api_handler at ``path`` instead of S3; returns the LocalObjectStore."""
+    store = LocalObjectStore(path)
+    api_handler._S3_CLIENT = store
+    api_handler.RESULTS_S3_BUCKET = api_handler.RESULTS_S3_BUCKET or "local"
+    api_handler.EXPORT_S3_BUCKET = api_handler.EXPORT_S3_BUCKET or api_handler.RESULTS_S3_BUCKET
+    return store
+
+
+def refresh():
+    """Revalidate cached objects and rebuild what the next request would otherwise build."""
+    t0 = time.perf_counter()
+    changed = api_handler.refresh_cached_objects()
+    api_handler.prewarm({"summary", "records"})
+    if changed:
+        logger.info("Refreshed %s in %.0f ms", ", ".join(changed), (time.perf_counter() - t0) * 1000)
+    return changed
+
+
+def _refresh_loop(interval, stop):
+    while not stop.wait(interval):
+        try:
+            refresh()
+        except Exception:
+            logger.exception("Background refresh failed; serving the previous snapshot")
+
+
+def start_refresher(interval):
+    """Daemon thread calling refresh() every ``interval`` seconds; set the returned event to stop it."""
+    stop = threading.Event()
+    # Only the refresher revalidates; requests read whatever it last loaded.
+    api_handler.INVENTORY_CACHE_TTL_SECONDS = float("inf")
+    threading.Thread(target=_refresh_loop, args=(interval, stop), name="inventory-refresh", daemon=True).start()
+    return stop
+
+
+def wsgi_event(environ):
+    """API Gateway (REST, proxy integration) event for a WSGI request."""
+    query = dict(parse_qsl(environ.get("QUERY_STRING", ""), keep_blank_values=True))  # last value wins
+    headers = {k[5:].replace("_", "-").title(): v for k, v in environ.items() if k.startswith("HTTP_")}
+    path = environ.get("PATH_INFO") or "/"
+    return {
+        "httpMethod": environ.get("REQUEST_METHOD", "GET"),
+        "path": path.encode("latin-1").decode("utf-8", "replace"),
+        "queryStringParameters": query or None,
+        "headers": headers,
+        "pathParameters": None,
+    }
+
+
+def wsgi_app(environ, start_response):
+    resp = api_handler.lambda_handler(wsgi_event(environ), None)
+    body = resp.get("body") or ""
+    body = base64.b64decode(body) if resp.get("isBase64Encoded") else body.encode("utf-8")
+    status = HTTPStatus(int(resp.get("statusCode") or 500))
+    headers = [(name, str(value)) for name, value in (resp.get("headers") or {}).items()]
+    headers.append(("Content-Length", str(len(body))))
+    start_response(f"{status.value} {status.phrase}", headers)
+    return [body]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def make_api_server(host, port):
+    return make_server(host, port, wsgi_app, server_class=ThreadingWSGIServer, handler_class=_QuietHandler)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default=API_SERVER_HOST)
+    ap.add_argument("--port", type=int, default=API_SERVER_PORT)
+    ap.add_argument("--local", default=INVENTORY_LOCAL_PATH, help="snapshot file or bucket-like directory")
+    ap.add_argument("--refresh-seconds", type=float, default=API_SERVER_REFRESH_SECONDS)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    if args.local:
+        use_local_inventory(args.local)
+    elif not api_handler.RESULTS_S3_BUCKET:
+        ap.error("set RESULTS_S3_BUCKET (or S3_BUCKET), or pass --local / INVENTORY_LOCAL_PATH")
+    refresh()
+    if args.refresh_seconds > 0:
+        start_refresher(args.refresh_seconds)
+    server = make_api_server(args.host, args.port)
+    logger.info("Serving the inventory API on http://%s:%s/", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,40 @@
+import codecs
+import contextlib
+import gzip
+import hashlib
+import importlib
+import io
 import json
 import logging
 import os
+import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta, timezone
 
-import boto3
+from botocore.exceptions import ClientError
+
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access (boto3 is most of the import time)."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+boto3 = _LazyModule("boto3")
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for RESULTS_COMPRESSION=zstd
+    zstandard = None
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -17,7 +47,52 @@ S3_BUCKET = os.environ.get("S3_BUCKET", "")
 # Inventory snapshot written here (FinOps: one object per run vs many DynamoDB items).
 RESULTS_S3_BUCKET = os.environ.get("RESULTS_S3_BUCKET", "") or S3_BUCKET
 RESULTS_S3_KEY = os.environ.get("RESULTS_S3_KEY", "discovery/inventory.json")
+# Snapshot format: "json" = schema_version 1 document (default), "ndjson" = NDJSON (schema_version 2,
+# header line then one record per line). Both are streamed to S3 in RESULTS_PART_SIZE_MB multipart parts.
+RESULTS_FORMAT = os.environ.get("RESULTS_FORMAT", "json").strip().lower()
+# none | gzip | zstd (zstd needs the zstandard package in the deployment zip). Empty = gzip for NDJSON
+# and partitions, none for the json document. Sent as Content-Encoding; the API detects it by magic bytes.
+RESULTS_COMPRESSION = os.environ.get("RESULTS_COMPRESSION", "").strip().lower()
+RESULTS_PART_SIZE_MB = max(5, int(os.environ.get("RESULTS_PART_SIZE_MB", "8")))
+# RESULTS_LAYOUT=partitioned writes one NDJSON object per region/account under
+# RESULTS_PARTITION_PREFIX/<run_id>/ and then a small manifest (RESULTS_MANIFEST_KEY) listing them,
+# so the API reads only the partitions a request needs. Publishing the manifest switches runs atomically.
+RESULTS_LAYOUT = os.environ.get("RESULTS_LAYOUT", "single").strip().lower()
+RESULTS_MANIFEST_KEY = os.environ.get("RESULTS_MANIFEST_KEY", "discovery/manifest.json")
+RESULTS_PARTITION_PREFIX = os.environ.get("RESULTS_PARTITION_PREFIX", "discovery/partitions").rstrip("/")
+RESULTS_WRITE_WORKERS = max(1, int(os.environ.get("RESULTS_WRITE_WORKERS", "8")))
+# Small JSON summary (counts, regions, accounts per region, histograms) written after every snapshot;
+# the API answers /health, /regions and /summary from it without reading records.
+SUMMARY_S3_KEY = os.environ.get("SUMMARY_S3_KEY", "discovery/summary.json")
+# Every run is also kept as an immutable copy under HISTORY_S3_PREFIX/<run_id>/ with a per-record
+# fingerprint file, listed in HISTORY_S3_PREFIX/index.json, so the API can diff runs (/changes).
+# The newest HISTORY_KEEP_RUNS runs are kept; 0 turns history off.
+HISTORY_S3_PREFIX = os.environ.get("HISTORY_S3_PREFIX", "discovery/history").rstrip("/")
+HISTORY_KEEP_RUNS = max(0, int(os.environ.get("HISTORY_KEEP_RUNS", "30")))
 COMMAND_TIMEOUT = int(os.environ.get("COMMAND_TIMEOUT", "60"))
+# Completion polling starts fast and backs off geometrically (x SSM_POLL_BACKOFF) up to the cap.
+SSM_POLL_INITIAL_SECONDS = float(os.environ.get("SSM_POLL_INITIAL_SECONDS", "1"))
+SSM_POLL_MAX_SECONDS = float(os.environ.get("SSM_POLL_MAX_SECONDS", "10"))
+SSM_POLL_BACKOFF = float(os.environ.get("SSM_POLL_BACKOFF", "1.5"))
+# ListCommandInvocations(Details=True) truncates plugin output at 2500 chars; longer output is
+# re-read with GetCommandInvocation (24000 char limit) for that instance only.
+SSM_DETAILS_OUTPUT_LIMIT = 2500
+SSM_STDERR_MARKER = "----------ERROR-------"
+SSM_TERMINAL_STATUSES = ("Success", "Failed", "Cancelled", "TimedOut")
+# DescribeInstances is fetched in ID chunks on a small pool, alongside (not before) SendCommand.
+EC2_DESCRIBE_CHUNK_SIZE = max(1, int(os.environ.get("EC2_DESCRIBE_CHUNK_SIZE", "100")))
+EC2_DESCRIBE_WORKERS = max(1, int(os.environ.get("EC2_DESCRIBE_WORKERS", "4")))
+# SendCommand accepts at most 50 InstanceIds; larger regions are split and the batches sent in parallel.
+SSM_SEND_BATCH_SIZE = max(1, min(50, int(os.environ.get("SSM_SEND_BATCH_SIZE", "50"))))
+SSM_SEND_WORKERS = max(1, int(os.environ.get("SSM_SEND_WORKERS", "4")))
+# SendCommand rate controls when set, e.g. "50" or "10%" (SSM defaults apply when empty). A count in
+# SSM_MAX_CONCURRENCY caps one account/region: it is split across that region's ID batches (at least 1
+# each); a percentage applies to every batch, which is the same share of the region.
+SSM_MAX_CONCURRENCY = os.environ.get("SSM_MAX_CONCURRENCY", "").strip()
+SSM_MAX_ERRORS = os.environ.get("SSM_MAX_ERRORS", "").strip()
+# Optional Targets instead of ID batches: SSM_TARGET_TAG=Key=Value or SSM_TARGET_RESOURCE_GROUP=name.
+SSM_TARGET_TAG = os.environ.get("SSM_TARGET_TAG", "").strip()
+SSM_TARGET_RESOURCE_GROUP = os.environ.get("SSM_TARGET_RESOURCE_GROUP", "").strip()
 # StackSet DBDiscovery embeds bucket/key in the shell script — no document parameters. Passing
 # S3Bucket/S3Key causes SendCommand InvalidParameters. Set SSM_PASS_S3_PARAMETERS=true only if
 # your SSM document declares those parameters (e.g. manual upload from ssm/ssm-document.json).
@@ -26,10 +101,63 @@ SSM_PASS_S3_PARAMETERS = os.environ.get("SSM_PASS_S3_PARAMETERS", "").lower() in
 # to scan every ACTIVE member; optional ORG_EXCLUDE_ACCOUNT_IDS=comma list; ORG_SKIP_MANAGEMENT_ACCOUNT=true
 DISCOVER_ALL_ORG_ACCOUNTS = os.environ.get("DISCOVER_ALL_ORG_ACCOUNTS", "").lower() in ("1", "true", "yes")
 ORG_SKIP_MANAGEMENT_ACCOUNT = os.environ.get("ORG_SKIP_MANAGEMENT_ACCOUNT", "").lower() in ("1", "true", "yes")
+# Account x region pairs are scanned in parallel (each pair mostly waits on SSM). 1 = old serial behaviour.
+DISCOVERY_MAX_WORKERS = max(1, int(os.environ.get("DISCOVERY_MAX_WORKERS", "10")))
+# Incremental mode: reuse the previous snapshot's rows for instances whose cheap EC2/SSM signals
+# (launch time, state, type, agent/platform version) are unchanged and whose rows are younger than
+# DISCOVERY_MAX_AGE_HOURS; only new or changed instances get a SendCommand.
+DISCOVERY_INCREMENTAL = os.environ.get("DISCOVERY_INCREMENTAL", "").lower() in ("1", "true", "yes")
+DISCOVERY_MAX_AGE_HOURS = float(os.environ.get("DISCOVERY_MAX_AGE_HOURS", "24"))
+# Probe signatures of the last run ({"account|region|instance": signature}), kept out of the inventory rows.
+PROBE_SIGNATURES_S3_KEY = os.environ.get("PROBE_SIGNATURES_S3_KEY", "discovery/probe_signatures.json")
+# Time-budget checkpointing: no new pair starts once the Lambda has less than this many seconds left
+# (in-flight pairs still need up to COMMAND_TIMEOUT); finished pairs are saved to CHECKPOINT_S3_KEY
+# and the next invocation resumes from there. The snapshot is only published when every pair is done.
+DISCOVERY_DEADLINE_RESERVE_SECONDS = int(os.environ.get("DISCOVERY_DEADLINE_RESERVE_SECONDS", str(COMMAND_TIMEOUT + 60)))
+CHECKPOINT_S3_KEY = os.environ.get("CHECKPOINT_S3_KEY", "discovery/checkpoint.json")
+CHECKPOINT_MAX_AGE_HOURS = float(os.environ.get("CHECKPOINT_MAX_AGE_HOURS", "12"))
+# Re-invoke this function asynchronously after saving a checkpoint (needs lambda:InvokeFunction on itself
+# and reserved concurrency 1, so a scheduled run never works on the checkpoint next to a continuation).
+DISCOVERY_SELF_CONTINUE = os.environ.get("DISCOVERY_SELF_CONTINUE", "").lower() in ("1", "true", "yes")
+# Assumed-role credentials are cached per account and reused until this many seconds before expiry.
+SPOKE_CREDENTIAL_REFRESH_SECONDS = int(os.environ.get("SPOKE_CREDENTIAL_REFRESH_SECONDS", "300"))
+
+# Warm-container caches: (account_id, role_name) -> STS Credentials, (account_id, region, service) -> client.
+_SPOKE_CREDENTIALS = {}
+_SPOKE_CLIENTS = {}
+_SPOKE_KEY_LOCKS = {}
+_SPOKE_CACHE_LOCK = threading.Lock()
+# One boto3 Session per container. Sessions are not thread-safe, so clients are created from it under
+# _CLIENT_LOCK; the clients themselves are, and the session loads each service model only once
+# (a fresh Session per client costs ~80 ms). Hub-account clients are kept per service.
+_SESSION = None
+_CLIENT_LOCK = threading.Lock()
+_HUB_CLIENTS = {}
+
+
+def _new_client(service, **kwargs):
+    global _SESSION
+    with _CLIENT_LOCK:
+        if _SESSION is None:
+            _SESSION = boto3.session.Session()
+        return _SESSION.client(service, **kwargs)
+
+
+def _hub_client(service):
+    """Client for this (hub) account, created once per container and reused across invocations."""
+    client = _HUB_CLIENTS.get(service)
+    if client is None:
+        client = _new_client(service, region_name=os.environ.get("AWS_REGION", "eu-west-1"))
+        client = _HUB_CLIENTS.setdefault(service, client)
+    return client
+
+
+def _s3_client():
+    return _hub_client("s3")
 
 
 def list_active_org_account_ids():
-    org = boto3.client("organizations")
+    org = _hub_client("organizations")
     ids = []
     paginator = org.get_paginator("list_accounts")
     for page in paginator.paginate():
@@ -64,102 +192,321 @@ def resolve_accounts_to_scan():
     return out
 
 
+def _spoke_key_lock(key):
+    with _SPOKE_CACHE_LOCK:
+        lock = _SPOKE_KEY_LOCKS.get(key)
+        if lock is None:
+            lock = _SPOKE_KEY_LOCKS[key] = threading.Lock()
+        return lock
+
+
+def _sts_client():
+    return _hub_client("sts")
+
+
+def _credentials_expiring(creds):
+    expiration = creds.get("Expiration")
+    if not isinstance(expiration, datetime):
+        return True
+    if expiration.tzinfo is None:
+        expiration = expiration.replace(tzinfo=timezone.utc)
+    margin = timedelta(seconds=SPOKE_CREDENTIAL_REFRESH_SECONDS)
+    return expiration - datetime.now(timezone.utc) <= margin
+
+
+def get_spoke_credentials(account_id, role_name=None):
+    """AssumeRole into the spoke once per credential lifetime; concurrent callers share one call."""
+    role_name = role_name or SPOKE_ROLE_NAME
+    key = (account_id, role_name)
+    with _spoke_key_lock(key):
+        creds = _SPOKE_CREDENTIALS.get(key)
+        if creds and not _credentials_expiring(creds):
+            return creds
+        role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
+        assumed = _sts_client().assume_role(RoleArn=role_arn, RoleSessionName="DBDiscoverySession")
+        creds = assumed["Credentials"]
+        _SPOKE_CREDENTIALS[key] = creds
+        return creds
+
+
 def get_spoke_client(account_id, service, region=None):
     region = region or os.environ.get("AWS_REGION", "eu-west-1")
-    sts = boto3.client("sts")
-    role_arn = f"arn:aws:iam::{account_id}:role/{SPOKE_ROLE_NAME}"
-    assumed = sts.assume_role(RoleArn=role_arn, RoleSessionName="DBDiscoverySession")
-    creds = assumed["Credentials"]
-    return boto3.client(
-        service,
-        region_name=region,
-        aws_access_key_id=creds["AccessKeyId"],
-        aws_secret_access_key=creds["SecretAccessKey"],
-        aws_session_token=creds["SessionToken"],
-    )
+    creds = get_spoke_credentials(account_id)
+    key = (account_id, region, service)
+    with _spoke_key_lock(key):
+        cached = _SPOKE_CLIENTS.get(key)
+        if cached and cached[1] == creds["AccessKeyId"]:
+            return cached[0]
+        client = _new_client(
+            service,
+            region_name=region,
+            aws_access_key_id=creds["AccessKeyId"],
+            aws_secret_access_key=creds["SecretAccessKey"],
+            aws_session_token=creds["SessionToken"],
+        )
+        _SPOKE_CLIENTS[key] = (client, creds["AccessKeyId"])
+        return client
 
 
-def get_managed_instances(ssm_client):
-    instances = []
+def get_managed_instance_info(ssm_client):
+    """Online Linux instances as {instance_id: DescribeInstanceInformation entry}."""
+    instances = {}
     paginator = ssm_client.get_paginator("describe_instance_information")
     for page in paginator.paginate():
         for info in page.get("InstanceInformationList", []):
             if info.get("PingStatus") == "Online":
                 platform = info.get("PlatformName", "Unknown")
                 if platform and "linux" in platform.lower():
-                    instances.append((info["InstanceId"], platform))
+                    instances[info["InstanceId"]] = info
     return instances
 
 
-def get_instance_details(ec2_client, instance_ids):
-    """Fetch instance type (t-shirt size) and tags from EC2 for given instance IDs."""
+def get_managed_instances(ssm_client):
+    return [(iid, info.get("PlatformName", "Unknown")) for iid, info in get_managed_instance_info(ssm_client).items()]
+
+
+def _instance_detail(inst):
+    tags = {}
+    for t in inst.get("Tags", []):
+        key = t.get("Key")
+        val = t.get("Value")
+        if key is not None:
+            tags[key] = val or ""
+    launch_time = inst.get("LaunchTime")
+    return {
+        "instance_type": inst.get("InstanceType") or "unknown",
+        "tags": tags,
+        "ec2_state": (inst.get("State") or {}).get("Name") or "unknown",
+        "launch_time": launch_time.isoformat() if isinstance(launch_time, datetime) else str(launch_time or ""),
+    }
+
+
+def _describe_instance_chunk(ec2_client, instance_ids):
+    """Describe one ID chunk; stale or malformed IDs are dropped and the rest retried."""
     details = {}
     if not instance_ids:
         return details
     try:
-        resp = ec2_client.describe_instances(InstanceIds=instance_ids)
-        for reservation in resp.get("Reservations", []):
-            for inst in reservation.get("Instances", []):
-                iid = inst.get("InstanceId")
-                if not iid:
-                    continue
-                tags = {}
-                for t in inst.get("Tags", []):
-                    key = t.get("Key")
-                    val = t.get("Value")
-                    if key is not None:
-                        tags[key] = val or ""
-                details[iid] = {
-                    "instance_type": inst.get("InstanceType") or "unknown",
-                    "tags": tags,
-                    "ec2_state": (inst.get("State") or {}).get("Name") or "unknown",
-                }
+        paginator = ec2_client.get_paginator("describe_instances")
+        for page in paginator.paginate(InstanceIds=instance_ids):
+            for reservation in page.get("Reservations", []):
+                for inst in reservation.get("Instances", []):
+                    if inst.get("InstanceId"):
+                        details[inst["InstanceId"]] = _instance_detail(inst)
+        return details
+    except ClientError as e:
+        err = e.response.get("Error", {})
+        if err.get("Code") not in ("InvalidInstanceID.NotFound", "InvalidInstanceID.Malformed"):
+            logger.warning(f"DescribeInstances failed: {e}")
+            return details
+        bad = set(re.findall(r"i-[0-9a-zA-Z]+", err.get("Message", ""))) & set(instance_ids)
+        if bad:
+            logger.info("DescribeInstances skipping unknown IDs: %s", sorted(bad))
+            return _describe_instance_chunk(ec2_client, [i for i in instance_ids if i not in bad])
+        if len(instance_ids) == 1:
+            return details
+        # Message did not name the bad IDs: split the chunk so only the bad half is lost.
+        mid = len(instance_ids) // 2
+        details.update(_describe_instance_chunk(ec2_client, instance_ids[:mid]))
+        details.update(_describe_instance_chunk(ec2_client, instance_ids[mid:]))
+        return details
     except Exception as e:
         logger.warning(f"DescribeInstances failed: {e}")
-    return details
+        return details
 
 
-def run_ssm_command(ssm_client, instance_ids, account_id):
+def get_instance_details(ec2_client, instance_ids):
+    """Fetch instance type (t-shirt size) and tags from EC2 for given instance IDs."""
+    details = {}
     if not instance_ids:
-        return {"status": "skipped", "reason": "no_managed_instances", "instances": []}
+        return details
+    chunks = [instance_ids[i : i + EC2_DESCRIBE_CHUNK_SIZE] for i in range(0, len(instance_ids), EC2_DESCRIBE_CHUNK_SIZE)]
+    if len(chunks) == 1:
+        return _describe_instance_chunk(ec2_client, chunks[0])
+    with ThreadPoolExecutor(max_workers=min(EC2_DESCRIBE_WORKERS, len(chunks))) as pool:
+        for part in pool.map(lambda chunk: _describe_instance_chunk(ec2_client, chunk), chunks):
+            details.update(part)
+    return details
+
+
+def _ssm_targets():
+    if SSM_TARGET_TAG and "=" in SSM_TARGET_TAG:
+        key, value = SSM_TARGET_TAG.split("=", 1)
+        return [{"Key": f"tag:{key.strip()}", "Values": [value.strip()]}]
+    if SSM_TARGET_RESOURCE_GROUP:
+        return [{"Key": "resource-groups:Name", "Values": [SSM_TARGET_RESOURCE_GROUP]}]
+    return None
+
 
-    params = {"DocumentName": SSM_DOCUMENT, "InstanceIds": instance_ids}
+def _batch_max_concurrency(batch_size, total):
+    """This batch's share of SSM_MAX_CONCURRENCY when the region's IDs are sent as several commands."""
+    if not SSM_MAX_CONCURRENCY or SSM_MAX_CONCURRENCY.endswith("%") or batch_size >= total:
+        return SSM_MAX_CONCURRENCY
+    try:
+        limit = int(SSM_MAX_CONCURRENCY)
+    except ValueError:
+        return SSM_MAX_CONCURRENCY  # SendCommand reports the invalid value
+    return str(max(1, limit * batch_size // total))
+
+
+def send_ssm_command(ssm_client, instance_ids=None, targets=None, max_concurrency=None):
+    params = {"DocumentName": SSM_DOCUMENT}
+    if targets:
+        params["Targets"] = targets
+    else:
+        params["InstanceIds"] = instance_ids
+    max_concurrency = SSM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    if max_concurrency:
+        params["MaxConcurrency"] = max_concurrency
+    if SSM_MAX_ERRORS:
+        params["MaxErrors"] = SSM_MAX_ERRORS
     if S3_BUCKET and SSM_PASS_S3_PARAMETERS:
         params["Parameters"] = {"S3Bucket": [S3_BUCKET], "S3Key": ["ssm/discovery_python.py"]}
+    resp = ssm_client.send_command(**params)
+    return resp["Command"]["CommandId"]
 
-    try:
-        resp = ssm_client.send_command(**params)
-        command_id = resp["Command"]["CommandId"]
-    except Exception as e:
-        logger.error(f"SendCommand failed for account {account_id}: {e}")
-        return {"status": "error", "reason": str(e), "instances": []}
 
-    end_time = time.time() + COMMAND_TIMEOUT
-    cmd = {"Status": "Unknown"}
-    while time.time() < end_time:
-        time.sleep(5)
+def dispatch_ssm_commands(ssm_client, instance_ids, account_id):
+    """Start the probe on every instance and return ({command_id: instance_ids}, send_failures).
+
+    IDs are split into SendCommand-sized batches sent concurrently, so a large region starts in
+    one round trip instead of failing on the 50-ID limit. With SSM_TARGET_TAG or
+    SSM_TARGET_RESOURCE_GROUP a single Targets command is sent (expected IDs = None). Instances in a
+    batch whose SendCommand failed come back as error results instead of being dropped. A count in
+    SSM_MAX_CONCURRENCY is divided among the batches, so the region as a whole stays within it.
+    """
+    targets = _ssm_targets()
+    if targets:
         try:
-            status_resp = ssm_client.list_commands(CommandId=command_id)
-            if status_resp.get("Commands"):
-                cmd = status_resp["Commands"][0]
-                if cmd["Status"] in ("Success", "Failed", "Cancelled", "TimedOut"):
-                    break
+            return {send_ssm_command(ssm_client, targets=targets): None}, []
         except Exception as e:
-            logger.warning(f"ListCommands failed: {e}")
-            continue
+            logger.error(f"SendCommand failed for account {account_id}: {e}")
+            return {}, [{"instance_id": iid, "status": "error", "output": "", "error": str(e)} for iid in instance_ids]
 
-    results = []
-    for iid in instance_ids:
+    batches = [instance_ids[i : i + SSM_SEND_BATCH_SIZE] for i in range(0, len(instance_ids), SSM_SEND_BATCH_SIZE)]
+    commands = {}
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, min(SSM_SEND_WORKERS, len(batches)))) as pool:
+        futures = {
+            pool.submit(
+                send_ssm_command, ssm_client, batch, max_concurrency=_batch_max_concurrency(len(batch), len(instance_ids))
+            ): batch
+            for batch in batches
+        }
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            try:
+                commands[fut.result()] = batch
+            except Exception as e:
+                logger.error(f"SendCommand failed for account {account_id} ({len(batch)} instances): {e}")
+                failures.extend({"instance_id": iid, "status": "error", "output": "", "error": str(e)} for iid in batch)
+    return commands, failures
+
+
+def _list_invocations(ssm_client, command_id):
+    invocations = []
+    paginator = ssm_client.get_paginator("list_command_invocations")
+    for page in paginator.paginate(CommandId=command_id, Details=True):
+        invocations.extend(page.get("CommandInvocations", []))
+    return invocations
+
+
+def _invocation_result(ssm_client, command_id, inv):
+    iid = inv.get("InstanceId")
+    status = inv.get("Status", "Unknown")
+    combined = "".join(p.get("Output") or "" for p in inv.get("CommandPlugins") or [])
+    if len(combined) >= SSM_DETAILS_OUTPUT_LIMIT:
         try:
-            inv = ssm_client.get_command_invocation(CommandId=command_id, InstanceId=iid)
-            status = inv.get("Status", "Unknown")
-            output = inv.get("StandardOutputContent", "")
-            error = inv.get("StandardErrorContent", "")
-            results.append({"instance_id": iid, "status": status, "output": output, "error": error})
+            full = ssm_client.get_command_invocation(CommandId=command_id, InstanceId=iid)
+            return {
+                "instance_id": iid,
+                "status": full.get("Status", status),
+                "output": full.get("StandardOutputContent", ""),
+                "error": full.get("StandardErrorContent", ""),
+            }
         except Exception as e:
-            results.append({"instance_id": iid, "status": "error", "output": "", "error": str(e)})
+            logger.warning("GetCommandInvocation failed for %s: %s", iid, e)
+    # Plugin output is stdout followed by stderr after the SSM marker line.
+    output, _, error = combined.partition(SSM_STDERR_MARKER)
+    return {"instance_id": iid, "status": status, "output": output, "error": error.strip()}
+
+
+def track_command_invocations(ssm_client, commands, timeout=None):
+    """Yield one result per instance as soon as its invocation reaches a terminal status.
+
+    ``commands`` maps command_id -> expected instance IDs (None when the command used Targets).
+    Every in-flight command is polled together with paginated ListCommandInvocations(Details=True),
+    so a region costs a handful of calls per poll instead of one GetCommandInvocation per instance.
+    Instances still unfinished at the deadline are yielded last with their last seen status.
+    """
+    deadline = time.time() + (COMMAND_TIMEOUT if timeout is None else timeout)
+    expected = {cid: set(iids) if iids is not None else None for cid, iids in commands.items()}
+    pending = set(expected)
+    done = set()
+    last_status = {}
+    delay = SSM_POLL_INITIAL_SECONDS
+
+    while pending and time.time() < deadline:
+        time.sleep(max(0.0, min(delay, deadline - time.time())))
+        delay = min(delay * SSM_POLL_BACKOFF, SSM_POLL_MAX_SECONDS)
+        for cid in sorted(pending):
+            try:
+                invocations = _list_invocations(ssm_client, cid)
+            except Exception as e:
+                logger.warning(f"ListCommandInvocations failed: {e}")
+                continue
+            unfinished = False
+            for inv in invocations:
+                iid = inv.get("InstanceId")
+                if not iid or (cid, iid) in done:
+                    continue
+                status = inv.get("Status", "Unknown")
+                if status in SSM_TERMINAL_STATUSES:
+                    done.add((cid, iid))
+                    yield _invocation_result(ssm_client, cid, inv)
+                else:
+                    last_status[(cid, iid)] = status
+                    unfinished = True
+            wanted = expected[cid]
+            if wanted is not None:
+                unfinished = unfinished or any((cid, iid) not in done for iid in wanted)
+            elif not invocations:
+                unfinished = True
+            if not unfinished:
+                pending.discard(cid)
+
+    for cid in sorted(expected):
+        stragglers = set(expected[cid] or ()) | {iid for c, iid in last_status if c == cid}
+        for iid in sorted(stragglers):
+            if (cid, iid) in done:
+                continue
+            status = last_status.get((cid, iid), "Pending")
+            yield {
+                "instance_id": iid,
+                "status": status,
+                "output": "",
+                "error": f"Command still {status} after {COMMAND_TIMEOUT}s",
+            }
+
+
+def run_ssm_command(ssm_client, instance_ids, account_id):
+    if not instance_ids:
+        return {"status": "skipped", "reason": "no_managed_instances", "instances": []}
+
+    commands, failures = dispatch_ssm_commands(ssm_client, instance_ids, account_id)
+    if not commands:
+        reason = failures[0]["error"] if failures else "no_commands_sent"
+        return {"status": "error", "reason": reason, "instances": []}
 
-    return {"status": cmd.get("Status", "Unknown"), "command_id": command_id, "instances": results}
+    results = failures + list(track_command_invocations(ssm_client, commands))
+    statuses = {r["status"] for r in results}
+    if statuses == {"Success"}:
+        status = "Success"
+    elif statuses - set(SSM_TERMINAL_STATUSES) - {"error"}:
+        status = "InProgress"
+    else:
+        status = "Failed"
+    return {"status": status, "command_ids": sorted(commands), "instances": results}
 
 
 def parse_discovery_output(output_str, instance_id, account_id, region, instance_details=None):
@@ -245,25 +592,994 @@ def parse_discovery_output(output_str, instance_id, account_id, region, instance
     return records
 
 
+def probe_signature(ssm_info, ec2_detail):
+    """Short hash of the cheap signals that change when a re-probe is worthwhile; "" if EC2 data is missing."""
+    ec2_detail = ec2_detail or {}
+    if not ec2_detail.get("launch_time"):
+        return ""
+    parts = (
+        ec2_detail.get("launch_time"),
+        ec2_detail.get("ec2_state"),
+        ec2_detail.get("instance_type"),
+        (ssm_info or {}).get("AgentVersion"),
+        (ssm_info or {}).get("PlatformName"),
+        (ssm_info or {}).get("PlatformVersion"),
+    )
+    return hashlib.sha1("|".join(str(p or "") for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_timestamp(value):
+    try:
+        ts = datetime.fromisoformat(str(value).rstrip("Z"))
+    except ValueError:
+        return None
+    return ts.replace(tzinfo=None) if ts.tzinfo is None else ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def reusable_records(previous_rows, signature, now=None):
+    """Previous rows for an instance if they can stand in for a fresh probe, else None."""
+    if not previous_rows or not signature:
+        return None
+    now = now or datetime.utcnow()
+    max_age = timedelta(hours=DISCOVERY_MAX_AGE_HOURS)
+    for row in previous_rows:
+        if row.get("discovery_status") != "success" or row.get("probe_signature") != signature:
+            return None
+        ts = _parse_timestamp(row.get("discovery_timestamp"))
+        if ts is None or now - ts > max_age:
+            return None
+    return previous_rows
+
+
+def _instance_key(record):
+    return f"{record.get('account_id')}|{record.get('region')}|{record.get('instance_id')}"
+
+
+def index_previous_records(records, signatures=None):
+    """Group a snapshot's rows by (account_id, region, instance_id) for incremental runs.
+
+    ``signatures`` (load_probe_signatures()) puts each instance's probe_signature back on its rows.
+    """
+    by_instance = {}
+    for r in records:
+        if isinstance(r, dict) and r.get("instance_id"):
+            if signatures and "probe_signature" not in r:
+                r["probe_signature"] = signatures.get(_instance_key(r), "")
+            by_instance.setdefault((r.get("account_id"), r.get("region"), r["instance_id"]), []).append(r)
+    return by_instance
+
+
+def pop_probe_signatures(records):
+    """Remove probe_signature from the rows; returns {"account|region|instance": signature}.
+
+    The signature only matters to the next incremental run, so it is stored next to the snapshot
+    (PROBE_SIGNATURES_S3_KEY) instead of in the inventory the API serves.
+    """
+    signatures = {}
+    for r in records:
+        signature = r.pop("probe_signature", None) if isinstance(r, dict) else None
+        if signature:
+            signatures[_instance_key(r)] = signature
+    return signatures
+
+
+def store_probe_signatures_s3(signatures):
+    if not RESULTS_S3_BUCKET or not PROBE_SIGNATURES_S3_KEY:
+        return
+    try:
+        _s3_client().put_object(
+            Bucket=RESULTS_S3_BUCKET,
+            Key=PROBE_SIGNATURES_S3_KEY,
+            Body=json.dumps(signatures, sort_keys=True).encode("utf-8"),
+            ContentType="application/json",
+        )
+    except Exception as e:
+        # Only costs the next incremental run a full probe.
+        logger.warning("Could not write probe signatures: %s", e)
+
+
+def load_probe_signatures():
+    if not RESULTS_S3_BUCKET or not PROBE_SIGNATURES_S3_KEY:
+        return {}
+    try:
+        resp = _s3_client().get_object(Bucket=RESULTS_S3_BUCKET, Key=PROBE_SIGNATURES_S3_KEY)
+        data = json.loads(resp["Body"].read().decode("utf-8"))
+    except Exception as e:
+        logger.warning("Probe signatures unavailable, re-probing every instance: %s", e)
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class _StreamingBodyIO(io.RawIOBase):
+    """Adapt a botocore StreamingBody (read(n) only) to io so it can be buffered and gunzipped."""
+
+    def __init__(self, body):
+        self._body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._body.read(len(b))
+        b[: len(chunk)] = chunk
+        return len(chunk)
+
+
+_JSON_DECODER = json.JSONDecoder()
+# An NDJSON header line is short; a longer first line is the start of a schema_version 1 document.
+_NDJSON_HEADER_MAX_BYTES = 1 << 16
+
+
+class _JsonChunks:
+    """Text of a binary stream decoded one chunk at a time, read as a sequence of JSON tokens/values.
+
+    Only the unread part of the current chunk (plus any value cut at its end) is held, so a
+    schema_version 1 document is parsed one record at a time instead of as one string.
+    """
+
+    _CHUNK = 1 << 16
+
+    def __init__(self, stream, head=b""):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = self._decoder.decode(head)
+        self._pos = 0
+
+    def _more(self):
+        data = self._stream.read(self._CHUNK)
+        self._buf = self._buf[self._pos:] + self._decoder.decode(data, final=not data)
+        self._pos = 0
+        return bool(data)
+
+    def peek(self):
+        """Next non-whitespace character without consuming it; "" at the end of the stream."""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._more():
+                return ""
+
+    def take(self, char):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            if end == len(self._buf) and self._more():
+                continue  # a number at the end of the chunk may go on in the next one
+            self._pos = end
+            return value
+
+
+def _iter_json_array(chunks):
+    chunks.take("[")
+    if chunks.peek() == "]":
+        chunks.take("]")
+        return
+    while True:
+        yield chunks.value()
+        if chunks.peek() != ",":
+            chunks.take("]")
+            return
+        chunks.take(",")
+
+
+def _iter_document_records(chunks):
+    """Records of a schema_version 1 document ({..., "records": [...]}) or a bare list, one at a time."""
+    first = chunks.peek()
+    if first == "[":
+        items = _iter_json_array(chunks)
+    elif first == "{":
+        items = _iter_document_fields(chunks)
+    else:
+        chunks.value()  # a scalar holds no records; empty or invalid input raises
+        return
+    for record in items:
+        if isinstance(record, dict):
+            yield record
+
+
+def _iter_document_fields(chunks):
+    chunks.take("{")
+    if chunks.peek() == "}":
+        return
+    while True:
+        key = chunks.value()
+        chunks.take(":")
+        if key == "records" and chunks.peek() == "[":
+            yield from _iter_json_array(chunks)
+        else:
+            chunks.value()
+        if chunks.peek() != ",":
+            chunks.take("}")
+            return
+        chunks.take(",")
+
+
+def iter_snapshot_records(body):
+    """Yield records from a snapshot body: schema_version 1 JSON or NDJSON, plain, gzip or zstd."""
+    stream = io.BufferedReader(_StreamingBodyIO(body), buffer_size=1 << 16)
+    magic = stream.peek(4)[:4]
+    if magic[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("snapshot is zstd-compressed but the zstandard package is not installed")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream), buffer_size=1 << 16)
+    first = stream.readline(_NDJSON_HEADER_MAX_BYTES)
+    try:
+        head = json.loads(first) if first.endswith(b"\n") else None
+    except json.JSONDecodeError:
+        head = None
+    if isinstance(head, dict) and head.get("format") == "ndjson":
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    yield record
+        return
+    yield from _iter_document_records(_JsonChunks(stream, first))
+
+
+def load_manifest(s3=None):
+    s3 = s3 or _s3_client()
+    try:
+        resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=RESULTS_MANIFEST_KEY)
+        return json.loads(resp["Body"].read().decode("utf-8"))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code", "") in ("NoSuchKey", "404", "NotFound"):
+            return None
+        raise
+
+
+def load_previous_records():
+    if not RESULTS_S3_BUCKET:
+        return []
+    s3 = _s3_client()
+    try:
+        if RESULTS_LAYOUT == "partitioned":
+            records = []
+            for part in (load_manifest(s3) or {}).get("partitions", []):
+                resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=part["key"])
+                records.extend(iter_snapshot_records(resp["Body"]))
+            return records
+        resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=RESULTS_S3_KEY)
+        return list(iter_snapshot_records(resp["Body"]))
+    except Exception as e:
+        logger.warning("Previous snapshot unavailable, running full discovery: %s", e)
+        return []
+
+
+class S3MultipartWriter:
+    """Write-only binary sink that uploads to S3 in ``part_size`` parts, so peak memory is one part.
+
+    Objects smaller than one part are sent with a single PutObject. Use as a context manager: the
+    upload is completed on a clean exit and aborted if the body raised.
+    """
+
+    def __init__(self, s3, bucket, key, part_size, **put_kwargs):
+        self._s3 = s3
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._put_kwargs = put_kwargs
+        self._buf = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self.bytes_written = 0
+        self.etag = None
+
+    def write(self, data):
+        self._buf += data
+        self.bytes_written += len(data)
+        while len(self._buf) >= self._part_size:
+            self._upload_part(bytes(self._buf[: self._part_size]))
+            del self._buf[: self._part_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, chunk):
+        if self._upload_id is None:
+            resp = self._s3.create_multipart_upload(Bucket=self._bucket, Key=self._key, **self._put_kwargs)
+            self._upload_id = resp["UploadId"]
+        number = len(self._parts) + 1
+        resp = self._s3.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=chunk
+        )
+        self._parts.append({"ETag": resp["ETag"], "PartNumber": number})
+
+    def close(self):
+        if self._upload_id is None:
+            resp = self._s3.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buf), **self._put_kwargs)
+        else:
+            if self._buf:
+                self._upload_part(bytes(self._buf))
+            resp = self._s3.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buf = bytearray()
+        self.etag = resp.get("ETag")
+
+    def abort(self):
+        if self._upload_id is not None:
+            try:
+                self._s3.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning("AbortMultipartUpload failed for %s: %s", self._key, e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def snapshot_compression(fmt=None):
+    compression = RESULTS_COMPRESSION or ("gzip" if (fmt or RESULTS_FORMAT) == "ndjson" else "none")
+    if compression not in ("none", "gzip", "zstd"):
+        raise ValueError(f"Unsupported RESULTS_COMPRESSION: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("RESULTS_COMPRESSION=zstd requires the zstandard package")
+    return compression
+
+
+def _open_compressed(sink, compression):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6, mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).stream_writer(sink, closefd=False)
+    return contextlib.nullcontext(sink)
+
+
+def snapshot_put_kwargs(fmt, compression, record_count=None):
+    """Content-Type / Content-Encoding / metadata for a snapshot object."""
+    kwargs = {"ContentType": "application/x-ndjson" if fmt == "ndjson" else "application/json"}
+    if compression != "none":
+        kwargs["ContentEncoding"] = compression
+    metadata = {"inventory-format": fmt, "inventory-compression": compression}
+    if record_count is not None:
+        metadata["record-count"] = str(record_count)
+    kwargs["Metadata"] = metadata
+    return kwargs
+
+
+def write_snapshot(sink, records, updated_at, fmt=None, compression=None):
+    """Serialize records one at a time into a binary sink (compressing on the fly); returns the count."""
+    fmt = fmt or RESULTS_FORMAT
+    compression = compression or snapshot_compression(fmt)
+    count = 0
+    with _open_compressed(sink, compression) as out:
+        if fmt == "ndjson":
+            header = {"schema_version": 2, "format": "ndjson", "updated_at": updated_at}
+            out.write(json.dumps(header).encode("utf-8") + b"\n")
+            for record in records:
+                out.write(json.dumps(record, default=str).encode("utf-8") + b"\n")
+                count += 1
+            return count
+
+        # schema_version 1 document, streamed: same bytes as json.dumps(payload) without holding it.
+        records = records if isinstance(records, list) else list(records)
+        head = {"schema_version": 1, "updated_at": updated_at, "record_count": len(records)}
+        out.write(json.dumps(head)[:-1].encode("utf-8") + b', "records": [')
+        for record in records:
+            out.write((b", " if count else b"") + json.dumps(record, default=str).encode("utf-8"))
+            count += 1
+        out.write(b"]}")
+    return count
+
+_EMPTY_DB_IDS = ("", "none", "discovery_failed")
+
+
+class SummaryBuilder:
+    """Accumulates the inventory summary one record at a time (see SUMMARY_S3_KEY)."""
+
+    def __init__(self):
+        self.total_records = 0
+        self.total_databases = 0
+        self.accounts_by_region = {}
+        self.by_account = {}
+        self.instances = {}
+        self.engines = {}
+        self.db_status = {}
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            return
+        self.total_records += 1
+        region = record.get("region")
+        account_id = record.get("account_id")
+        instance_id = record.get("instance_id")
+        if region:
+            accounts = self.accounts_by_region.setdefault(region, set())
+            if account_id:
+                accounts.add(account_id)
+        account = None
+        if account_id:
+            account = self.by_account.setdefault(
+                account_id, {"records": 0, "databases": 0, "instances": set(), "regions": set()}
+            )
+            account["records"] += 1
+            if region:
+                account["regions"].add(region)
+            if instance_id:
+                account["instances"].add((region, instance_id))
+        if instance_id:
+            # Every row of an instance carries the same probe / EC2 state; the last one wins.
+            self.instances[(account_id, region, instance_id)] = (
+                str(record.get("discovery_status") or "unknown").lower(),
+                str(record.get("ec2_state") or "unknown").lower(),
+            )
+        if str(record.get("db_id") or "").strip().lower() not in _EMPTY_DB_IDS:
+            self.total_databases += 1
+            if account is not None:
+                account["databases"] += 1
+            engine = str(record.get("engine") or "unknown").lower()
+            status = str(record.get("status") or "unknown").lower()
+            self.engines[engine] = self.engines.get(engine, 0) + 1
+            self.db_status[status] = self.db_status.get(status, 0) + 1
+
+    def observe(self, records):
+        """Pass records through unchanged while adding each one (for streaming writers)."""
+        for record in records:
+            self.add(record)
+            yield record
+
+    def result(self, updated_at, **extra):
+        discovery_status, ec2_state = {}, {}
+        for probe, state in self.instances.values():
+            discovery_status[probe] = discovery_status.get(probe, 0) + 1
+            ec2_state[state] = ec2_state.get(state, 0) + 1
+        summary = {
+            "schema_version": 1,
+            "updated_at": updated_at,
+            "total_records": self.total_records,
+            "total_instances": len(self.instances),
+            "total_databases": self.total_databases,
+            "regions": sorted(self.accounts_by_region),
+            "accounts": sorted(self.by_account),
+            "accounts_by_region": {r: sorted(a) for r, a in sorted(self.accounts_by_region.items())},
+            "by_account": {
+                account_id: {
+                    "records": a["records"],
+                    "instances": len(a["instances"]),
+                    "databases": a["databases"],
+                    "regions": sorted(a["regions"]),
+                }
+                for account_id, a in sorted(self.by_account.items())
+            },
+            "engines": dict(sorted(self.engines.items())),
+            "db_status": dict(sorted(self.db_status.items())),
+            "discovery_status": dict(sorted(discovery_status.items())),
+            "ec2_state": dict(sorted(ec2_state.items())),
+        }
+        summary.update(extra)
+        return summary
+
+
+def build_summary(records, updated_at=None, **extra):
+    builder = SummaryBuilder()
+    for record in records:
+        builder.add(record)
+    return builder.result(updated_at, **extra)
+
+
+def store_summary_s3(s3, summary):
+    s3.put_object(
+        Bucket=RESULTS_S3_BUCKET,
+        Key=SUMMARY_S3_KEY,
+        Body=json.dumps(summary).encode("utf-8"),
+        ContentType="application/json",
+    )
+    logger.info("Wrote summary (%s records) to s3://%s/%s", summary["total_records"], RESULTS_S3_BUCKET, SUMMARY_S3_KEY)
+
+
+# Keys left out of record fingerprints: they change on every probe while the database does not.
+FINGERPRINT_IGNORE_FIELDS = ("discovery_timestamp", "probe_signature")
+# Fields kept next to each fingerprint so /changes can show what a removed / modified record was.
+FINGERPRINT_FIELDS = ("region", "engine", "version", "status", "instance_type", "ec2_state")
+
+
+def record_key_hash(record):
+    """16 hex digits identifying a record across runs: hash of (account_id, instance_id, db_id)."""
+    key = "\x1f".join(str(record.get(k) or "") for k in ("account_id", "instance_id", "db_id"))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# Built once: json.dumps() with non-default options constructs a new encoder on every call.
+_FINGERPRINT_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=str)
+_ROW_ENCODER = json.JSONEncoder(default=str)
+
+
+def record_fingerprint(record):
+    """16 hex digits that change when any field outside FINGERPRINT_IGNORE_FIELDS changes."""
+    body = {k: v for k, v in record.items() if k not in FINGERPRINT_IGNORE_FIELDS}
+    text = _FINGERPRINT_ENCODER.encode(body)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def write_fingerprints(sink, records, run_id, updated_at):
+    """Gzip NDJSON: a header, then one JSON array per record.
+
+    Each array is [key hash, fingerprint, account_id, instance_id, db_id, *FINGERPRINT_FIELDS]. The
+    hashes are fixed-width hex at the start of the line, so readers can skip lines without parsing them.
+    """
+    count = 0
+    with _open_compressed(sink, "gzip") as out:
+        header = {
+            "schema_version": 1,
+            "format": "fingerprints",
+            "run_id": run_id,
+            "updated_at": updated_at,
+            "fields": ["key_hash", "fingerprint", "account_id", "instance_id", "db_id", *FINGERPRINT_FIELDS],
+        }
+        out.write(json.dumps(header).encode("utf-8") + b"\n")
+        fields = ("account_id", "instance_id", "db_id", *FINGERPRINT_FIELDS)
+        lines = []
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            row = [record_key_hash(record), record_fingerprint(record)]
+            row.extend(record.get(k) for k in fields)
+            lines.append(_ROW_ENCODER.encode(row))
+            count += 1
+            if len(lines) >= 4096:
+                out.write(("\n".join(lines) + "\n").encode("utf-8"))
+                lines.clear()
+        if lines:
+            out.write(("\n".join(lines) + "\n").encode("utf-8"))
+    return count
+
+
+def history_key(run_id, name):
+    return f"{HISTORY_S3_PREFIX}/{run_id}/{name}"
+
+
+def _load_history_index(s3):
+    try:
+        resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=f"{HISTORY_S3_PREFIX}/index.json")
+        index = json.loads(resp["Body"].read().decode("utf-8"))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code", "") not in ("NoSuchKey", "404", "NotFound"):
+            raise
+        index = None
+    if not isinstance(index, dict) or not isinstance(index.get("runs"), list):
+        index = {"schema_version": 1, "runs": []}
+    return index
+
+
+def publish_history(s3, records, run, copies, manifest=None):
+    """Keep this run under HISTORY_S3_PREFIX/<run_id>/ and list it in the history index.
+
+    ``copies`` maps live object keys to their names under the run prefix (server-side copies); a
+    partition ``manifest`` is re-written there pointing at the copied partitions. Runs that fall out
+    of the newest HISTORY_KEEP_RUNS are deleted afterwards.
+    """
+    run_id = run["run_id"]
+    part_size = RESULTS_PART_SIZE_MB * 1024 * 1024
+    fingerprints_key = history_key(run_id, "fingerprints.ndjson.gz")
+    with S3MultipartWriter(
+        s3, RESULTS_S3_BUCKET, fingerprints_key, part_size, ContentType="application/x-ndjson"
+    ) as sink:
+        write_fingerprints(sink, records, run_id, run["updated_at"])
+
+    def copy(item):
+        source, name = item
+        s3.copy_object(
+            Bucket=RESULTS_S3_BUCKET,
+            Key=history_key(run_id, name),
+            CopySource={"Bucket": RESULTS_S3_BUCKET, "Key": source},
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(RESULTS_WRITE_WORKERS, len(copies) or 1))) as pool:
+        list(pool.map(copy, copies.items()))
+    entry = dict(run, fingerprints_key=fingerprints_key)
+    if manifest is not None:
+        manifest = dict(manifest, partitions=[
+            dict(p, key=history_key(run_id, copies[p["key"]])) for p in manifest["partitions"]
+        ])
+        entry["manifest_key"] = history_key(run_id, "manifest.json")
+        s3.put_object(
+            Bucket=RESULTS_S3_BUCKET,
+            Key=entry["manifest_key"],
+            Body=json.dumps(manifest).encode("utf-8"),
+            ContentType="application/json",
+        )
+    else:
+        entry["snapshot_key"] = history_key(run_id, copies[RESULTS_S3_KEY])
+
+    index = _load_history_index(s3)
+    runs = [r for r in index["runs"] if isinstance(r, dict) and r.get("run_id") != run_id] + [entry]
+    dropped, index["runs"] = runs[:-HISTORY_KEEP_RUNS], runs[-HISTORY_KEEP_RUNS:]
+    index["updated_at"] = run["updated_at"]
+    s3.put_object(
+        Bucket=RESULTS_S3_BUCKET,
+        Key=f"{HISTORY_S3_PREFIX}/index.json",
+        Body=json.dumps(index).encode("utf-8"),
+        ContentType="application/json",
+    )
+    logger.info("Published run %s to history (%s runs kept)", run_id, len(index["runs"]))
+    for old in dropped:
+        try:
+            _delete_prefix(s3, f"{HISTORY_S3_PREFIX}/{old['run_id']}/")
+        except Exception as e:
+            logger.warning("Could not delete history run %s: %s", old.get("run_id"), e)
+
+
+def _publish_history_safely(s3, records, run, copies, manifest=None):
+    # The live snapshot is already published; a history failure must not fail the run.
+    try:
+        publish_history(s3, records, run, copies, manifest)
+    except Exception as e:
+        logger.warning("Could not publish run %s to history: %s", run.get("run_id"), e)
+
+
 def store_results_s3(records):
     if not RESULTS_S3_BUCKET:
         raise ValueError("RESULTS_S3_BUCKET or S3_BUCKET must be set to store inventory")
+    if RESULTS_LAYOUT == "partitioned":
+        return store_partitioned_s3(records)
+
+    if HISTORY_KEEP_RUNS and not isinstance(records, list):
+        records = list(records)  # read twice: snapshot, then fingerprints
+    compression = snapshot_compression()
+    record_count = len(records) if isinstance(records, list) else None
+    put_kwargs = snapshot_put_kwargs(RESULTS_FORMAT, compression, record_count)
+    s3 = _s3_client()
+    part_size = RESULTS_PART_SIZE_MB * 1024 * 1024
+    updated_at = datetime.utcnow().isoformat() + "Z"
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    summary = SummaryBuilder()
+    with S3MultipartWriter(s3, RESULTS_S3_BUCKET, RESULTS_S3_KEY, part_size, **put_kwargs) as sink:
+        count = write_snapshot(sink, summary.observe(records), updated_at, compression=compression)
+    logger.info(
+        "Wrote %s records (%s bytes, %s/%s) to s3://%s/%s",
+        count, sink.bytes_written, RESULTS_FORMAT, compression, RESULTS_S3_BUCKET, RESULTS_S3_KEY,
+    )
+    store_summary_s3(s3, summary.result(updated_at, snapshot_etag=sink.etag, run_id=run_id))
+    if HISTORY_KEEP_RUNS:
+        run = {"run_id": run_id, "updated_at": updated_at, "record_count": count, "layout": "single"}
+        _publish_history_safely(s3, records, run, {RESULTS_S3_KEY: RESULTS_S3_KEY.rsplit("/", 1)[-1]})
+
+
+_COMPRESSION_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def partition_key(run_id, region, account_id, compression="gzip"):
+    suffix = _COMPRESSION_SUFFIX.get(compression, "")
+    return f"{RESULTS_PARTITION_PREFIX}/{run_id}/region={region}/account={account_id}.ndjson{suffix}"
+
 
+def _delete_prefix(s3, prefix):
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=RESULTS_S3_BUCKET, Prefix=prefix):
+        keys = [{"Key": o["Key"]} for o in page.get("Contents", [])]
+        if keys:
+            s3.delete_objects(Bucket=RESULTS_S3_BUCKET, Delete={"Objects": keys, "Quiet": True})
+
+
+def store_partitioned_s3(records):
+    """Write one object per (region, account_id) for this run, then publish the manifest.
+
+    Partitions of the run before the previous one are deleted afterwards, so an API container that
+    still holds the previous manifest can keep reading its partitions.
+    """
+    s3 = _s3_client()
+    updated_at = datetime.utcnow().isoformat() + "Z"
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    groups = {}
+    summary = SummaryBuilder()
+    for r in records:
+        summary.add(r)
+        groups.setdefault((r.get("region") or "unknown", r.get("account_id") or "unknown"), []).append(r)
+
+    part_size = RESULTS_PART_SIZE_MB * 1024 * 1024
+    compression = snapshot_compression("ndjson")
+
+    def write_partition(item):
+        (region, account_id), rows = item
+        key = partition_key(run_id, region, account_id, compression)
+        put_kwargs = snapshot_put_kwargs("ndjson", compression, len(rows))
+        with S3MultipartWriter(s3, RESULTS_S3_BUCKET, key, part_size, **put_kwargs) as sink:
+            count = write_snapshot(sink, rows, updated_at, fmt="ndjson", compression=compression)
+        return {
+            "region": region,
+            "account_id": account_id,
+            "key": key,
+            "record_count": count,
+            "bytes": sink.bytes_written,
+            "etag": sink.etag,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, min(RESULTS_WRITE_WORKERS, len(groups)))) as pool:
+        partitions = list(pool.map(write_partition, sorted(groups.items())))
+
+    previous = None
+    try:
+        previous = load_manifest(s3)
+    except Exception as e:
+        logger.warning("Could not read previous manifest: %s", e)
+    manifest = {
+        "schema_version": 2,
+        "layout": "partitioned",
+        "run_id": run_id,
+        "previous_run_id": (previous or {}).get("run_id"),
+        "updated_at": updated_at,
+        "record_count": sum(p["record_count"] for p in partitions),
+        "compression": compression,
+        "partitions": partitions,
+    }
+    s3.put_object(
+        Bucket=RESULTS_S3_BUCKET,
+        Key=RESULTS_MANIFEST_KEY,
+        Body=json.dumps(manifest).encode("utf-8"),
+        ContentType="application/json",
+    )
+    logger.info(
+        "Wrote %s records in %s partitions; manifest s3://%s/%s",
+        manifest["record_count"], len(partitions), RESULTS_S3_BUCKET, RESULTS_MANIFEST_KEY,
+    )
+    store_summary_s3(s3, summary.result(updated_at, run_id=run_id))
+    if HISTORY_KEEP_RUNS:
+        run = {
+            "run_id": run_id,
+            "updated_at": updated_at,
+            "record_count": manifest["record_count"],
+            "layout": "partitioned",
+        }
+        prefix = f"{RESULTS_PARTITION_PREFIX}/{run_id}/"
+        copies = {p["key"]: "partitions/" + p["key"][len(prefix):] for p in partitions}
+        rows = (r for _, group in sorted(groups.items()) for r in group)
+        _publish_history_safely(s3, rows, run, copies, manifest)
+
+    stale_run = (previous or {}).get("previous_run_id")
+    if stale_run and stale_run != run_id:
+        try:
+            _delete_prefix(s3, f"{RESULTS_PARTITION_PREFIX}/{stale_run}/")
+        except Exception as e:
+            logger.warning("Could not delete partitions of run %s: %s", stale_run, e)
+
+
+def discover_account_region(account_id, region, previous=None):
+    """Assume role, list managed instances, run the probe and parse results for one account/region pair.
+
+    ``previous`` is the index_previous_records() map of the last snapshot; when given, instances
+    whose probe_signature is unchanged keep their old rows (original discovery_timestamp) and only
+    the rest are sent the SSM command.
+    """
+    records = []
+    try:
+        ssm = get_spoke_client(account_id, "ssm", region=region)
+        ec2 = get_spoke_client(account_id, "ec2", region=region)
+    except Exception as e:
+        logger.error(f"Assume role failed for {account_id} in {region}: {e}")
+        return records
+
+    ssm_info = get_managed_instance_info(ssm)
+    if not ssm_info:
+        logger.info(f"No managed instances in account {account_id} region {region}")
+        return records
+
+    instance_ids = list(ssm_info)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        details_future = pool.submit(get_instance_details, ec2, instance_ids)
+
+        if previous is not None:
+            # Change detection needs EC2 metadata up front; only changed instances are probed.
+            details = details_future.result()
+            to_probe = []
+            for iid in instance_ids:
+                reused = reusable_records(previous.get((account_id, region, iid)), probe_signature(ssm_info[iid], details.get(iid)))
+                if reused is None:
+                    to_probe.append(iid)
+                    continue
+                current = details[iid]
+                for row in reused:
+                    records.append(dict(
+                        row,
+                        instance_type=current["instance_type"],
+                        tags=current["tags"],
+                        ec2_state=current["ec2_state"],
+                    ))
+            logger.info(
+                "Account %s region %s: %s unchanged, %s to probe",
+                account_id, region, len(instance_ids) - len(to_probe), len(to_probe),
+            )
+            instance_ids = to_probe
+            if not instance_ids:
+                return records
+
+        # EC2 metadata is only needed when the first result is parsed, so fetch it while SSM runs.
+        commands, failures = dispatch_ssm_commands(ssm, instance_ids, account_id)
+        for ir in failures:
+            records.extend(invocation_records(ir, account_id, region, details_future.result()))
+
+        # Parse each instance as it finishes instead of waiting for the slowest one in the region.
+        managed = set(instance_ids)
+        for ir in track_command_invocations(ssm, commands):
+            iid = ir["instance_id"]
+            if iid not in managed:
+                # Tag / resource-group targets can reach instances outside the online Linux list.
+                continue
+            details = details_future.result()
+            signature = probe_signature(ssm_info[iid], details.get(iid))
+            for row in invocation_records(ir, account_id, region, details):
+                row["probe_signature"] = signature
+                records.append(row)
+    return records
+
+
+def invocation_records(ir, account_id, region, instance_details):
+    """Inventory rows for one finished invocation: parsed DB rows, or a discovery_failed row."""
+    iid = ir["instance_id"]
+    status = ir["status"]
+    output = ir.get("output", "")
+    inst_info = instance_details.get(iid, {})
+    inst_type = inst_info.get("instance_type", "unknown")
+    tags = inst_info.get("tags", {})
+
+    if status == "Success":
+        parsed = parse_discovery_output(output, iid, account_id, region, instance_details)
+        if not parsed and (output or ir.get("error")):
+            logger.warning("Instance %s: Success but no records", iid)
+        return parsed
+    return [{
+        "account_id": account_id,
+        "instance_id": iid,
+        "db_id": "discovery_failed",
+        "engine": "n/a",
+        "version": "n/a",
+        "status": "failed",
+        "port": 0,
+        "data_size_mb": 0,
+        "system_memory_mb": 0,
+        "system_cpu_cores": 0,
+        "instance_type": inst_type,
+        "tags": tags,
+        "discovery_timestamp": datetime.utcnow().isoformat() + "Z",
+        "discovery_status": "failed",
+        "region": region,
+        "ec2_state": inst_info.get("ec2_state", "unknown"),
+        "error": ir.get("error", status),
+    }]
+
+
+def run_pairs(pairs, max_workers=None, previous=None, time_left=None, reserve=None):
+    """Run discover_account_region for (account_id, region) pairs on a bounded thread pool.
+
+    Returns {pair: records} for every pair that finished. ``time_left`` (seconds remaining, e.g. from
+    the Lambda context) is checked before each pair starts; once it drops below ``reserve`` (default
+    DISCOVERY_DEADLINE_RESERVE_SECONDS) no new pairs are started and the missing pairs are left for
+    the next invocation. The first pair always starts, so every invocation makes progress. A pair
+    that raises is logged and counts as done with no records.
+    """
+    reserve = DISCOVERY_DEADLINE_RESERVE_SECONDS if reserve is None else reserve
+    workers = max(1, min(max_workers or DISCOVERY_MAX_WORKERS, len(pairs) or 1))
+    queue = list(pairs)
+    done = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        while queue or in_flight:
+            while queue and len(in_flight) < workers:
+                started = len(pairs) - len(queue)
+                if started and time_left is not None and time_left() < reserve:
+                    logger.warning("Time budget low: deferring %s account/region pairs", len(queue))
+                    queue = []
+                    break
+                pair = queue.pop(0)
+                in_flight[pool.submit(discover_account_region, pair[0], pair[1], previous)] = pair
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                account_id, region = in_flight.pop(fut)
+                try:
+                    done[(account_id, region)] = fut.result()
+                except Exception as e:
+                    logger.error("Discovery failed for %s in %s: %s", account_id, region, e)
+                    done[(account_id, region)] = []
+    return done
+
+
+def discover_pairs(pairs, max_workers=None, previous=None):
+    """Run every pair and merge the records in input order so the snapshot is stable between runs."""
+    by_pair = run_pairs(pairs, max_workers=max_workers, previous=previous)
+    all_records = []
+    for pair in pairs:
+        all_records.extend(by_pair.get(pair, []))
+    return all_records
+
+
+def _pair_key(pair):
+    return f"{pair[0]}|{pair[1]}"
+
+
+def load_checkpoint(pairs):
+    """(started_at, {pair: records}) from an unexpired checkpoint, limited to pairs still in scope."""
+    if not RESULTS_S3_BUCKET or not CHECKPOINT_S3_KEY:
+        return None, {}
+    s3 = _s3_client()
+    try:
+        resp = s3.get_object(Bucket=RESULTS_S3_BUCKET, Key=CHECKPOINT_S3_KEY)
+        data = json.loads(resp["Body"].read().decode("utf-8"))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code", "") not in ("NoSuchKey", "404", "NotFound"):
+            logger.warning("Checkpoint read failed, starting a fresh run: %s", e)
+        return None, {}
+    except Exception as e:
+        logger.warning("Checkpoint unreadable, starting a fresh run: %s", e)
+        return None, {}
+    started = _parse_timestamp(data.get("started_at"))
+    if started is None or datetime.utcnow() - started > timedelta(hours=CHECKPOINT_MAX_AGE_HOURS):
+        logger.info("Ignoring checkpoint from %s (older than %sh)", data.get("started_at"), CHECKPOINT_MAX_AGE_HOURS)
+        return None, {}
+    saved = data.get("done") or {}
+    return data["started_at"], {pair: saved[_pair_key(pair)] for pair in pairs if isinstance(saved.get(_pair_key(pair)), list)}
+
+
+def save_checkpoint(done, started_at):
     payload = {
         "schema_version": 1,
+        "started_at": started_at,
         "updated_at": datetime.utcnow().isoformat() + "Z",
-        "record_count": len(records),
-        "records": records,
+        "done": {_pair_key(pair): records for pair, records in done.items()},
     }
-    body = json.dumps(payload, default=str)
-    s3 = boto3.client("s3", region_name=os.environ.get("AWS_REGION", "eu-west-1"))
+    s3 = _s3_client()
     s3.put_object(
         Bucket=RESULTS_S3_BUCKET,
-        Key=RESULTS_S3_KEY,
-        Body=body.encode("utf-8"),
+        Key=CHECKPOINT_S3_KEY,
+        Body=json.dumps(payload, default=str).encode("utf-8"),
         ContentType="application/json",
     )
-    logger.info("Wrote %s records to s3://%s/%s", len(records), RESULTS_S3_BUCKET, RESULTS_S3_KEY)
+    logger.info("Checkpoint: %s pairs saved to s3://%s/%s", len(done), RESULTS_S3_BUCKET, CHECKPOINT_S3_KEY)
+
+
+def clear_checkpoint():
+    if not RESULTS_S3_BUCKET or not CHECKPOINT_S3_KEY:
+        return
+    try:
+        s3 = _s3_client()
+        s3.delete_object(Bucket=RESULTS_S3_BUCKET, Key=CHECKPOINT_S3_KEY)
+    except Exception as e:
+        logger.warning("Could not delete checkpoint: %s", e)
+
+
+def _continue_async(context, run_id):
+    """Invoke this function again for the run that started at ``run_id`` (the checkpoint's started_at)."""
+    try:
+        _hub_client("lambda").invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=json.dumps({"resume_run": run_id}).encode("utf-8"),
+        )
+        logger.info("Re-invoked %s to resume from checkpoint", context.invoked_function_arn)
+    except Exception as e:
+        logger.warning("Self re-invoke failed; next scheduled run will resume: %s", e)
 
 
 def lambda_handler(event, context):
@@ -282,71 +1598,79 @@ def lambda_handler(event, context):
             "body": json.dumps({"discovered": 0, "accounts": [], "note": "no_accounts_configured"}),
         }
 
-    all_records = []
-
     regions = DISCOVERY_REGIONS or [os.environ.get("AWS_REGION", "eu-west-1")]
+    pairs = list(dict.fromkeys((a.strip(), r) for a in accounts_to_scan if a.strip() for r in regions))
+    logger.info("Scanning %s account/region pairs with %s workers", len(pairs), DISCOVERY_MAX_WORKERS)
+    previous = None
+    if DISCOVERY_INCREMENTAL:
+        previous = index_previous_records(load_previous_records(), load_probe_signatures())
 
-    for account_id in accounts_to_scan:
-        account_id = account_id.strip()
-        if not account_id:
-            continue
-
-        for region in regions:
-            try:
-                ssm = get_spoke_client(account_id, "ssm", region=region)
-                ec2 = get_spoke_client(account_id, "ec2", region=region)
-            except Exception as e:
-                logger.error(f"Assume role failed for {account_id} in {region}: {e}")
-                continue
-
-            instances = get_managed_instances(ssm)
-            if not instances:
-                logger.info(f"No managed instances in account {account_id} region {region}")
-                continue
+    started_at, done = load_checkpoint(pairs)
+    resume_run = event.get("resume_run") if isinstance(event, dict) else None
+    if resume_run and resume_run != started_at:
+        # Another invocation finished or replaced this run's checkpoint; starting over would repeat it.
+        logger.warning("Continuation of run %s found checkpoint of run %s; nothing to resume", resume_run, started_at)
+        return {"statusCode": 200, "body": json.dumps({"complete": False, "skipped": "checkpoint_replaced"})}
+    started_at = started_at or datetime.utcnow().isoformat() + "Z"
+    if done:
+        logger.info("Resuming run started %s: %s of %s pairs already done", started_at, len(done), len(pairs))
+    remaining = [p for p in pairs if p not in done]
+    time_left = None
+    reserve = DISCOVERY_DEADLINE_RESERVE_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        def time_left():
+            return context.get_remaining_time_in_millis() / 1000.0
 
-            instance_ids = [i[0] for i in instances]
-            instance_details = get_instance_details(ec2, instance_ids)
+        budget = time_left()
+        if reserve >= budget:
+            # A reserve at or above the function timeout would defer every pair on every invocation.
+            logger.error(
+                "DISCOVERY_DEADLINE_RESERVE_SECONDS (%s) is not below the %.0fs this invocation has; using %.0fs",
+                reserve, budget, budget / 2,
+            )
+            reserve = budget / 2
+    done_before = len(done)
+    done.update(run_pairs(remaining, previous=previous, time_left=time_left, reserve=reserve))
 
-            result = run_ssm_command(ssm, instance_ids, account_id)
-
-            for ir in result.get("instances", []):
-                iid = ir["instance_id"]
-                status = ir["status"]
-                output = ir.get("output", "")
-                inst_info = instance_details.get(iid, {})
-                inst_type = inst_info.get("instance_type", "unknown")
-                tags = inst_info.get("tags", {})
+    pending = [p for p in pairs if p not in done]
+    if pending and len(done) == done_before:
+        logger.error("No account/region pair finished in this invocation; not checkpointing or re-invoking")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": "No progress", "pairs_done": len(done), "pairs_total": len(pairs)}),
+        }
+    if pending:
+        try:
+            save_checkpoint(done, started_at)
+        except Exception as e:
+            logger.error(f"Checkpoint save failed: {e}")
+            return {"statusCode": 500, "body": json.dumps({"error": "Checkpoint failed", "detail": str(e)})}
+        if DISCOVERY_SELF_CONTINUE and context is not None:
+            _continue_async(context, started_at)
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "complete": False,
+                "pairs_done": len(done),
+                "pairs_total": len(pairs),
+                "accounts": accounts_to_scan,
+            }),
+        }
 
-                if status == "Success":
-                    records = parse_discovery_output(output, iid, account_id, region, instance_details)
-                    if not records and (output or ir.get("error")):
-                        logger.warning("Instance %s: Success but no records", iid)
-                    all_records.extend(records)
-                else:
-                    all_records.append({
-                        "account_id": account_id,
-                        "instance_id": iid,
-                        "db_id": "discovery_failed",
-                        "engine": "n/a",
-                        "version": "n/a",
-                        "status": "failed",
-                        "port": 0,
-                        "data_size_mb": 0,
-                        "system_memory_mb": 0,
-                        "system_cpu_cores": 0,
-                        "instance_type": inst_type,
-                        "tags": tags,
-                        "discovery_timestamp": datetime.utcnow().isoformat() + "Z",
-                        "discovery_status": "failed",
-                        "region": region,
-                        "ec2_state": inst_info.get("ec2_state", "unknown"),
-                        "error": ir.get("error", status),
-                    })
+    all_records = []
+    for pair in pairs:
+        all_records.extend(done.get(pair, []))
+    signatures = pop_probe_signatures(all_records)
 
     try:
         store_results_s3(all_records)
     except Exception as e:
         logger.error(f"Store results failed: {e}")
         return {"statusCode": 500, "body": json.dumps({"error": "Storage failed", "detail": str(e)})}
+    store_probe_signatures_s3(signatures)
+    clear_checkpoint()
 
-    return {"statusCode": 200, "body": json.dumps({"discovered": len(all_records), "accounts": accounts_to_scan})}
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"discovered": len(all_records), "accounts": accounts_to_scan, "complete": True}),
+    }
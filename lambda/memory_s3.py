@@ -0,0 +1,51 @@
+"""In-memory S3 for the tests: the object calls both handlers make, kept in a dict."""
+import io
+import zlib
+
+from botocore.exceptions import ClientError
+
+
+class MemoryS3:
+    """``list_denied`` answers a missing key like S3 does for a role without s3:ListBucket (403)."""
+
+    def __init__(self, list_denied=False):
+        self.objects = {}
+        self.gets = []
+        self.list_denied = list_denied
+
+    def _etag(self, body):
+        return '"%08x-%d"' % (zlib.crc32(body), len(body))
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.gets.append(Key)
+        if Key not in self.objects and self.list_denied:
+            raise ClientError(
+                {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}, "ResponseMetadata": {"HTTPStatusCode": 403}},
+                "GetObject",
+            )
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": self._etag(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        return {"ETag": self._etag(self.objects[Key])}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+
+    def get_paginator(self, name):
+        objects = self.objects
+
+        class _Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {"Contents": [{"Key": k} for k in sorted(objects) if k.startswith(Prefix)]}
+
+        return _Paginator()
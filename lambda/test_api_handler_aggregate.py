@@ -0,0 +1,100 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+def _event(query=None):
+    return {"httpMethod": "GET", "path": "/prod/aggregate", "pathParameters": {}, "queryStringParameters": query or {}}
+
+
+RECORDS = [
+    {"account_id": "111111111111", "region": "eu-west-1", "instance_id": "i-1", "db_id": "mysql-1",
+     "engine": "mysql", "version": "5.7", "status": "running", "data_size_mb": 100, "system_memory_mb": 4096},
+    {"account_id": "111111111111", "region": "eu-west-1", "instance_id": "i-1", "db_id": "mysql-2",
+     "engine": "mysql", "version": "5.7", "status": "running", "data_size_mb": "50.5", "system_memory_mb": 4096},
+    {"account_id": "222222222222", "region": "eu-west-1", "instance_id": "i-2", "db_id": "pg-1",
+     "engine": "postgres", "version": "15", "status": "stopped", "data_size_mb": 300},
+    {"account_id": "222222222222", "region": "ap-south-1", "instance_id": "i-3", "db_id": "pg-2",
+     "engine": "postgresql", "version": "15", "status": "running", "data_size_mb": None},
+    {"account_id": "222222222222", "region": "ap-south-1", "instance_id": "i-4", "db_id": "",
+     "discovery_status": "failed"},
+]
+
+
+class AggregateTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._AGGREGATES.clear()
+        self.addCleanup(api_handler._AGGREGATES.clear)
+        for target, value in (("load_all_records", RECORDS), ("snapshot_version", '"v1"')):
+            patcher = patch(f"api_handler.{target}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _call(self, query=None):
+        resp = api_handler.lambda_handler(_event(query), None)
+        return resp["statusCode"], json.loads(resp["body"])
+
+    def test_group_by_engine_version_with_metrics(self):
+        status, body = self._call({
+            "group_by": "engine,version",
+            "metrics": "count,sum:data_size_mb,avg:data_size_mb,max:system_memory_mb",
+        })
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body["total_records"], 5)
+        self.assertEqual(body["groups"], [
+            {"engine": "mysql", "version": "5.7", "count": 2, "sum_data_size_mb": 150.5,
+             "avg_data_size_mb": 75.25, "max_system_memory_mb": 4096},
+            {"engine": "postgresql", "version": "15", "count": 2, "sum_data_size_mb": 300,
+             "avg_data_size_mb": 300, "max_system_memory_mb": None},
+            {"engine": None, "version": None, "count": 1, "sum_data_size_mb": 0,
+             "avg_data_size_mb": None, "max_system_memory_mb": None},
+        ])
+
+    def test_filters_and_default_count(self):
+        status, body = self._call({"group_by": "account_id", "engine": "postgres"})
+        self.assertEqual(body["metrics"], ["count"])
+        self.assertEqual(body["groups"], [{"account_id": "222222222222", "count": 2}])
+
+    def test_no_group_by_is_one_total(self):
+        status, body = self._call({"metrics": "count,sum:data_size_mb"})
+        self.assertEqual(body["groups"], [{"count": 5, "sum_data_size_mb": 450.5}])
+
+    def test_columnar_matches_list(self):
+        store = api_handler.RecordStore(RECORDS)
+        for group_by in ([], ["region"], ["engine", "version"], ["region", "account_id", "ec2_state"]):
+            metrics = ["count", "sum:data_size_mb", "avg:system_memory_mb", "max:system_cpu_cores"]
+            with self.subTest(group_by=group_by):
+                self.assertEqual(
+                    api_handler.aggregate_records(store, group_by, metrics),
+                    api_handler.aggregate_records(RECORDS, group_by, metrics),
+                )
+        view = store.view([0, 2, 4])
+        self.assertEqual(
+            api_handler.aggregate_records(view, ["region"], ["count"]),
+            api_handler.aggregate_records([RECORDS[0], RECORDS[2], RECORDS[4]], ["region"], ["count"]),
+        )
+
+    def test_memoized_per_snapshot_version(self):
+        query = {"group_by": "region", "metrics": "count"}
+        first = self._call(query)[1]
+        with patch("api_handler.aggregate_records") as aggregate:
+            self.assertEqual(self._call(dict(query, next_token="ignored"))[1], first)
+            aggregate.assert_not_called()
+            with patch("api_handler.snapshot_version", return_value='"v2"'):
+                aggregate.return_value = []
+                self.assertEqual(self._call(query)[1]["groups"], [])
+            aggregate.assert_called_once()
+
+    def test_invalid_parameters(self):
+        for query in ({"group_by": "tags"}, {"metrics": "median:data_size_mb"}, {"metrics": "sum:port"}):
+            with self.subTest(query=query):
+                self.assertEqual(self._call(query)[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import io
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+import discovery_handler
+from memory_s3 import MemoryS3
+
+
+def _record(iid, db_id="mysql-3306", version="5.7", **extra):
+    record = {
+        "account_id": "111111111111", "region": "eu-west-1", "instance_id": iid, "db_id": db_id,
+        "engine": db_id.split("-")[0], "version": version, "status": "running",
+        "discovery_timestamp": "2025-01-01T00:00:00Z", "tags": {"Name": iid},
+    }
+    record.update(extra)
+    return record
+
+
+RUN_1 = [_record("i-a"), _record("i-b"), _record("i-c", "postgres-5432", "15")]
+RUN_2 = [
+    _record("i-a", discovery_timestamp="2025-01-02T00:00:00Z"),  # only the probe time changed
+    _record("i-b", version="8.0"),  # upgraded
+    _record("i-d"),  # new
+]
+
+
+class ChangesTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._OBJECT_CACHE.clear()
+        api_handler._FINGERPRINTS.clear()
+        api_handler._CHANGES.clear()
+        for module in (discovery_handler, api_handler):
+            for name, value in (("RESULTS_S3_BUCKET", "bucket"), ("RESULTS_LAYOUT", "single")):
+                patcher = patch.object(module, name, value)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        self.s3 = MemoryS3()
+
+    def _store(self, *runs):
+        with patch("discovery_handler._s3_client", return_value=self.s3):
+            for records in runs:
+                discovery_handler.store_results_s3(records)
+        api_handler._OBJECT_CACHE.clear()
+
+    def _call(self, path, query=None):
+        event = {"httpMethod": "GET", "path": path, "pathParameters": {}, "queryStringParameters": query or {}}
+        with patch("api_handler._s3_client", return_value=self.s3):
+            resp = api_handler.lambda_handler(event, None)
+        return resp["statusCode"], json.loads(resp["body"])
+
+    def test_each_run_is_kept_with_fingerprints(self):
+        self._store(RUN_1, RUN_2)
+        index = json.loads(self.s3.objects[f"{discovery_handler.HISTORY_S3_PREFIX}/index.json"])
+        self.assertEqual(len(index["runs"]), 2)
+        first = index["runs"][0]
+        self.assertIn(first["run_id"], first["snapshot_key"])
+        self.assertEqual(first["record_count"], 3)
+        old = self.s3.objects[first["snapshot_key"]]
+        self.assertEqual(list(api_handler.iter_snapshot_records(io.BytesIO(old))), RUN_1)
+
+    def test_changes_since_previous_run(self):
+        self._store(RUN_1, RUN_2)
+        status, body = self._call("/prod/changes")
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body["counts"], {"added": 1, "removed": 1, "modified": 1})
+        self.assertEqual(body["added"], [RUN_2[2]])
+        self.assertEqual(body["removed"], [{
+            "account_id": "111111111111", "instance_id": "i-c", "db_id": "postgres-5432", "region": "eu-west-1",
+            "engine": "postgres", "version": "15", "status": "running", "instance_type": None, "ec2_state": None,
+        }])
+        (modified,) = body["modified"]
+        self.assertEqual((modified["instance_id"], modified["before"]["version"]), ("i-b", "5.7"))
+        self.assertEqual(modified["after"], RUN_2[1])
+
+    def test_since_older_run_and_unknown_run(self):
+        self._store(RUN_1, RUN_2, RUN_2)
+        status, history = self._call("/prod/history")
+        self.assertEqual(history["count"], 3)
+        oldest = history["runs"][-1]["run_id"]
+        status, body = self._call("/prod/changes", {"since": oldest})
+        self.assertEqual(body["since"], oldest)
+        self.assertEqual(body["counts"], {"added": 1, "removed": 1, "modified": 1})
+        status, body = self._call("/prod/changes")
+        self.assertEqual(body["counts"], {"added": 0, "removed": 0, "modified": 0})
+        status, body = self._call("/prod/changes", {"since": "19990101T000000000000Z"})
+        self.assertEqual(status, 400)
+
+    def test_history_response_follows_history_index(self):
+        self._store(RUN_1)
+        event = {"httpMethod": "GET", "path": "/prod/history", "pathParameters": {}, "queryStringParameters": {}}
+        with patch("api_handler._s3_client", return_value=self.s3), \
+                patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", 0):
+            api_handler.lambda_handler(dict(event, path="/prod/summary"), None)  # summary now in the object cache
+            first = api_handler.lambda_handler(event, None)
+            # The index gains a run while snapshot and summary stay the same (history publishes last).
+            key = f"{discovery_handler.HISTORY_S3_PREFIX}/index.json"
+            index = json.loads(self.s3.objects[key])
+            index["runs"].append(dict(index["runs"][0], run_id="20990101T000000000000Z"))
+            self.s3.objects[key] = json.dumps(index).encode("utf-8")
+            second = api_handler.lambda_handler(dict(event, headers={"If-None-Match": first["headers"]["ETag"]}), None)
+        self.assertEqual(json.loads(first["body"])["count"], 1)
+        self.assertEqual(second["statusCode"], 200)
+        self.assertNotEqual(second["headers"]["ETag"], first["headers"]["ETag"])
+        self.assertEqual(json.loads(second["body"])["count"], 2)
+
+    def test_changes_read_rows_of_latest_history_run(self):
+        self._store(RUN_1, RUN_2)
+        with patch("discovery_handler.publish_history", side_effect=RuntimeError("copy failed")):
+            self._store([_record("i-z")])  # live snapshot moves on, history still ends at RUN_2
+        status, body = self._call("/prod/changes")
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body["added"], [RUN_2[2]])
+        self.assertEqual(body["modified"][0]["after"], RUN_2[1])
+
+    def test_diff_is_memoized_per_run_pair(self):
+        self._store(RUN_1, RUN_2)
+        first = self._call("/prod/changes")[1]
+        with patch("api_handler.diff_fingerprints", side_effect=AssertionError("recomputed")):
+            self.assertEqual(self._call("/prod/changes")[1], first)
+
+    def test_old_runs_are_pruned(self):
+        with patch.object(discovery_handler, "HISTORY_KEEP_RUNS", 2):
+            self._store(RUN_1, RUN_2, RUN_1)
+        index = json.loads(self.s3.objects[f"{discovery_handler.HISTORY_S3_PREFIX}/index.json"])
+        kept = [r["run_id"] for r in index["runs"]]
+        runs = {k.split("/")[2] for k in self.s3.objects if k.startswith(discovery_handler.HISTORY_S3_PREFIX + "/")}
+        self.assertEqual(runs - {"index.json"}, set(kept))
+
+    def test_partitioned_runs_copy_partitions(self):
+        with patch.object(discovery_handler, "RESULTS_LAYOUT", "partitioned"), \
+                patch.object(api_handler, "RESULTS_LAYOUT", "partitioned"):
+            self._store(RUN_1, RUN_2)
+            index = json.loads(self.s3.objects[f"{discovery_handler.HISTORY_S3_PREFIX}/index.json"])
+            manifest = json.loads(self.s3.objects[index["runs"][0]["manifest_key"]])
+            for part in manifest["partitions"]:
+                self.assertTrue(part["key"].startswith(discovery_handler.HISTORY_S3_PREFIX))
+                self.assertIn(part["key"], self.s3.objects)
+            status, body = self._call("/prod/changes")
+        self.assertEqual(body["counts"], {"added": 1, "removed": 1, "modified": 1})
+
+    def test_no_history(self):
+        with patch.object(discovery_handler, "HISTORY_KEEP_RUNS", 0):
+            self._store(RUN_1)
+        self.assertFalse(any(k.startswith(discovery_handler.HISTORY_S3_PREFIX) for k in self.s3.objects))
+        status, body = self._call("/prod/changes")
+        self.assertEqual(status, 404)
+
+    def test_no_history_without_list_bucket_is_404(self):
+        with patch.object(discovery_handler, "HISTORY_KEEP_RUNS", 0):
+            self._store(RUN_1)
+        self.s3.list_denied = True  # API role has s3:GetObject only: a missing key is a 403
+        self.assertEqual(self._call("/prod/history"), (200, {"count": 0, "runs": []}))
+        status, body = self._call("/prod/changes")
+        self.assertEqual(status, 404, body)
+
+
+class FingerprintTests(unittest.TestCase):
+    def test_probe_timestamp_does_not_change_fingerprint(self):
+        a = _record("i-a")
+        self.assertEqual(discovery_handler.record_fingerprint(a),
+                         discovery_handler.record_fingerprint(dict(a, discovery_timestamp="later")))
+        self.assertNotEqual(discovery_handler.record_fingerprint(a),
+                            discovery_handler.record_fingerprint(dict(a, tags={"Name": "x"})))
+
+    def test_key_hash_matches_api(self):
+        a = _record("i-a")
+        self.assertEqual(int(discovery_handler.record_key_hash(a), 16),
+                         api_handler._key_hash(a["account_id"], a["instance_id"], a["db_id"]))
+
+    def test_columnar_and_list_lookup_agree(self):
+        records = RUN_1 + RUN_2
+        wanted = {api_handler._key_hash(r["account_id"], r["instance_id"], r["db_id"]) for r in RUN_2}
+        self.assertEqual(api_handler._records_by_key_hash(api_handler.RecordStore(records), wanted),
+                         api_handler._records_by_key_hash(records, wanted))
+
+
+if __name__ == "__main__":
+    unittest.main()
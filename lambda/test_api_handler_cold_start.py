@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+import discovery_handler
+
+HERE = Path(__file__).resolve().parent
+
+
+class ColdStartTests(unittest.TestCase):
+    def test_boto3_not_imported_until_first_client(self):
+        for module in ("api_handler", "discovery_handler"):
+            with self.subTest(module=module):
+                code = f"import sys; import {module}; print('boto3' in sys.modules)"
+                out = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True)
+                self.assertEqual(out.stdout.strip(), "False")
+
+    def test_prewarm_creates_only_what_is_asked(self):
+        with patch("api_handler._s3_client") as s3, patch("api_handler.load_summary") as summary, \
+                patch("api_handler.load_all_records") as records, \
+                patch.object(api_handler, "RESULTS_S3_BUCKET", "bucket"):
+            api_handler.prewarm({"s3"})
+            self.assertEqual((s3.call_count, summary.call_count, records.call_count), (1, 0, 0))
+            api_handler.prewarm({"summary"})
+            self.assertEqual((s3.call_count, summary.call_count, records.call_count), (2, 1, 0))
+            records.side_effect = RuntimeError("no bucket access")
+            api_handler.prewarm({"records"})  # logged, not raised
+
+    def test_hub_clients_created_once_from_one_session(self):
+        with patch.object(discovery_handler, "_SESSION", None), patch.object(discovery_handler, "_HUB_CLIENTS", {}), \
+                patch("discovery_handler.boto3.session.Session") as session_cls:
+            session_cls.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+            s3 = discovery_handler._s3_client()
+            self.assertIs(discovery_handler._s3_client(), s3)
+            self.assertIsNot(discovery_handler._sts_client(), s3)
+        self.assertEqual(session_cls.call_count, 1)
+        self.assertEqual(session_cls.return_value.client.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
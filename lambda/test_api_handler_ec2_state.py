@@ -0,0 +1,105 @@
+import sys
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+class _FakeEC2:
+    def __init__(self, region, states, delay=0.0):
+        self.region = region
+        self.states = states
+        self.delay = delay
+        self.calls = []
+
+    def get_paginator(self, name):
+        assert name == "describe_instances"
+        return self
+
+    def paginate(self, Filters):
+        ids = Filters[0]["Values"]
+        self.calls.append(list(ids))
+        time.sleep(self.delay)
+        yield {"Reservations": [{"Instances": [
+            {"InstanceId": iid, "State": {"Name": self.states[iid]}} for iid in ids if iid in self.states
+        ]}]}
+
+
+def _rows(*ids, state="snapshot"):
+    return [{"instance_id": iid, "ec2_state": state} for iid in ids]
+
+
+class Ec2StateEnrichTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._EC2_STATE_CACHE.clear()
+        self.clients = {}
+        patcher = patch("api_handler._get_spoke_ec2_client", side_effect=lambda acct, region: self.clients[region])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_requests_hit_the_cache(self):
+        self.clients["eu-west-1"] = ec2 = _FakeEC2("eu-west-1", {"i-a": "running", "i-b": "stopped"})
+        for _ in range(3):
+            rows = _rows("i-a", "i-b", "i-gone")
+            api_handler.enrich_instances_ec2_state(rows, "111111111111", "eu-west-1")
+        self.assertEqual([r["ec2_state"] for r in rows], ["running", "stopped", "snapshot"])
+        # i-gone is unknown to EC2 and asked for again; i-a / i-b come from the cache.
+        self.assertEqual(ec2.calls, [["i-a", "i-b", "i-gone"], ["i-gone"], ["i-gone"]])
+
+    def test_cache_expires_after_ttl(self):
+        self.clients["eu-west-1"] = ec2 = _FakeEC2("eu-west-1", {"i-a": "running"})
+        with patch.object(api_handler, "EC2_STATE_CACHE_TTL_SECONDS", 0):
+            api_handler.enrich_instances_ec2_state(_rows("i-a"), "111111111111", "eu-west-1")
+            api_handler.enrich_instances_ec2_state(_rows("i-a"), "111111111111", "eu-west-1")
+        self.assertEqual(len(ec2.calls), 2)
+
+    def test_without_region_uses_snapshot_regions_in_parallel(self):
+        self.clients["eu-west-1"] = _FakeEC2("eu-west-1", {"i-a": "running"}, delay=0.2)
+        self.clients["ap-south-1"] = _FakeEC2("ap-south-1", {"i-b": "stopped"}, delay=0.2)
+        rows = _rows("i-a", "i-b")
+        t0 = time.monotonic()
+        api_handler.enrich_instances_ec2_state(rows, "111111111111", "", {"i-a": "eu-west-1", "i-b": "ap-south-1"})
+        self.assertLess(time.monotonic() - t0, 0.38)
+        self.assertEqual([r["ec2_state"] for r in rows], ["running", "stopped"])
+
+    def test_chunks_run_concurrently(self):
+        ids = [f"i-{n:04d}" for n in range(250)]
+        self.clients["eu-west-1"] = ec2 = _FakeEC2("eu-west-1", {iid: "running" for iid in ids}, delay=0.2)
+        t0 = time.monotonic()
+        rows = _rows(*ids)
+        api_handler.enrich_instances_ec2_state(rows, "111111111111", "eu-west-1")
+        self.assertLess(time.monotonic() - t0, 0.38)
+        self.assertEqual(sorted(len(c) for c in ec2.calls), [50, 100, 100])
+        self.assertTrue(all(r["ec2_state"] == "running" for r in rows))
+
+    def test_budget_falls_back_to_snapshot_state(self):
+        self.clients["eu-west-1"] = _FakeEC2("eu-west-1", {"i-a": "running"})
+        self.clients["us-east-1"] = slow = _FakeEC2("us-east-1", {"i-b": "stopped"}, delay=0.5)
+        rows = _rows("i-a", "i-b")
+        with patch.object(api_handler, "EC2_STATE_BUDGET_SECONDS", 0.1):
+            t0 = time.monotonic()
+            api_handler.enrich_instances_ec2_state(rows, "111111111111", "", {"i-a": "eu-west-1", "i-b": "us-east-1"})
+            self.assertLess(time.monotonic() - t0, 0.4)
+        self.assertEqual([r["ec2_state"] for r in rows], ["running", "snapshot"])
+        # The late answer still lands in the cache for the next refresh.
+        deadline = time.monotonic() + 2
+        while ("111111111111", "us-east-1", "i-b") not in api_handler._EC2_STATE_CACHE and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(api_handler._EC2_STATE_CACHE[("111111111111", "us-east-1", "i-b")][0], "stopped")
+
+    def test_errors_keep_snapshot_state(self):
+        class Broken:
+            def get_paginator(self, name):
+                raise RuntimeError("no credentials")
+
+        self.clients["eu-west-1"] = Broken()
+        rows = _rows("i-a")
+        api_handler.enrich_instances_ec2_state(rows, "111111111111", "eu-west-1")
+        self.assertEqual(rows[0]["ec2_state"], "snapshot")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+def _event(path, query=None):
+    return {"httpMethod": "GET", "path": path, "pathParameters": {}, "queryStringParameters": query or {}}
+
+
+RECORDS = [
+    {"account_id": acct, "region": "eu-west-1", "instance_id": f"i-{n}", "db_id": f"{engine}-{n}",
+     "engine": engine, "port": 3306, "tags": {"Name": f"host,{n}"}, "status": "running"}
+    for n, (acct, engine) in enumerate([
+        ("222222222222", "mysql"),
+        ("111111111111", "postgres"),
+        ("111111111111", "mysql"),
+    ])
+]
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        chunks = []
+        while True:
+            chunk = fileobj.read(1000)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.objects[(bucket, key)] = (b"".join(chunks), ExtraArgs)
+
+    def generate_presigned_url(self, op, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.example/{Params['Key']}?expires={ExpiresIn}"
+
+
+class _DiscardingS3:
+    """Reads uploads in 1 MB pieces and keeps only the byte count."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        while True:
+            chunk = fileobj.read(1 << 20)
+            if not chunk:
+                break
+            self.bytes += len(chunk)
+
+    def generate_presigned_url(self, op, Params, ExpiresIn):
+        return "https://example/export"
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        for target, kwargs in (
+            ("load_all_records", {"return_value": RECORDS}),
+            ("snapshot_version", {"return_value": '"v1"'}),
+            ("_s3_client", {"return_value": self.s3}),
+            ("EXPORT_S3_BUCKET", {"new": "exports-bucket"}),
+        ):
+            patcher = patch(f"api_handler.{target}", **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _call(self, query=None):
+        return api_handler.lambda_handler(_event("/prod/export", query), None)
+
+    def test_csv_inline_with_chosen_columns(self):
+        resp = self._call({"format": "csv", "columns": "instance_id,engine,tags"})
+        self.assertEqual(resp["statusCode"], 200)
+        self.assertTrue(resp["headers"]["Content-Type"].startswith("text/csv"))
+        self.assertIn("inventory.csv", resp["headers"]["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(resp["body"])))
+        self.assertEqual(rows[0], ["instance_id", "engine", "tags"])
+        self.assertEqual([r[0] for r in rows[1:]], ["i-0", "i-1", "i-2"])
+        self.assertEqual(json.loads(rows[2][2]), {"Name": "host,1"})
+
+    def test_ndjson_applies_record_filters(self):
+        resp = self._call({"format": "ndjson", "engine": "mysql", "columns": "instance_id,port,missing"})
+        self.assertEqual(resp["headers"]["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in resp["body"].splitlines()]
+        self.assertEqual(lines, [{"instance_id": "i-0", "port": 3306}, {"instance_id": "i-2", "port": 3306}])
+        self.assertEqual(resp["headers"]["X-Record-Count"], "2")
+
+    def test_default_columns(self):
+        resp = self._call()
+        header = resp["body"].splitlines()[0].split(",")
+        self.assertEqual(header, list(api_handler._EXPORT_DEFAULT_COLUMNS))
+
+    def test_large_export_goes_to_s3(self):
+        with patch("api_handler.EXPORT_INLINE_MAX_BYTES", 50):
+            resp = self._call({"format": "ndjson"})
+        body = json.loads(resp["body"])
+        self.assertEqual(body["delivery"], "s3")
+        self.assertEqual(body["count"], 3)
+        (bucket, key), (data, extra) = next(iter(self.s3.objects.items()))
+        self.assertEqual(bucket, "exports-bucket")
+        self.assertEqual(key, body["key"])
+        self.assertTrue(key.startswith("exports/") and key.endswith(".ndjson"))
+        self.assertEqual(extra["ContentType"], "application/x-ndjson")
+        self.assertEqual(len(data), body["bytes"])
+        self.assertEqual(len(data.splitlines()), 3)
+        self.assertIn(key, body["url"])
+        self.assertNotIn("ETag", resp["headers"])
+
+    def test_inline_delivery_refuses_large_export(self):
+        with patch("api_handler.EXPORT_INLINE_MAX_BYTES", 50):
+            resp = self._call({"delivery": "inline"})
+        self.assertEqual(resp["statusCode"], 400)
+        self.assertEqual(self.s3.objects, {})
+
+    def test_invalid_format(self):
+        resp = self._call({"format": "xml"})
+        self.assertEqual(resp["statusCode"], 400)
+
+    def test_s3_export_memory_is_flat(self):
+        store = api_handler.RecordStore(
+            {"account_id": f"{n % 50:012d}", "region": "eu-west-1", "instance_id": f"i-{n:08d}",
+             "db_id": f"mysql-{n}", "engine": "mysql", "tags": {"Name": f"host-{n % 100}"}}
+            for n in range(40000)
+        )
+        sink = _DiscardingS3()
+        with patch("api_handler._s3_client", return_value=sink):
+            tracemalloc.start()
+            try:
+                resp = api_handler.export_records(store, {"format": "csv", "delivery": "s3"})
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.assertEqual(resp.body["count"], 40000)
+        self.assertGreater(sink.bytes, 2_000_000)
+        # About one upload piece and one chunk; sorting or materializing the rows first costs ~10 MB here.
+        self.assertLess(peak, 3_000_000)
+
+    def test_iter_export_chunks_large_output(self):
+        records = [{"instance_id": f"i-{n:06d}", "engine": "mysql"} for n in range(5000)]
+        chunks = list(api_handler.iter_export(records, "csv", ["instance_id", "engine"]))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(c) < 2 * api_handler._EXPORT_CHUNK_CHARS for c in chunks))
+        self.assertEqual(len("".join(chunks).splitlines()), 5001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import base64
+import gzip
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+RECORDS = [
+    {"account_id": "111111111111", "region": "eu-west-1", "instance_id": f"i-{n}", "db_id": f"mysql-{n}",
+     "engine": "mysql", "status": "running", "tags": {"Name": f"host-{n}"}}
+    for n in range(40)
+]
+
+
+def _event(path, query=None, headers=None, account_id=None):
+    return {
+        "httpMethod": "GET",
+        "path": path,
+        "pathParameters": {"accountId": account_id} if account_id else {},
+        "queryStringParameters": query or {},
+        "headers": headers or {},
+    }
+
+
+def _decoded(resp):
+    body = resp["body"]
+    if resp.get("isBase64Encoded"):
+        raw = base64.b64decode(body)
+        if resp["headers"].get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        body = raw.decode("utf-8")
+    return json.loads(body)
+
+
+class HttpCachingTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._OBJECT_CACHE.clear()
+        api_handler._RESPONSE_CACHE.clear()
+        # The inventory object as the cache would hold it after a load from S3.
+        api_handler._OBJECT_CACHE[api_handler.RESULTS_S3_KEY] = {"etag": '"snap-1"', "value": RECORDS, "checked_at": 0}
+        self.addCleanup(api_handler._OBJECT_CACHE.clear)
+        for patcher in (patch("api_handler.load_all_records", return_value=RECORDS),
+                        patch.object(api_handler, "API_COMPRESSION", True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_gzip_when_accepted(self):
+        resp = api_handler.lambda_handler(_event("/prod/databases", headers={"Accept-Encoding": "gzip, deflate"}), None)
+        self.assertTrue(resp["isBase64Encoded"])
+        self.assertEqual(resp["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(resp["headers"]["Vary"], "Accept-Encoding")
+        self.assertEqual(_decoded(resp)["count"], 40)
+
+    def test_identity_without_accept_encoding_or_for_small_bodies(self):
+        resp = api_handler.lambda_handler(_event("/prod/databases"), None)
+        self.assertNotIn("isBase64Encoded", resp)
+        self.assertEqual(json.loads(resp["body"])["count"], 40)
+        resp = api_handler.lambda_handler(_event("/prod/regions", headers={"accept-encoding": "gzip"}), None)
+        self.assertNotIn("Content-Encoding", resp["headers"])
+
+    def test_compression_is_opt_in(self):
+        with patch.object(api_handler, "API_COMPRESSION", False):
+            resp = api_handler.lambda_handler(_event("/prod/databases", headers={"Accept-Encoding": "gzip"}), None)
+        self.assertNotIn("isBase64Encoded", resp)
+        self.assertNotIn("Vary", resp["headers"])
+        self.assertEqual(json.loads(resp["body"])["count"], 40)
+
+    def test_choose_encoding(self):
+        self.assertIsNone(api_handler._choose_encoding("gzip;q=0, identity"))
+        self.assertEqual(api_handler._choose_encoding("deflate, gzip;q=0.5"), "gzip")
+        with patch.object(api_handler, "brotli", object()):
+            self.assertEqual(api_handler._choose_encoding("gzip, br"), "br")
+        with patch.object(api_handler, "API_COMPRESSION", False):
+            self.assertIsNone(api_handler._choose_encoding("gzip"))
+
+    def test_if_none_match_gets_304(self):
+        first = api_handler.lambda_handler(_event("/prod/databases", {"engine": "mysql"}), None)
+        etag = first["headers"]["ETag"]
+        second = api_handler.lambda_handler(
+            _event("/prod/databases", {"engine": " mysql"}, headers={"If-None-Match": f'W/{etag}'}), None
+        )
+        self.assertEqual((second["statusCode"], second["body"]), (304, ""))
+        self.assertEqual(second["headers"]["ETag"], etag)
+
+    def test_304_skips_routing(self):
+        etag = api_handler.lambda_handler(_event("/prod/databases", {"engine": "mysql"}), None)["headers"]["ETag"]
+        with patch("api_handler._route", side_effect=AssertionError("routed")):
+            resp = api_handler.lambda_handler(
+                _event("/prod/databases", {"engine": "mysql"}, headers={"If-None-Match": etag}), None
+            )
+        self.assertEqual((resp["statusCode"], resp["headers"]["ETag"]), (304, etag))
+
+    def test_etag_follows_query_and_snapshot(self):
+        etag = api_handler.lambda_handler(_event("/prod/databases"), None)["headers"]["ETag"]
+        other = api_handler.lambda_handler(_event("/prod/databases", {"engine": "postgres"}), None)["headers"]["ETag"]
+        self.assertNotEqual(etag, other)
+        api_handler._OBJECT_CACHE[api_handler.RESULTS_S3_KEY]["etag"] = '"snap-2"'
+        resp = api_handler.lambda_handler(_event("/prod/databases", headers={"If-None-Match": etag}), None)
+        self.assertEqual(resp["statusCode"], 200)
+        self.assertNotEqual(resp["headers"]["ETag"], etag)
+
+    def test_repeat_requests_reuse_encoded_body(self):
+        event = _event("/prod/databases", headers={"Accept-Encoding": "gzip"})
+        with patch("api_handler._encode_body", wraps=api_handler._encode_body) as encode:
+            first = api_handler.lambda_handler(event, None)
+            second = api_handler.lambda_handler(event, None)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(first["body"], second["body"])
+
+    def test_live_instances_and_errors_have_no_etag(self):
+        with patch("api_handler.enrich_instances_ec2_state"):
+            resp = api_handler.lambda_handler(
+                _event("/prod/accounts/111111111111/instances", account_id="111111111111"), None
+            )
+        self.assertEqual(resp["statusCode"], 200)
+        self.assertNotIn("ETag", resp["headers"])
+        resp = api_handler.lambda_handler(_event("/prod/databases", {"limit": "x"}), None)
+        self.assertEqual(resp["statusCode"], 400)
+        self.assertNotIn("ETag", resp["headers"])
+
+    def test_body_hash_etag_without_snapshot_version(self):
+        api_handler._OBJECT_CACHE.clear()
+        first = api_handler.lambda_handler(_event("/prod/databases"), None)
+        again = api_handler.lambda_handler(_event("/prod/databases", headers={"If-None-Match": first["headers"]["ETag"]}), None)
+        self.assertEqual(again["statusCode"], 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+class _VersionedS3:
+    """GetObject honouring IfNoneMatch against a single mutable object."""
+
+    def __init__(self, records):
+        self.version = 1
+        self.records = records
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        with self._lock:
+            self.calls.append(IfNoneMatch)
+        time.sleep(0.02)
+        etag = f'"v{self.version}"'
+        if IfNoneMatch == etag:
+            raise ClientError(
+                {"Error": {"Code": "304", "Message": "Not Modified"}, "ResponseMetadata": {"HTTPStatusCode": 304}},
+                "GetObject",
+            )
+        body = json.dumps({"schema_version": 1, "records": self.records}).encode()
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+
+RECORDS = [{"account_id": "111111111111", "instance_id": "i-a", "region": "eu-west-1"}]
+
+
+@patch.object(api_handler, "RESULTS_S3_BUCKET", "bucket")
+@patch.object(api_handler, "RESULTS_LAYOUT", "single")
+class InventoryCacheTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._OBJECT_CACHE.clear()
+        self.s3 = _VersionedS3(RECORDS)
+        patcher = patch("api_handler._s3_client", return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_within_ttl_no_s3_call(self):
+        with patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", 60):
+            first = api_handler.load_all_records()
+            second = api_handler.load_all_records()
+        self.assertIs(first, second)
+        self.assertEqual(self.s3.calls, [None])
+
+    def test_after_ttl_conditional_get_reuses_parsed_records(self):
+        with patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", 0):
+            first = api_handler.load_all_records()
+            second = api_handler.load_all_records()
+        self.assertIs(first, second)
+        self.assertEqual(self.s3.calls, [None, '"v1"'])
+
+    def test_changed_object_is_reloaded(self):
+        with patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", 0):
+            api_handler.load_all_records()
+            self.s3.version = 2
+            self.s3.records = RECORDS * 2
+            reloaded = api_handler.load_all_records()
+        self.assertEqual(len(reloaded), 2)
+
+    def test_concurrent_callers_share_one_refresh(self):
+        results = []
+        with patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", 60):
+            threads = [threading.Thread(target=lambda: results.append(api_handler.load_all_records())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(self.s3.calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
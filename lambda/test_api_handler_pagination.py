@@ -0,0 +1,103 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+def _event(path, query=None, account_id=None):
+    return {
+        "httpMethod": "GET",
+        "path": path,
+        "pathParameters": {"accountId": account_id} if account_id else {},
+        "queryStringParameters": query or {},
+    }
+
+
+RECORDS = [
+    {"account_id": acct, "region": region, "instance_id": f"i-{n}", "db_id": f"mysql-{n}", "engine": engine,
+     "tags": {"Name": f"host-{n}"}, "status": "running"}
+    for n, (acct, region, engine) in enumerate([
+        ("222222222222", "eu-west-1", "mysql"),
+        ("111111111111", "eu-west-1", "postgres"),
+        ("111111111111", "ap-south-1", "mysql"),
+        ("222222222222", "ap-south-1", "mysql"),
+        ("111111111111", "eu-west-1", "mysql"),
+    ])
+]
+
+
+class PaginationTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._PAGE_ORDERS.clear()
+        for target, value in (("load_all_records", RECORDS), ("snapshot_version", '"v1"')):
+            patcher = patch(f"api_handler.{target}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _call(self, path, query=None, account_id=None):
+        resp = api_handler.lambda_handler(_event(path, query, account_id), None)
+        return resp["statusCode"], json.loads(resp["body"])
+
+    def _all_pages(self, path, query, account_id=None, key="databases"):
+        pages, token = [], None
+        while True:
+            q = dict(query, next_token=token) if token else dict(query)
+            status, body = self._call(path, q, account_id)
+            self.assertEqual(status, 200, body)
+            pages.append(body[key])
+            token = body["next_token"]
+            if not token:
+                return pages, body
+
+    def test_pages_cover_everything_in_stable_order(self):
+        pages, last = self._all_pages("/prod/databases", {"limit": "2"})
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        rows = [r for p in pages for r in p]
+        self.assertEqual(rows, sorted(RECORDS, key=api_handler._sort_key))
+        self.assertEqual(last["count"], 5)
+
+    def test_unpaged_response_is_unchanged(self):
+        status, body = self._call("/prod/databases")
+        self.assertEqual(body, {"count": 5, "databases": RECORDS})
+
+    def test_fields_projection(self):
+        status, body = self._call("/prod/databases", {"engine": "mysql", "fields": "instance_id, engine,nope"})
+        self.assertEqual(body["databases"][0], {"instance_id": "i-0", "engine": "mysql"})
+        self.assertEqual(body["count"], 4)
+
+    def test_account_records_paging(self):
+        pages, last = self._all_pages(
+            "/prod/accounts/111111111111", {"limit": "2", "fields": "instance_id"}, "111111111111", key="records"
+        )
+        self.assertEqual([r["instance_id"] for p in pages for r in p], ["i-2", "i-1", "i-4"])
+        self.assertEqual(last["count"], 3)
+
+    def test_token_is_bound_to_query_and_snapshot(self):
+        status, body = self._call("/prod/databases", {"limit": "2", "engine": "mysql"})
+        token = body["next_token"]
+        status, body = self._call("/prod/databases", {"limit": "2", "engine": "postgres", "next_token": token})
+        self.assertEqual((status, body["error"]), (400, "next_token does not match this query"))
+        with patch("api_handler.snapshot_version", return_value='"v2"'):
+            status, body = self._call("/prod/databases", {"limit": "2", "engine": "mysql", "next_token": token})
+        self.assertEqual(status, 400)
+        self.assertIn("snapshot changed", body["error"])
+
+    def test_invalid_parameters(self):
+        for query in ({"limit": "abc"}, {"limit": "0"}, {"next_token": "!!!"}):
+            with self.subTest(query=query):
+                status, body = self._call("/prod/databases", query)
+                self.assertEqual(status, 400)
+
+    def test_limit_is_capped(self):
+        with patch.object(api_handler, "API_MAX_PAGE_SIZE", 3):
+            status, body = self._call("/prod/databases", {"limit": "100"})
+        self.assertEqual(len(body["databases"]), 3)
+        self.assertTrue(body["next_token"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+import discovery_handler
+from memory_s3 import MemoryS3
+
+
+def _record(account_id, region, iid, engine="mysql"):
+    return {"account_id": account_id, "region": region, "instance_id": iid, "db_id": f"{engine}-1", "engine": engine}
+
+
+RECORDS = [
+    _record("111111111111", "ap-south-1", "i-a", "postgres"),
+    _record("111111111111", "eu-west-1", "i-b"),
+    _record("222222222222", "eu-west-1", "i-c"),
+    _record("222222222222", "eu-west-1", "i-d", "postgres"),
+]
+
+
+def _event(path, query=None, account_id=None):
+    return {
+        "httpMethod": "GET",
+        "path": path,
+        "pathParameters": {"accountId": account_id} if account_id else {},
+        "queryStringParameters": query or {},
+    }
+
+
+class PartitionedLayoutTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._OBJECT_CACHE.clear()
+        for module in (discovery_handler, api_handler):
+            for name, value in (("RESULTS_S3_BUCKET", "bucket"), ("RESULTS_LAYOUT", "partitioned")):
+                patcher = patch.object(module, name, value)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        self.s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=self.s3):
+            discovery_handler.store_results_s3(RECORDS)
+        self.s3.gets.clear()
+
+    def _call(self, event):
+        with patch("api_handler._s3_client", return_value=self.s3):
+            resp = api_handler.lambda_handler(event, None)
+        return resp["statusCode"], json.loads(resp["body"])
+
+    def test_manifest_lists_partitions_with_counts(self):
+        manifest = json.loads(self.s3.objects[discovery_handler.RESULTS_MANIFEST_KEY])
+        self.assertEqual(manifest["record_count"], 4)
+        self.assertEqual(
+            [(p["region"], p["account_id"], p["record_count"]) for p in manifest["partitions"]],
+            [("ap-south-1", "111111111111", 1), ("eu-west-1", "111111111111", 1), ("eu-west-1", "222222222222", 2)],
+        )
+
+    def test_account_region_request_reads_one_partition(self):
+        status, body = self._call(_event(
+            "/prod/accounts/222222222222/instances", {"region": "eu-west-1"}, account_id="222222222222"
+        ))
+        self.assertEqual(status, 200)
+        self.assertEqual(sorted(i["instance_id"] for i in body["instances"]), ["i-c", "i-d"])
+        partition_gets = [k for k in self.s3.gets if k != discovery_handler.RESULTS_MANIFEST_KEY]
+        self.assertEqual(len(partition_gets), 1)
+
+    def test_unscoped_databases_reads_everything_and_filters(self):
+        status, body = self._call(_event("/prod/databases", {"engine": "postgresql"}))
+        self.assertEqual(status, 200)
+        self.assertEqual(sorted(d["instance_id"] for d in body["databases"]), ["i-a", "i-d"])
+
+    def test_merged_read_keeps_one_copy_of_the_rows(self):
+        status, body = self._call(_event("/prod/databases"))
+        self.assertEqual(len(body["databases"]), 4)
+        merged = api_handler.load_records()
+        manifest = json.loads(self.s3.objects[discovery_handler.RESULTS_MANIFEST_KEY])
+        for part in manifest["partitions"]:
+            value = api_handler._OBJECT_CACHE[part["key"]]["value"]
+            self.assertIs(value.store, merged)  # partitions are slices of the merged store
+        self.assertIs(api_handler.load_records(), merged)
+        gets = len(self.s3.gets)
+        status, body = self._call(_event("/prod/databases", {"region": "ap-south-1"}))
+        self.assertEqual([d["instance_id"] for d in body["databases"]], ["i-a"])
+        self.assertEqual(self.s3.gets[gets:], [])
+
+    def test_health_counts_from_summary_only(self):
+        status, body = self._call(_event("/prod/health"))
+        self.assertEqual(body["total_records"], 4)
+        self.assertEqual(self.s3.gets, [discovery_handler.SUMMARY_S3_KEY])
+
+    def test_health_falls_back_to_manifest_without_summary(self):
+        del self.s3.objects[discovery_handler.SUMMARY_S3_KEY]
+        status, body = self._call(_event("/prod/health"))
+        self.assertEqual(body["total_records"], 4)
+        self.assertEqual(self.s3.gets, [discovery_handler.SUMMARY_S3_KEY, discovery_handler.RESULTS_MANIFEST_KEY])
+
+    def test_history_index_stays_cached(self):
+        for _ in range(3):
+            status, body = self._call(_event("/prod/history"))
+            self.assertEqual(body["count"], 1)
+            self._call(_event("/prod/databases"))  # reads the manifest, which prunes the object cache
+        index_key = f"{discovery_handler.HISTORY_S3_PREFIX}/index.json"
+        self.assertEqual(self.s3.gets.count(index_key), 1)
+
+    def test_run_before_previous_is_cleaned_up(self):
+        with patch("discovery_handler._s3_client", return_value=self.s3):
+            discovery_handler.store_results_s3(RECORDS)
+            discovery_handler.store_results_s3(RECORDS)
+        runs = {k.split("/")[2] for k in self.s3.objects if k.startswith(discovery_handler.RESULTS_PARTITION_PREFIX)}
+        self.assertEqual(len(runs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+def _records(n=400, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if i % 97 == 0:
+            out.append("not-a-record")
+            continue
+        out.append({
+            "account_id": rng.choice(["111111111111", "222222222222", "333333333333"]),
+            "region": rng.choice(["eu-west-1", "ap-south-1", " eu-west-1", None, 42]),
+            "instance_id": f"i-{rng.randrange(40):03d}",
+            "db_id": rng.choice(["mysql-3306", "postgres-5432", "none", "discovery_failed", "", None]),
+            "engine": rng.choice(["mysql", "postgres", "PostgreSQL", " MongoDB ", None]),
+            "status": rng.choice(["running", "Installed", "n/a", None]),
+            "discovery_status": rng.choice(["success", "FAILED", None]),
+            "ec2_state": rng.choice(["running", "Stopped", "", None]),
+        })
+    return out
+
+
+QUERY_VALUES = {
+    "region": ["", "eu-west-1", "ap-south-1", " eu-west-1 ", "42", "us-east-1"],
+    "account_id": ["", "111111111111", "333333333333"],
+    "instance_id": ["", "i-007"],
+    "discovery_status": ["", "success", "failed"],
+    "ec2_state": ["", "STOPPED", "running"],
+    "engine": ["", "postgres", "postgresql", "mongodb", "oracle"],
+    "db_status": ["", "installed"],
+    "include_empty": [None, "false", "true"],
+}
+
+
+class RecordIndexTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._RECORD_INDEXES.clear()
+        api_handler._MERGED_RECORDS.clear()
+
+    def test_select_matches_linear_scan(self):
+        items = _records()
+        index = api_handler.RecordIndex(items)
+        fields = list(QUERY_VALUES)
+        rng = random.Random(1)
+        queries = [{}] + [{f: QUERY_VALUES[f][1]} for f in fields]
+        for _ in range(300):
+            queries.append({f: rng.choice(QUERY_VALUES[f]) for f in rng.sample(fields, rng.randint(1, 4))})
+        for qs in queries:
+            with self.subTest(qs=qs):
+                expected = api_handler.apply_record_filters(items, qs)
+                got = api_handler.apply_record_filters(items, qs, index=index)
+                self.assertEqual([id(r) for r in got], [id(r) for r in expected])
+
+    def test_index_is_reused_per_list_and_evicted_lru(self):
+        items = _records(20)
+        self.assertIs(api_handler.record_index(items), api_handler.record_index(items))
+        self.assertIsNot(api_handler.record_index(list(items)), api_handler.record_index(items))
+        with patch.object(api_handler, "RECORD_INDEX_CACHE_ENTRIES", 2):
+            lists = [_records(5, seed) for seed in range(3)]
+            for lst in lists:
+                api_handler.record_index(lst)
+        self.assertEqual(len(api_handler._RECORD_INDEXES), 2)
+        self.assertNotIn(id(lists[0]), api_handler._RECORD_INDEXES)
+
+    def test_replaced_snapshot_drops_its_index(self):
+        old, new = _records(30, 1), _records(30, 2)
+        api_handler.record_index(old)
+        api_handler._MERGED_RECORDS[("a", "b")] = ([old, new], old + new)
+        api_handler.record_index(api_handler._MERGED_RECORDS[("a", "b")][1])
+        api_handler._forget_records(old)
+        self.assertEqual(api_handler._RECORD_INDEXES, {})
+        self.assertEqual(api_handler._MERGED_RECORDS, {})
+
+    def test_query_by_account_uses_index(self):
+        items = _records()
+        with patch("api_handler.load_records", return_value=items):
+            got = api_handler.query_by_account("222222222222")
+        expected = [i for i in items if isinstance(i, dict) and i.get("account_id") == "222222222222"]
+        self.assertEqual(got, expected)
+        self.assertIn(id(items), api_handler._RECORD_INDEXES)
+
+    def test_merged_partitions_are_reused_while_unchanged(self):
+        parts = [_records(10, 1)[1:], _records(10, 2)[1:]]
+        first = api_handler._merged_records(("k1", "k2"), parts)
+        self.assertEqual(first, parts[0] + parts[1])
+        self.assertIs(api_handler._merged_records(("k1", "k2"), list(parts)), first)
+        self.assertIsNot(api_handler._merged_records(("k1", "k2"), [parts[0], _records(10, 3)[1:]]), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
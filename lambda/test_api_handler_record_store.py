@@ -0,0 +1,90 @@
+import io
+import json
+import random
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+from test_api_handler_record_index import QUERY_VALUES, _records
+
+
+def _dict_records(n=400, seed=7):
+    return [r for r in _records(n, seed) if isinstance(r, dict)]
+
+
+class RecordStoreTests(unittest.TestCase):
+    def test_rows_round_trip_with_key_order_and_types(self):
+        rows = [
+            {"b": 1, "a": True, "tags": {"Name": "x", "Team": "db"}},
+            {"a": 1.0, "b": None, "extra": [1, 2], "tags": {"Name": "x", "Team": "db"}},
+            {"tags": {"Team": "db", "Name": "x"}},
+        ]
+        store = api_handler.RecordStore(rows)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store, rows)
+        self.assertEqual([list(r) for r in store], [list(r) for r in rows])
+        self.assertIs(store[1]["a"].__class__, float)
+        self.assertIs(store[0]["a"], True)
+        self.assertNotIn("extra", store[0])
+        self.assertIs(store[0]["tags"], store[1]["tags"])
+        self.assertEqual(list(store[2]["tags"]), ["Team", "Name"])
+        self.assertEqual(store[-1], rows[-1])
+        self.assertEqual(store[1:], rows[1:])
+
+    def test_append_after_load_reuses_codes(self):
+        rows = [{"region": "eu-west-1", "tags": {"Name": "a"}}, {"region": "ap-south-1"}]
+        store = api_handler.RecordStore(rows)
+        store.append({"region": "eu-west-1", "tags": {"Name": "a"}})
+        self.assertEqual(len(store.column("region").values), 3)
+        self.assertEqual(len(store.column("tags").values), 2)
+        self.assertEqual(store[2], rows[0])
+        self.assertEqual(store._layouts.codes[2], store._layouts.codes[0])
+
+    def test_codes_widen_with_cardinality(self):
+        rows = [{"instance_id": f"i-{n}", "region": "eu-west-1"} for n in range(70000)]
+        store = api_handler.RecordStore(rows)
+        self.assertEqual(store.column("instance_id").codes.typecode, "I")
+        self.assertEqual(store.column("region").codes.typecode, "B")
+        self.assertEqual(store[69999], rows[69999])
+        self.assertEqual(store[300], rows[300])
+
+    def test_filters_match_list_results(self):
+        rows = _dict_records()
+        store = api_handler.RecordStore(rows)
+        rng = random.Random(3)
+        fields = list(QUERY_VALUES)
+        for _ in range(200):
+            qs = {f: rng.choice(QUERY_VALUES[f]) for f in rng.sample(fields, rng.randint(0, 4))}
+            with self.subTest(qs=qs):
+                self.assertEqual(api_handler.apply_record_filters(store, qs), api_handler.apply_record_filters(rows, qs))
+
+    def test_sorted_view_matches_sort_key(self):
+        rows = _dict_records()
+        view = api_handler.RecordStore(rows).sorted_by(api_handler._SORT_FIELDS)
+        self.assertEqual(view, sorted(rows, key=api_handler._sort_key))
+
+    def test_routes_serve_store_like_list(self):
+        rows = _dict_records()
+        query = {"engine": "mysql", "limit": "7", "fields": "instance_id,region"}
+        bodies = []
+        for records in (rows, api_handler.RecordStore(rows)):
+            api_handler._PAGE_ORDERS.clear()
+            with patch("api_handler.load_all_records", return_value=records), \
+                    patch("api_handler.snapshot_version", return_value="v"):
+                event = {"httpMethod": "GET", "path": "/prod/databases", "queryStringParameters": query}
+                bodies.append(json.loads(api_handler.lambda_handler(event, None)["body"]))
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(len(bodies[1]["databases"]), 7)
+
+    def test_parsed_snapshot_uses_store_setting(self):
+        body = json.dumps({"schema_version": 1, "records": _dict_records(20)}).encode()
+        self.assertIsInstance(api_handler._parse_records("k", io.BytesIO(body)), api_handler.RecordStore)
+        with patch.object(api_handler, "INVENTORY_STORE", "list"):
+            self.assertIsInstance(api_handler._parse_records("k", io.BytesIO(body)), list)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RECORDS = [
+    {"account_id": "111111111111", "instance_id": "i-a", "region": "ap-south-1", "db_id": "pg-5432"},
+    {"account_id": "222222222222", "instance_id": "i-b", "region": "eu-west-1", "db_id": "mysql-3306"},
+]
+
+
+def _load(body):
+    api_handler._OBJECT_CACHE.clear()
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": io.BytesIO(body)}
+    with patch.object(api_handler, "RESULTS_S3_BUCKET", "bucket"), \
+            patch("api_handler._s3_client", return_value=s3):
+        return api_handler.load_all_records()
+
+
+class SnapshotFormatTests(unittest.TestCase):
+    def test_schema_v1_document(self):
+        body = json.dumps({"schema_version": 1, "record_count": 2, "records": RECORDS}).encode()
+        self.assertEqual(_load(body), RECORDS)
+
+    def test_schema_v1_pretty_printed(self):
+        body = json.dumps({"schema_version": 1, "records": RECORDS}, indent=2).encode()
+        self.assertEqual(_load(body), RECORDS)
+
+    def test_legacy_bare_list(self):
+        self.assertEqual(_load(json.dumps(RECORDS).encode()), RECORDS)
+
+    def test_gzip_ndjson(self):
+        lines = [json.dumps({"schema_version": 2, "format": "ndjson"})] + [json.dumps(r) for r in RECORDS]
+        self.assertEqual(_load(gzip.compress("\n".join(lines).encode())), RECORDS)
+
+    def test_gzip_schema_v1_document(self):
+        body = gzip.compress(json.dumps({"schema_version": 1, "records": RECORDS}).encode())
+        self.assertEqual(_load(body), RECORDS)
+
+    @unittest.skipIf(zstandard is None, "zstandard not installed")
+    def test_zstd_ndjson(self):
+        lines = [json.dumps({"schema_version": 2, "format": "ndjson"})] + [json.dumps(r) for r in RECORDS]
+        body = zstandard.ZstdCompressor().compress("\n".join(lines).encode())
+        self.assertEqual(_load(body), RECORDS)
+
+    def test_corrupt_body_returns_empty(self):
+        self.assertEqual(_load(b"{not json"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
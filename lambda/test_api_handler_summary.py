@@ -0,0 +1,109 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+import discovery_handler
+from memory_s3 import MemoryS3
+
+
+RECORDS = [
+    {"account_id": "111111111111", "region": "eu-west-1", "instance_id": "i-a", "db_id": "mysql-3306",
+     "engine": "mysql", "status": "running", "discovery_status": "success", "ec2_state": "running"},
+    {"account_id": "111111111111", "region": "eu-west-1", "instance_id": "i-a", "db_id": "postgres-5432",
+     "engine": "postgresql", "status": "installed", "discovery_status": "success", "ec2_state": "running"},
+    {"account_id": "222222222222", "region": "ap-south-1", "instance_id": "i-b", "db_id": "none",
+     "engine": "none", "status": "n/a", "discovery_status": "success", "ec2_state": "stopped"},
+    {"account_id": "222222222222", "region": "eu-west-1", "instance_id": "i-c", "db_id": "discovery_failed",
+     "engine": "unknown", "status": "unknown", "discovery_status": "failed", "ec2_state": "running"},
+]
+
+
+def _event(path, query=None):
+    return {"httpMethod": "GET", "path": path, "pathParameters": {}, "queryStringParameters": query or {}}
+
+
+class BuildSummaryTests(unittest.TestCase):
+    def test_counts_and_histograms(self):
+        summary = discovery_handler.build_summary(RECORDS, "2025-01-01T00:00:00Z")
+        self.assertEqual(summary["total_records"], 4)
+        self.assertEqual(summary["total_instances"], 3)
+        self.assertEqual(summary["total_databases"], 2)
+        self.assertEqual(summary["regions"], ["ap-south-1", "eu-west-1"])
+        self.assertEqual(summary["accounts_by_region"]["eu-west-1"], ["111111111111", "222222222222"])
+        self.assertEqual(
+            summary["by_account"]["111111111111"],
+            {"records": 2, "instances": 1, "databases": 2, "regions": ["eu-west-1"]},
+        )
+        self.assertEqual(summary["engines"], {"mysql": 1, "postgresql": 1})
+        self.assertEqual(summary["discovery_status"], {"failed": 1, "success": 2})
+        self.assertEqual(summary["ec2_state"], {"running": 2, "stopped": 1})
+
+    def test_api_fallback_matches_discovery(self):
+        self.assertEqual(api_handler.build_summary(RECORDS), discovery_handler.build_summary(RECORDS))
+
+
+class SummaryEndpointTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._OBJECT_CACHE.clear()
+        for module in (discovery_handler, api_handler):
+            patcher = patch.object(module, "RESULTS_S3_BUCKET", "bucket")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=self.s3):
+            discovery_handler.store_results_s3(RECORDS)
+        self.s3.gets.clear()
+
+    def _call(self, path, query=None):
+        with patch("api_handler._s3_client", return_value=self.s3):
+            resp = api_handler.lambda_handler(_event(path, query), None)
+        return resp["statusCode"], json.loads(resp["body"])
+
+    def test_unfiltered_endpoints_read_only_the_summary(self):
+        self.assertEqual(self._call("/prod/health")[1]["total_records"], 4)
+        self.assertEqual(self._call("/prod")[1]["total_records"], 4)
+        self.assertEqual(self._call("/prod/regions")[1]["regions"], ["ap-south-1", "eu-west-1"])
+        self.assertEqual(
+            self._call("/prod/regions/ap-south-1/accounts")[1]["accounts"], ["222222222222"]
+        )
+        self.assertEqual(
+            self._call("/prod/accounts", {"region": "eu-west-1"})[1]["accounts"], ["111111111111", "222222222222"]
+        )
+        status, body = self._call("/prod/summary")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["total_databases"], 2)
+        self.assertEqual(set(self.s3.gets), {discovery_handler.SUMMARY_S3_KEY})
+
+    def test_filters_fall_back_to_records(self):
+        status, body = self._call("/prod/regions", {"engine": "postgres"})
+        self.assertEqual(body["regions"], ["eu-west-1"])
+        status, body = self._call("/prod/summary", {"region": "ap-south-1"})
+        self.assertEqual(body["total_records"], 1)
+        self.assertIn(discovery_handler.RESULTS_S3_KEY, self.s3.gets)
+
+    def test_missing_summary_falls_back_to_records(self):
+        del self.s3.objects[discovery_handler.SUMMARY_S3_KEY]
+        self.assertEqual(self._call("/prod/regions")[1]["regions"], ["ap-south-1", "eu-west-1"])
+        self.assertEqual(self._call("/prod/summary")[1]["total_instances"], 3)
+
+    def test_summary_denied_without_list_bucket_falls_back_to_records(self):
+        del self.s3.objects[discovery_handler.SUMMARY_S3_KEY]
+        self.s3.list_denied = True  # API role has s3:GetObject only: a missing key is a 403
+        for path in ("/prod/health", "/prod", "/prod/regions", "/prod/accounts"):
+            status, body = self._call(path)
+            self.assertEqual(status, 200, (path, body))
+        self.assertEqual(self._call("/prod/regions")[1]["regions"], ["ap-south-1", "eu-west-1"])
+        self.assertIn(discovery_handler.RESULTS_S3_KEY, self.s3.gets)
+
+    def test_denied_snapshot_is_still_an_error(self):
+        self.s3.objects.clear()
+        self.s3.list_denied = True
+        self.assertEqual(self._call("/prod/databases")[0], 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import random
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+
+
+def _records(n=300, seed=11):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if i % 89 == 0:
+            out.append("not-a-record")
+            continue
+        tags = rng.choice([
+            {"Name": f"web-{i % 23}", "Environment": rng.choice(["production", "Production", "staging"])},
+            {"Name": f"DB-Primary-{i % 7}", "Owner": "team-a"},
+            {"Environment": "", "Owner": "team-b"},
+            {},
+            None,
+            "not-a-dict",
+        ])
+        out.append({
+            "account_id": rng.choice(["111111111111", "222222222222"]),
+            "region": rng.choice(["eu-west-1", "ap-south-1"]),
+            "instance_id": f"i-{rng.randrange(60):03x}",
+            "db_id": rng.choice(["mysql-3306", "postgres-5432", "none", "discovery_failed", ""]),
+            "engine": rng.choice(["mysql", "postgres", None]),
+            "tags": tags,
+        })
+    return out
+
+
+TAG_QUERIES = [
+    {"tag.Environment": "production"},
+    {"tag.Environment": "PRODUCTION", "region": "eu-west-1"},
+    {"tag.Environment": "qa"},
+    {"tag.Nope": "x"},
+    {"tag.Owner": "team-a", "tag.Name": "db-primary-3"},
+    {"has_tag": "Owner"},
+    {"has_tag": "Owner,Environment"},
+    {"has_tag": "Environment", "engine": "mysql", "include_empty": "false"},
+    {"q": "web"},
+    {"q": "web-1*"},
+    {"q": "primary"},
+    {"q": "I-0"},
+    {"q": "i-00*"},
+    {"q": "3306", "tag.Environment": "staging"},
+    {"q": "*"},
+    {"q": "zzz"},
+    {"q": "none"},
+]
+
+
+class TagSearchTests(unittest.TestCase):
+    def setUp(self):
+        api_handler._RECORD_INDEXES.clear()
+
+    def test_index_matches_linear_scan(self):
+        items = _records()
+        store = api_handler.RecordStore(r for r in items if isinstance(r, dict))
+        dict_items = [r for r in items if isinstance(r, dict)]
+        index = api_handler.RecordIndex(items)
+        for qs in TAG_QUERIES:
+            with self.subTest(qs=qs):
+                expected = api_handler.apply_record_filters(items, qs)
+                got = api_handler.apply_record_filters(items, qs, index=index)
+                self.assertEqual([id(r) for r in got], [id(r) for r in expected])
+                self.assertEqual(list(api_handler.apply_record_filters(store, qs)),
+                                 api_handler.apply_record_filters(dict_items, qs))
+
+    def test_semantics(self):
+        items = [
+            {"instance_id": "i-abc", "db_id": "mysql-3306", "tags": {"Name": "Payments-DB", "Env": "Prod"}},
+            {"instance_id": "i-def", "db_id": "none", "tags": {"Name": "web-none", "Owner": "x"}},
+            {"instance_id": "i-xyz", "db_id": "pg-5432", "tags": {"Env": "dev"}},
+        ]
+
+        def ids(qs):
+            return [r["instance_id"] for r in api_handler.apply_record_filters(items, qs)]
+
+        self.assertEqual(ids({"tag.Env": "prod"}), ["i-abc"])
+        self.assertEqual(ids({"has_tag": "Env"}), ["i-abc", "i-xyz"])
+        self.assertEqual(ids({"q": "payments"}), ["i-abc"])
+        self.assertEqual(ids({"q": "ments-d"}), ["i-abc"])
+        self.assertEqual(ids({"q": "ments*"}), [])
+        self.assertEqual(ids({"q": "none"}), ["i-def"])
+        self.assertEqual(ids({"q": "5432"}), ["i-xyz"])
+
+    def test_tag_index_built_once_per_snapshot(self):
+        items = _records(50)
+        index = api_handler.record_index(items)
+        api_handler.apply_record_filters(items, {"q": "web"}, index=index)
+        tags = index.tag_index()
+        api_handler.apply_record_filters(items, {"has_tag": "Owner"}, index=index)
+        self.assertIs(index.tag_index(), tags)
+
+    def test_tag_filters_bypass_summary(self):
+        items = _records(50)
+        with patch("api_handler.load_all_records", return_value=items), \
+                patch("api_handler.load_summary", side_effect=AssertionError("summary used")):
+            event = {"httpMethod": "GET", "path": "/prod/summary", "queryStringParameters": {"tag.Owner": "team-a"}}
+            body = json.loads(api_handler.lambda_handler(event, None)["body"])
+        expected = api_handler.apply_record_filters(items, {"tag.Owner": "team-a"})
+        self.assertEqual(body["total_records"], len(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import api_handler
+import api_server
+import discovery_handler
+
+
+def _record(n, engine="mysql"):
+    return {"account_id": "111111111111", "region": "eu-west-1", "instance_id": f"i-{n:04d}",
+            "db_id": f"{engine}-{n}", "engine": engine, "tags": {"Name": f"web-{n}"}}
+
+
+def _write_snapshot(path, records, mtime=None):
+    with open(path, "wb") as sink:
+        discovery_handler.write_snapshot(sink, records, "2025-01-01T00:00:00Z", fmt="ndjson", compression="gzip")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class ApiServerTests(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("_S3_CLIENT", None), ("RESULTS_S3_BUCKET", ""), ("EXPORT_S3_BUCKET", ""),
+                            ("RESULTS_LAYOUT", "single"), ("INVENTORY_CACHE_TTL_SECONDS", 60.0)):
+            patcher = patch.object(api_handler, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        api_handler._OBJECT_CACHE.clear()
+        self.addCleanup(api_handler._OBJECT_CACHE.clear)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.snapshot = self.dir / "inventory.ndjson.gz"
+        _write_snapshot(self.snapshot, [_record(n) for n in range(20)], mtime=1_700_000_000)
+        self.store = api_server.use_local_inventory(self.snapshot)
+
+    def _serve(self):
+        server = api_server.make_api_server("127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return "http://127.0.0.1:%s" % server.server_address[1]
+
+    def _get(self, url, headers=None):
+        try:
+            with urlopen(Request(url, headers=headers or {}), timeout=10) as resp:
+                return resp.status, dict(resp.headers), resp.read()
+        except HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def test_serves_local_snapshot_concurrently(self):
+        base = self._serve()
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(self._get, [f"{base}/databases?engine=mysql&limit=5"] * 16))
+        self.assertEqual({status for status, _, _ in results}, {200})
+        bodies = {body for _, _, body in results}
+        self.assertEqual(len(bodies), 1)
+        body = json.loads(bodies.pop())
+        self.assertEqual((body["count"], len(body["databases"])), (20, 5))
+
+    @patch.object(api_handler, "API_COMPRESSION", True)
+    def test_compression_and_etag_round_trip(self):
+        base = self._serve()
+        status, headers, body = self._get(f"{base}/databases", {"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(body))["databases"]), 20)
+        status, _, body = self._get(f"{base}/databases", {"If-None-Match": headers["ETag"]})
+        self.assertEqual((status, body), (304, b""))
+
+    def test_refresh_swaps_snapshot_and_requests_do_not_revalidate(self):
+        api_server.refresh()
+        event = {"httpMethod": "GET", "path": "/summary", "queryStringParameters": {"engine": "mysql"}}
+        with patch.object(api_handler, "INVENTORY_CACHE_TTL_SECONDS", float("inf")), \
+                patch.object(self.store, "get_object", side_effect=AssertionError("request hit storage")):
+            body = json.loads(api_handler.lambda_handler(event, None)["body"])
+        self.assertEqual(body["total_records"], 20)
+
+        self.assertEqual(api_server.refresh(), [])  # unchanged file: 304, nothing re-parsed
+        _write_snapshot(self.snapshot, [_record(n, "postgres") for n in range(5)], mtime=1_700_000_100)
+        self.assertEqual(api_server.refresh(), [api_handler.RESULTS_S3_KEY])
+        body = json.loads(api_handler.lambda_handler(dict(event, queryStringParameters={}), None)["body"])
+        self.assertEqual(body["total_records"], 5)
+
+    def test_directory_layout_and_missing_keys(self):
+        summary_path = self.dir / api_handler.SUMMARY_S3_KEY
+        summary_path.parent.mkdir(parents=True)
+        summary_path.write_text(json.dumps({"total_records": 7}))
+        store = api_server.LocalObjectStore(self.dir)
+        self.assertEqual(json.loads(store.get_object(Bucket="b", Key=api_handler.SUMMARY_S3_KEY)["Body"].read()),
+                         {"total_records": 7})
+        for key in ("discovery/missing.json", "../outside"):
+            with self.assertRaises(api_server.ClientError):
+                store.get_object(Bucket="b", Key=key)
+
+    def test_refresher_thread(self):
+        with patch("api_server.refresh") as refresh:
+            stop = api_server.start_refresher(0.01)
+            deadline = time.monotonic() + 5
+            while refresh.call_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            stop.set()
+        self.assertGreaterEqual(refresh.call_count, 2)
+        self.assertEqual(api_handler.INVENTORY_CACHE_TTL_SECONDS, float("inf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+from memory_s3 import MemoryS3
+
+
+class _Context:
+    """Remaining time drops below the reserve after ``budget`` checks."""
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def get_remaining_time_in_millis(self):
+        self.budget -= 1
+        return 900_000 if self.budget >= 0 else 1_000
+
+
+ACCOUNTS = ["111111111111", "222222222222", "333333333333"]
+
+
+def _fake_pair(account_id, region, previous=None):
+    return [{"account_id": account_id, "region": region, "instance_id": "i-" + account_id[:3]}]
+
+
+@patch.object(discovery_handler, "RESULTS_S3_BUCKET", "bucket")
+@patch.object(discovery_handler, "DISCOVERY_REGIONS", ["eu-west-1"])
+@patch.object(discovery_handler, "DISCOVERY_MAX_WORKERS", 1)
+@patch("discovery_handler.resolve_accounts_to_scan", return_value=ACCOUNTS)
+class CheckpointResumeTests(unittest.TestCase):
+    def test_partial_run_checkpoints_then_resumes_and_publishes(self, _accounts):
+        s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler.discover_account_region", side_effect=_fake_pair) as pair:
+            first = discovery_handler.lambda_handler({}, _Context(budget=1))
+            self.assertFalse(json.loads(first["body"])["complete"])
+            self.assertEqual(json.loads(first["body"])["pairs_done"], 1)
+            self.assertNotIn(discovery_handler.RESULTS_S3_KEY, s3.objects)
+            self.assertIn(discovery_handler.CHECKPOINT_S3_KEY, s3.objects)
+
+            second = discovery_handler.lambda_handler({}, _Context(budget=100))
+
+        self.assertTrue(json.loads(second["body"])["complete"])
+        self.assertEqual([c.args[0] for c in pair.call_args_list], ACCOUNTS)
+        snapshot = json.loads(s3.objects[discovery_handler.RESULTS_S3_KEY])
+        self.assertEqual([r["account_id"] for r in snapshot["records"]], ACCOUNTS)
+        self.assertNotIn(discovery_handler.CHECKPOINT_S3_KEY, s3.objects)
+
+    @patch.object(discovery_handler, "DISCOVERY_DEADLINE_RESERVE_SECONDS", 120)
+    @patch.object(discovery_handler, "DISCOVERY_SELF_CONTINUE", True)
+    def test_reserve_above_remaining_time_is_clamped(self, _accounts):
+        context = MagicMock(invoked_function_arn="arn:aws:lambda:eu-west-1:1:function:discovery")
+        context.get_remaining_time_in_millis.return_value = 60_000
+        s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler._continue_async") as cont, \
+                patch("discovery_handler.discover_account_region", side_effect=_fake_pair):
+            resp = discovery_handler.lambda_handler({}, context)
+        self.assertEqual(json.loads(resp["body"])["discovered"], 3)
+        cont.assert_not_called()
+        self.assertNotIn(discovery_handler.CHECKPOINT_S3_KEY, s3.objects)
+
+    @patch.object(discovery_handler, "DISCOVERY_SELF_CONTINUE", True)
+    def test_zero_progress_neither_checkpoints_nor_reinvokes(self, _accounts):
+        s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler._continue_async") as cont, \
+                patch("discovery_handler.run_pairs", return_value={}):
+            resp = discovery_handler.lambda_handler({}, _Context(budget=100))
+        self.assertEqual(resp["statusCode"], 500)
+        self.assertEqual(json.loads(resp["body"])["pairs_done"], 0)
+        cont.assert_not_called()
+        self.assertEqual(s3.objects, {})
+
+    @patch.object(discovery_handler, "DISCOVERY_SELF_CONTINUE", True)
+    def test_continuation_resumes_only_its_own_run(self, _accounts):
+        context = MagicMock(invoked_function_arn="arn:aws:lambda:eu-west-1:1:function:discovery")
+        context.get_remaining_time_in_millis.side_effect = _Context(budget=1).get_remaining_time_in_millis
+        s3 = MemoryS3()
+        lam = MagicMock()
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler._hub_client", return_value=lam), \
+                patch("discovery_handler.discover_account_region", side_effect=_fake_pair) as pair:
+            discovery_handler.lambda_handler({}, context)
+            payload = json.loads(lam.invoke.call_args.kwargs["Payload"])
+            run_id = json.loads(s3.objects[discovery_handler.CHECKPOINT_S3_KEY])["started_at"]
+            self.assertEqual(payload, {"resume_run": run_id})
+
+            # A scheduled run finished the work first: the late continuation must not start over.
+            discovery_handler.lambda_handler({}, _Context(budget=100))
+            calls = pair.call_count
+            resp = discovery_handler.lambda_handler(payload, _Context(budget=100))
+        self.assertEqual(json.loads(resp["body"])["skipped"], "checkpoint_replaced")
+        self.assertEqual(pair.call_count, calls)
+
+    def test_first_pair_starts_even_below_reserve(self, _accounts):
+        def time_left():
+            return 1.0
+
+        with patch("discovery_handler.discover_account_region", side_effect=_fake_pair):
+            done = discovery_handler.run_pairs([(a, "eu-west-1") for a in ACCOUNTS], time_left=time_left)
+        self.assertEqual(list(done), [(ACCOUNTS[0], "eu-west-1")])
+
+    def test_run_without_context_completes_in_one_go(self, _accounts):
+        s3 = MemoryS3()
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler.discover_account_region", side_effect=_fake_pair):
+            resp = discovery_handler.lambda_handler({}, None)
+        self.assertEqual(json.loads(resp["body"])["discovered"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import threading
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+
+class _RecordingSsm:
+    def __init__(self, fail_first_id=None):
+        self.calls = []
+        self.fail_first_id = fail_first_id
+        self._lock = threading.Lock()
+
+    def send_command(self, **params):
+        with self._lock:
+            self.calls.append(params)
+            n = len(self.calls)
+        ids = params.get("InstanceIds") or []
+        if self.fail_first_id and ids and ids[0] == self.fail_first_id:
+            raise RuntimeError("ThrottlingException")
+        return {"Command": {"CommandId": f"cmd-{n}"}}
+
+
+IDS = [f"i-{n:04d}" for n in range(120)]
+
+
+class DispatchTests(unittest.TestCase):
+    def test_ids_split_into_api_sized_batches(self):
+        ssm = _RecordingSsm()
+        with patch.object(discovery_handler, "SSM_MAX_CONCURRENCY", "25%"), \
+                patch.object(discovery_handler, "SSM_MAX_ERRORS", "10"):
+            commands, failures = discovery_handler.dispatch_ssm_commands(ssm, IDS, "111111111111")
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(len(c["InstanceIds"]) for c in ssm.calls), [20, 50, 50])
+        self.assertTrue(all(c["MaxConcurrency"] == "25%" and c["MaxErrors"] == "10" for c in ssm.calls))
+        self.assertEqual(sorted(i for batch in commands.values() for i in batch), IDS)
+
+    def test_max_concurrency_count_is_split_across_batches(self):
+        ssm = _RecordingSsm()
+        with patch.object(discovery_handler, "SSM_MAX_CONCURRENCY", "24"):
+            discovery_handler.dispatch_ssm_commands(ssm, IDS, "111111111111")
+        by_size = sorted((len(c["InstanceIds"]), int(c["MaxConcurrency"])) for c in ssm.calls)
+        self.assertEqual(by_size, [(20, 4), (50, 10), (50, 10)])
+        with patch.object(discovery_handler, "SSM_MAX_CONCURRENCY", "2"):
+            self.assertEqual(discovery_handler._batch_max_concurrency(50, 120), "1")  # every command runs one
+            self.assertEqual(discovery_handler._batch_max_concurrency(30, 30), "2")
+
+    def test_failed_batch_reported_per_instance(self):
+        ssm = _RecordingSsm(fail_first_id="i-0050")
+        commands, failures = discovery_handler.dispatch_ssm_commands(ssm, IDS, "111111111111")
+        self.assertEqual(len(commands), 2)
+        self.assertEqual([f["instance_id"] for f in failures], IDS[50:100])
+        self.assertTrue(all(f["status"] == "error" for f in failures))
+
+    def test_tag_target_sends_single_command(self):
+        ssm = _RecordingSsm()
+        with patch.object(discovery_handler, "SSM_TARGET_TAG", "DbDiscovery=enabled"):
+            commands, failures = discovery_handler.dispatch_ssm_commands(ssm, IDS, "111111111111")
+        self.assertEqual(list(commands.values()), [None])
+        self.assertEqual(ssm.calls[0]["Targets"], [{"Key": "tag:DbDiscovery", "Values": ["enabled"]}])
+        self.assertNotIn("InstanceIds", ssm.calls[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
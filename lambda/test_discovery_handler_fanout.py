@@ -0,0 +1,59 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+
+def _fake_pair(account_id, region, previous=None):
+    if account_id == "333333333333":
+        raise RuntimeError("spoke exploded")
+    if account_id == "111111111111":
+        time.sleep(0.3)
+    return [{"account_id": account_id, "region": region, "instance_id": "i-" + account_id[:3]}]
+
+
+class DiscoveryFanOutTests(unittest.TestCase):
+    @patch("discovery_handler.discover_account_region", side_effect=_fake_pair)
+    def test_pairs_merge_in_input_order_and_failures_are_isolated(self, _pair):
+        pairs = [
+            ("111111111111", "eu-west-1"),
+            ("222222222222", "eu-west-1"),
+            ("333333333333", "eu-west-1"),
+            ("222222222222", "ap-south-1"),
+        ]
+        records = discovery_handler.discover_pairs(pairs, max_workers=4)
+        self.assertEqual(
+            [(r["account_id"], r["region"]) for r in records],
+            [
+                ("111111111111", "eu-west-1"),
+                ("222222222222", "eu-west-1"),
+                ("222222222222", "ap-south-1"),
+            ],
+        )
+
+    def test_pairs_run_concurrently_up_to_worker_limit(self):
+        active = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def slow_pair(account_id, region, previous=None):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.05)
+            with lock:
+                active["now"] -= 1
+            return []
+
+        pairs = [(f"{n:012d}", "eu-west-1") for n in range(12)]
+        with patch("discovery_handler.discover_account_region", side_effect=slow_pair):
+            discovery_handler.discover_pairs(pairs, max_workers=3)
+        self.assertEqual(active["peak"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
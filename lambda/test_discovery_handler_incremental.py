@@ -0,0 +1,117 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+from memory_s3 import MemoryS3
+
+LAUNCH = datetime(2025, 1, 1, 8, 0, 0)
+PROBE = json.dumps({"discovery_status": "success", "databases": [{"db_id": "mysql-3306", "engine": "mysql"}]})
+SSM_INFO = {
+    iid: {"InstanceId": iid, "PingStatus": "Online", "PlatformName": "Amazon Linux", "PlatformVersion": "2023", "AgentVersion": "3.3.0"}
+    for iid in ("i-1", "i-2")
+}
+
+
+def _paginator(pages_fn):
+    p = MagicMock()
+    p.paginate.side_effect = pages_fn
+    return p
+
+
+class _FakeSsm:
+    def __init__(self):
+        self.sent = []
+
+    def get_paginator(self, name):
+        if name == "describe_instance_information":
+            return _paginator(lambda **kw: [{"InstanceInformationList": list(SSM_INFO.values())}])
+        return _paginator(lambda CommandId, Details: [{"CommandInvocations": [
+            {"InstanceId": iid, "Status": "Success", "CommandPlugins": [{"Output": PROBE}]} for iid in self.sent[-1]
+        ]}])
+
+    def send_command(self, **params):
+        self.sent.append(params["InstanceIds"])
+        return {"Command": {"CommandId": "cmd-1"}}
+
+
+class _FakeEc2:
+    def get_paginator(self, name):
+        return _paginator(lambda InstanceIds: [{"Reservations": [{"Instances": [
+            {"InstanceId": iid, "InstanceType": "t3.large", "LaunchTime": LAUNCH, "State": {"Name": "running"},
+             "Tags": [{"Key": "Env", "Value": "prod"}]}
+            for iid in InstanceIds
+        ]}]}])
+
+
+def _signature():
+    detail = {"launch_time": LAUNCH.isoformat(), "ec2_state": "running", "instance_type": "t3.large"}
+    return discovery_handler.probe_signature(SSM_INFO["i-1"], detail)
+
+
+def _previous_row(iid, signature, age_hours=1):
+    ts = (datetime.utcnow() - timedelta(hours=age_hours)).isoformat() + "Z"
+    return {
+        "account_id": "111111111111", "region": "eu-west-1", "instance_id": iid, "db_id": "pg-5432",
+        "engine": "postgres", "discovery_status": "success", "discovery_timestamp": ts,
+        "probe_signature": signature, "instance_type": "t3.small", "tags": {}, "ec2_state": "running",
+    }
+
+
+@patch("discovery_handler.time.sleep")
+class IncrementalDiscoveryTests(unittest.TestCase):
+    def _run(self, previous_rows):
+        ssm, ec2 = _FakeSsm(), _FakeEc2()
+        clients = {"ssm": ssm, "ec2": ec2}
+        previous = discovery_handler.index_previous_records(previous_rows)
+        with patch("discovery_handler.get_spoke_client", side_effect=lambda a, svc, region=None: clients[svc]):
+            records = discovery_handler.discover_account_region("111111111111", "eu-west-1", previous)
+        return ssm, records
+
+    def test_unchanged_instance_keeps_previous_rows(self, _sleep):
+        old = _previous_row("i-1", _signature())
+        ssm, records = self._run([old])
+        self.assertEqual(ssm.sent, [["i-2"]])
+        reused = [r for r in records if r["instance_id"] == "i-1"]
+        self.assertEqual(len(reused), 1)
+        self.assertEqual(reused[0]["discovery_timestamp"], old["discovery_timestamp"])
+        self.assertEqual(reused[0]["db_id"], "pg-5432")
+        self.assertEqual(reused[0]["tags"], {"Env": "prod"})
+        fresh = [r for r in records if r["instance_id"] == "i-2"]
+        self.assertEqual(fresh[0]["probe_signature"], _signature())
+
+    def test_changed_or_stale_instances_are_reprobed(self, _sleep):
+        ssm, _ = self._run([_previous_row("i-1", "different"), _previous_row("i-2", _signature(), age_hours=48)])
+        self.assertEqual(sorted(ssm.sent[0]), ["i-1", "i-2"])
+
+
+@patch.object(discovery_handler, "RESULTS_S3_BUCKET", "bucket")
+@patch.object(discovery_handler, "RESULTS_LAYOUT", "single")
+@patch.object(discovery_handler, "DISCOVERY_REGIONS", ["eu-west-1"])
+@patch("discovery_handler.resolve_accounts_to_scan", return_value=["111111111111"])
+class ProbeSignatureStorageTests(unittest.TestCase):
+    def test_signatures_stay_out_of_the_snapshot_and_come_back_for_the_next_run(self, _accounts):
+        s3 = MemoryS3()
+        seen = []
+
+        def discover(account_id, region, previous=None):
+            seen.append(previous)
+            return [dict(_previous_row("i-1", _signature()), region=region)]
+
+        with patch("discovery_handler._s3_client", return_value=s3), \
+                patch("discovery_handler.discover_account_region", side_effect=discover):
+            discovery_handler.lambda_handler({}, None)
+            snapshot = json.loads(s3.objects[discovery_handler.RESULTS_S3_KEY])
+            self.assertNotIn("probe_signature", snapshot["records"][0])
+            with patch.object(discovery_handler, "DISCOVERY_INCREMENTAL", True):
+                discovery_handler.lambda_handler({}, None)
+        (row,) = seen[1][("111111111111", "eu-west-1", "i-1")]
+        self.assertEqual(row["probe_signature"], _signature())
+
+
+if __name__ == "__main__":
+    unittest.main()
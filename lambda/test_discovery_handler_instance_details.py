@@ -0,0 +1,77 @@
+import sys
+import threading
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+
+class _FakeEc2:
+    """describe_instances paginator that rejects any chunk containing a stale ID."""
+
+    def __init__(self, stale, name_bad_ids=True):
+        self.stale = set(stale)
+        self.name_bad_ids = name_bad_ids
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_paginator(self, name):
+        assert name == "describe_instances"
+        paginator = MagicMock()
+        paginator.paginate.side_effect = self._paginate
+        return paginator
+
+    def _paginate(self, InstanceIds):
+        with self._lock:
+            self.calls.append(list(InstanceIds))
+        bad = [i for i in InstanceIds if i in self.stale]
+        if bad:
+            msg = f"The instance IDs '{', '.join(bad)}' do not exist" if self.name_bad_ids else "Invalid id"
+            raise ClientError({"Error": {"Code": "InvalidInstanceID.NotFound", "Message": msg}}, "DescribeInstances")
+        half = len(InstanceIds) // 2
+        return [
+            {"Reservations": [{"Instances": [self._inst(i) for i in InstanceIds[:half]]}]},
+            {"Reservations": [{"Instances": [self._inst(i) for i in InstanceIds[half:]]}]},
+        ]
+
+    @staticmethod
+    def _inst(iid):
+        return {
+            "InstanceId": iid,
+            "InstanceType": "t3.small",
+            "State": {"Name": "running"},
+            "Tags": [{"Key": "Name", "Value": iid}],
+        }
+
+
+IDS = [f"i-{n:04x}" for n in range(250)]
+
+
+class InstanceDetailsTests(unittest.TestCase):
+    def test_chunks_and_pages_are_merged(self):
+        ec2 = _FakeEc2(stale=[])
+        details = discovery_handler.get_instance_details(ec2, IDS)
+        self.assertEqual(sorted(details), sorted(IDS))
+        self.assertEqual(sorted(len(c) for c in ec2.calls), [50, 100, 100])
+        self.assertEqual(details["i-0001"]["instance_type"], "t3.small")
+        self.assertEqual(details["i-0001"]["tags"], {"Name": "i-0001"})
+        self.assertEqual(details["i-0001"]["ec2_state"], "running")
+
+    def test_stale_ids_named_in_error_are_dropped_and_chunk_retried(self):
+        ec2 = _FakeEc2(stale=["i-0005", "i-00c8"])
+        details = discovery_handler.get_instance_details(ec2, IDS)
+        self.assertEqual(sorted(details), sorted(set(IDS) - {"i-0005", "i-00c8"}))
+
+    def test_unnamed_bad_ids_are_isolated_by_splitting(self):
+        ec2 = _FakeEc2(stale=["i-0005"], name_bad_ids=False)
+        with patch.object(discovery_handler, "EC2_DESCRIBE_CHUNK_SIZE", 16):
+            details = discovery_handler.get_instance_details(ec2, IDS[:16])
+        self.assertEqual(sorted(details), sorted(set(IDS[:16]) - {"i-0005"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
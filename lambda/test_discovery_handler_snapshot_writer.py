@@ -0,0 +1,145 @@
+import gzip
+import io
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _MultipartS3:
+    def __init__(self):
+        self.objects = {}
+        self.put_kwargs = {}
+        self.part_sizes = []
+        self.aborted = False
+        self._parts = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+        self.put_kwargs[Key] = kwargs
+        return {"ETag": '"single"'}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.put_kwargs[Key] = kwargs
+        self._parts[Key] = []
+        return {"UploadId": "up-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.part_sizes.append(len(Body))
+        self._parts[Key].append(Body)
+        return {"ETag": f'"p{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b"".join(self._parts[Key])
+        return {"ETag": '"multi-%d"' % len(MultipartUpload["Parts"])}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+
+RECORDS = [
+    {"account_id": "111111111111", "instance_id": f"i-{n:05d}", "db_id": "mysql-3306", "tags": {"Name": f"db-{n}"}}
+    for n in range(400)
+]
+
+
+class SnapshotWriterTests(unittest.TestCase):
+    def test_json_format_matches_schema_v1_document(self):
+        s3 = _MultipartS3()
+        with discovery_handler.S3MultipartWriter(s3, "b", "k", 1024) as sink:
+            discovery_handler.write_snapshot(sink, RECORDS, "2025-01-01T00:00:00Z", fmt="json")
+        self.assertGreater(len(s3.part_sizes), 1)
+        self.assertTrue(all(size == 1024 for size in s3.part_sizes[:-1]))
+        doc = json.loads(s3.objects["k"])
+        self.assertEqual(doc["schema_version"], 1)
+        self.assertEqual(doc["record_count"], len(RECORDS))
+        self.assertEqual(doc["records"], RECORDS)
+
+    def test_ndjson_round_trip_through_reader(self):
+        s3 = _MultipartS3()
+        with discovery_handler.S3MultipartWriter(s3, "b", "k", 1024) as sink:
+            count = discovery_handler.write_snapshot(sink, iter(RECORDS), "2025-01-01T00:00:00Z", fmt="ndjson")
+        self.assertEqual(count, len(RECORDS))
+        lines = gzip.decompress(s3.objects["k"]).splitlines()
+        self.assertEqual(json.loads(lines[0])["schema_version"], 2)
+        self.assertEqual(list(discovery_handler.iter_snapshot_records(io.BytesIO(s3.objects["k"]))), RECORDS)
+
+    def test_json_document_is_read_record_by_record(self):
+        records = [dict(r, note="caf\u00e9 \u65e5\u672c", size=10 ** 12 + n) for n, r in enumerate(RECORDS)]
+        sink = io.BytesIO()
+        discovery_handler.write_snapshot(sink, records, "2025-01-01T00:00:00Z", fmt="json")
+        # Tiny chunks split records, numbers and multi-byte characters across reads.
+        with patch.object(discovery_handler._JsonChunks, "_CHUNK", 7):
+            self.assertEqual(list(discovery_handler.iter_snapshot_records(io.BytesIO(sink.getvalue()))), records)
+        pretty = json.dumps({"records": records, "schema_version": 1}, indent=2).encode("utf-8")
+        self.assertEqual(list(discovery_handler.iter_snapshot_records(io.BytesIO(pretty))), records)
+        self.assertEqual(list(discovery_handler.iter_snapshot_records(io.BytesIO(json.dumps(records).encode()))), records)
+
+    def test_json_document_parse_memory_is_flat(self):
+        records = [dict(r, instance_id=f"i-{n:07d}") for n in range(20) for r in RECORDS]  # 8000 rows
+        sink = io.BytesIO()
+        discovery_handler.write_snapshot(sink, records, "2025-01-01T00:00:00Z", fmt="json")
+        data = sink.getvalue()
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in discovery_handler.iter_snapshot_records(io.BytesIO(data)))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, len(records))
+        self.assertGreater(len(data), 800_000)
+        # About one read chunk; decoding the whole document first costs several times its size.
+        self.assertLess(peak, 500_000)
+
+    def test_small_snapshot_uses_single_put(self):
+        s3 = _MultipartS3()
+        with patch.object(discovery_handler, "RESULTS_S3_BUCKET", "b"), \
+                patch.object(discovery_handler, "RESULTS_FORMAT", "ndjson"), \
+                patch("discovery_handler._s3_client", return_value=s3):
+            discovery_handler.store_results_s3(RECORDS[:3])
+        self.assertEqual(s3.part_sizes, [])
+        self.assertEqual(s3.put_kwargs[discovery_handler.RESULTS_S3_KEY]["ContentEncoding"], "gzip")
+
+    def test_compression_choices_round_trip(self):
+        combos = [("json", "gzip"), ("ndjson", "none")]
+        if zstandard is not None:
+            combos += [("json", "zstd"), ("ndjson", "zstd")]
+        for fmt, compression in combos:
+            with self.subTest(fmt=fmt, compression=compression):
+                sink = io.BytesIO()
+                discovery_handler.write_snapshot(sink, RECORDS, "2025-01-01T00:00:00Z", fmt=fmt, compression=compression)
+                sink.seek(0)
+                self.assertEqual(list(discovery_handler.iter_snapshot_records(sink)), RECORDS)
+
+    def test_put_kwargs_carry_encoding_and_metadata(self):
+        kwargs = discovery_handler.snapshot_put_kwargs("ndjson", "zstd", 3)
+        self.assertEqual(kwargs["ContentEncoding"], "zstd")
+        self.assertEqual(kwargs["Metadata"], {"inventory-format": "ndjson", "inventory-compression": "zstd", "record-count": "3"})
+        self.assertNotIn("ContentEncoding", discovery_handler.snapshot_put_kwargs("json", "none"))
+
+    def test_failed_serialization_aborts_upload(self):
+        s3 = _MultipartS3()
+
+        def exploding():
+            yield from RECORDS
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            with discovery_handler.S3MultipartWriter(s3, "b", "k", 1024) as sink:
+                discovery_handler.write_snapshot(sink, exploding(), "2025-01-01T00:00:00Z", fmt="ndjson")
+        self.assertTrue(s3.aborted)
+        self.assertNotIn("k", s3.objects)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+
+def _creds(key_id, minutes):
+    return {
+        "Credentials": {
+            "AccessKeyId": key_id,
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime.now(timezone.utc) + timedelta(minutes=minutes),
+        }
+    }
+
+
+class SpokeClientCacheTests(unittest.TestCase):
+    def setUp(self):
+        discovery_handler._SPOKE_CREDENTIALS.clear()
+        discovery_handler._SPOKE_CLIENTS.clear()
+        patcher = patch.object(discovery_handler, "_SESSION", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_assume_role_per_account_and_clients_reused(self):
+        sts = MagicMock()
+        sts.assume_role.return_value = _creds("AKIA1", 60)
+        with patch("discovery_handler._sts_client", return_value=sts), \
+                patch("discovery_handler.boto3.session.Session") as session_cls:
+            session_cls.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+            ssm_eu = discovery_handler.get_spoke_client("111111111111", "ssm", region="eu-west-1")
+            ec2_eu = discovery_handler.get_spoke_client("111111111111", "ec2", region="eu-west-1")
+            ssm_ap = discovery_handler.get_spoke_client("111111111111", "ssm", region="ap-south-1")
+            again = discovery_handler.get_spoke_client("111111111111", "ssm", region="eu-west-1")
+
+        self.assertEqual(sts.assume_role.call_count, 1)
+        self.assertIs(again, ssm_eu)
+        self.assertIsNot(ssm_eu, ec2_eu)
+        self.assertIsNot(ssm_eu, ssm_ap)
+
+    def test_credentials_refreshed_before_expiry(self):
+        sts = MagicMock()
+        sts.assume_role.side_effect = [_creds("AKIA1", 2), _creds("AKIA2", 60)]
+        with patch("discovery_handler._sts_client", return_value=sts), \
+                patch("discovery_handler.boto3.session.Session") as session_cls:
+            session_cls.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+            first = discovery_handler.get_spoke_client("111111111111", "ssm", region="eu-west-1")
+            second = discovery_handler.get_spoke_client("111111111111", "ssm", region="eu-west-1")
+
+        self.assertEqual(sts.assume_role.call_count, 2)
+        self.assertIsNot(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import sys
+from pathlib import Path
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import discovery_handler
+
+
+def _inv(iid, status, output=""):
+    return {"InstanceId": iid, "Status": status, "CommandPlugins": [{"Output": output}]}
+
+
+class _ScriptedSsm:
+    """ListCommandInvocations returns the next scripted snapshot on each poll."""
+
+    def __init__(self, polls, full_output=None):
+        self.polls = list(polls)
+        self.list_calls = 0
+        self.get_command_invocation = MagicMock(return_value=full_output or {})
+
+    def get_paginator(self, name):
+        assert name == "list_command_invocations"
+        paginator = MagicMock()
+        paginator.paginate.side_effect = self._paginate
+        return paginator
+
+    def _paginate(self, CommandId, Details):
+        assert Details is True
+        idx = min(self.list_calls, len(self.polls) - 1)
+        self.list_calls += 1
+        return [{"CommandInvocations": self.polls[idx]}]
+
+
+PROBE = json.dumps({"discovery_status": "success", "databases": [{"db_id": "mysql-3306", "engine": "mysql"}]})
+
+
+@patch("discovery_handler.time.sleep")
+class CommandTrackingTests(unittest.TestCase):
+    def test_early_finishers_yield_before_stragglers(self, _sleep):
+        ssm = _ScriptedSsm([
+            [_inv("i-1", "Success", PROBE), _inv("i-2", "InProgress")],
+            [_inv("i-1", "Success", PROBE), _inv("i-2", "Success", PROBE + "\n" + discovery_handler.SSM_STDERR_MARKER + "\nwarn")],
+        ])
+        results = discovery_handler.track_command_invocations(ssm, {"cmd-1": ["i-1", "i-2"]}, timeout=30)
+        first = next(results)
+        self.assertEqual((first["instance_id"], ssm.list_calls), ("i-1", 1))
+        second = next(results)
+        self.assertEqual(second["instance_id"], "i-2")
+        self.assertEqual(second["error"], "warn")
+        self.assertEqual(json.loads(second["output"]), json.loads(PROBE))
+        self.assertEqual(list(results), [])
+        ssm.get_command_invocation.assert_not_called()
+
+    def test_truncated_output_is_reread_per_instance(self, _sleep):
+        long_output = "x" * discovery_handler.SSM_DETAILS_OUTPUT_LIMIT
+        ssm = _ScriptedSsm(
+            [[_inv("i-1", "Success", long_output)]],
+            full_output={"Status": "Success", "StandardOutputContent": PROBE, "StandardErrorContent": ""},
+        )
+        results = list(discovery_handler.track_command_invocations(ssm, {"cmd-1": ["i-1"]}, timeout=30))
+        self.assertEqual(results[0]["output"], PROBE)
+        ssm.get_command_invocation.assert_called_once_with(CommandId="cmd-1", InstanceId="i-1")
+
+    def test_unfinished_instances_reported_at_deadline(self, _sleep):
+        ssm = _ScriptedSsm([[_inv("i-1", "InProgress")]])
+        results = list(discovery_handler.track_command_invocations(ssm, {"cmd-1": ["i-1", "i-2"]}, timeout=0.05))
+        by_id = {r["instance_id"]: r["status"] for r in results}
+        self.assertEqual(by_id, {"i-1": "InProgress", "i-2": "Pending"})
+
+    def test_backoff_grows_to_cap(self, sleep):
+        ssm = _ScriptedSsm([[_inv("i-1", "InProgress")]] * 6 + [[_inv("i-1", "Success", PROBE)]])
+        with patch.object(discovery_handler, "SSM_POLL_INITIAL_SECONDS", 1.0), \
+                patch.object(discovery_handler, "SSM_POLL_BACKOFF", 2.0), \
+                patch.object(discovery_handler, "SSM_POLL_MAX_SECONDS", 5.0):
+            list(discovery_handler.track_command_invocations(ssm, {"cmd-1": ["i-1"]}, timeout=300))
+        delays = [round(c.args[0]) for c in sleep.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 5, 5, 5, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()